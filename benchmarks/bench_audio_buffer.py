@@ -0,0 +1,82 @@
+"""采集缓冲区基准测试
+
+模拟采集线程以1024样本/块写入，比较原来的bytes列表(加锁append + b''.join)
+和AudioBuffer：每录制一分钟占用的内存、每块写入耗时，以及消费者读取全部音频的耗时。
+
+用法: python benchmarks/bench_audio_buffer.py [--minutes 5]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audio_buffer import AudioBuffer
+
+CHUNK = 1024
+RATE = 16000
+
+
+def make_chunks(minutes):
+    count = int(minutes * 60 * RATE / CHUNK)
+    rng = np.random.default_rng(0)
+    return [rng.integers(-3000, 3000, CHUNK, dtype=np.int16) for _ in range(count)]
+
+
+def capture_frames_list(chunks):
+    lock = threading.Lock()
+    frames = []
+    for chunk in chunks:
+        data = chunk.tobytes()  # 模拟stream.read()每次返回新的bytes对象
+        with lock:
+            frames.append(data)
+    return lambda: np.frombuffer(b''.join(frames), dtype=np.int16)
+
+
+def capture_audio_buffer(chunks):
+    buffer = AudioBuffer(sample_rate=RATE)
+    for chunk in chunks:
+        data = chunk.tobytes()
+        buffer.write(np.frombuffer(data, dtype=np.int16))
+    return buffer.view
+
+
+def bench(capture, chunks):
+    """返回 (每块写入耗时, 占用内存, 读取全部音频耗时)"""
+    start = time.perf_counter()
+    read_all = capture(chunks)
+    write_time = (time.perf_counter() - start) / len(chunks)
+    del read_all
+
+    tracemalloc.start()
+    read_all = capture(chunks)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    samples = read_all()
+    read_time = time.perf_counter() - start
+    assert len(samples) == len(chunks) * CHUNK
+    return write_time, memory, read_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark capture buffer memory and per-chunk overhead")
+    parser.add_argument("--minutes", type=float, default=5.0)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.minutes)
+    print(f"{args.minutes:g} 分钟音频, {len(chunks)} 块 x {CHUNK} 样本")
+    print(f"{'buffer':<14} {'MB/min':>8} {'us/chunk':>9} {'read all ms':>12}")
+    for name, capture in (("bytes list", capture_frames_list), ("AudioBuffer", capture_audio_buffer)):
+        write_time, memory, read_time = bench(capture, chunks)
+        print(f"{name:<14} {memory / 1e6 / args.minutes:>8.2f} {write_time * 1e6:>9.2f} {read_time * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""采集子进程基准测试
+
+在满负载推理的同时录音，比较本进程采集和子进程采集的输入溢出(xrun)次数、
+采集到的音频与实际经过时间的差距，以及子进程重启/丢失的音频。
+
+负载默认是循环转写测试音频(需要模型)；没有模型时可以用 --load python 改为
+占用GIL的纯Python计算，模拟推理回调、NumPy和界面线程抢占GIL的情况。
+
+用法: python benchmarks/bench_capture_process.py --device 0 [--seconds 30] [--load transcribe|python] [--audio FILE]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import AudioRecorder
+
+
+def transcribe_load(stop, audio_file):
+    from utils.config import Config
+    from core.engine import WhisperEngine
+    engine = WhisperEngine(Config())
+    engine.ensure_model_loaded(allow_download=False)
+    while not stop.is_set():
+        engine.transcribe(audio_file)
+
+
+def python_load(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(200000))
+
+
+def run(recorder, seconds, load, audio_file, device):
+    stop = threading.Event()
+    if load == "transcribe":
+        target, args = transcribe_load, (stop, audio_file)
+    else:
+        target, args = python_load, (stop,)
+    workers = [threading.Thread(target=target, args=args, daemon=True) for _ in range(2 if load == "python" else 1)]
+    for worker in workers:
+        worker.start()
+    time.sleep(2.0)  # 等负载稳定(包括加载模型)
+
+    start = time.perf_counter()
+    if not recorder.start_recording(device_index=device):
+        raise RuntimeError("开始录音失败")
+    time.sleep(seconds)
+    process_stats = recorder.stream.stats() if hasattr(recorder.stream, "stats") else None
+    elapsed = time.perf_counter() - start
+    captured = recorder.samples_recorded / recorder.RATE
+    overflows = recorder.overflow_count
+    recorder.stop()
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return overflows, elapsed - captured, process_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-process and subprocess capture under load")
+    parser.add_argument("--device", type=int, required=True, help="Input device index")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--load", choices=["transcribe", "python"], default="transcribe")
+    parser.add_argument("--audio", default=None, help="Audio file transcribed in a loop as the inference load")
+    args = parser.parse_args()
+    if args.load == "transcribe" and not args.audio:
+        parser.error("--load transcribe 需要 --audio")
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{'mode':>12} {'xruns':>6} {'missing ms':>11} {'restarts':>9} {'lost ms':>8}")
+    for mode in ("in-process", "subprocess"):
+        recorder = AudioRecorder()
+        recorder.capture_process = mode == "subprocess"
+        overflows, missing, process_stats = run(recorder, args.seconds, args.load, args.audio, args.device)
+        restarts = process_stats["restarts"] if process_stats else 0
+        lost = process_stats["lost_samples"] / recorder.RATE * 1000 if process_stats else 0.0
+        print(f"{mode:>12} {overflows:>6} {missing * 1000:>11.0f} {restarts:>9} {lost:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""采集处理链基准测试
+
+1. 每个滤波器单独处理合成信号(底噪+间断的语音频段音调)，测量每块(1024样本)和每秒音频的耗时；
+2. 指定带参考文本的测试集时，分别转写原始音频和经过处理链的音频，
+   比较温度回退次数(result.fallback_count)、RTF和CER。
+
+用法: python benchmarks/bench_dsp.py [FIXTURE_DIR] [--model large-v3] [--language zh] [--seconds 60]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.dsp import DSPChain, FILTERS
+
+CHUNK = 1024
+RATE = 16000
+
+
+def make_signal(seconds):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * RATE)) / RATE
+    voiced = (np.sin(2 * np.pi * 0.4 * t) > 0).astype(np.float32)  # 约1.25s说话、1.25s停顿
+    speech = 800 * voiced * (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 1200 * t))
+    return (speech + rng.normal(0, 30, len(t)) + 500).astype(np.int16)
+
+
+def bench_filters(seconds):
+    signal = make_signal(seconds)
+    chunks = [signal[i:i + CHUNK] for i in range(0, len(signal), CHUNK)]
+    print(f"{'filter':>10} {'us/chunk':>9} {'max us':>8} {'ms/s audio':>11}")
+    for name in list(FILTERS) + ["chain"]:
+        chain = DSPChain(filters=list(FILTERS) if name == "chain" else [name], budget_ms=1e9)
+        chain.process(chunks[0])  # 预热
+        chain.reset()
+        times = []
+        for chunk in chunks:
+            start = time.perf_counter()
+            chain.process(chunk)
+            times.append(time.perf_counter() - start)
+        total = sum(times)
+        print(f"{name:>10} {total * 1e6 / len(times):>9.1f} {max(times) * 1e6:>8.1f} {total * 1000 / seconds:>11.3f}")
+
+
+def load_int16(path):
+    from faster_whisper.audio import decode_audio
+    audio = decode_audio(path, sampling_rate=RATE)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def process_in_chunks(samples):
+    chain = DSPChain(budget_ms=1e9)
+    return np.concatenate([chain.process(samples[i:i + CHUNK]) for i in range(0, len(samples), CHUNK)])
+
+
+def bench_fallbacks(fixture_dir, model, language):
+    from utils.config import Config
+    from utils.logging import setup_logging
+    from core.engine import WhisperEngine
+    from core.autotune import load_fixtures, char_errors
+
+    setup_logging()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fixtures = load_fixtures(fixture_dir)
+    if not fixtures:
+        print(f"在 {fixture_dir} 中没有找到带参考文本的测试音频")
+        return
+
+    engine = WhisperEngine(Config())
+    if model:
+        engine.load_model(model, allow_download=False)
+    else:
+        engine.ensure_model_loaded(allow_download=False)
+
+    clips = [(load_int16(path), reference) for path, reference in fixtures]
+    engine.transcribe_samples(clips[0][0], language=language)  # 预热
+    audio_seconds = sum(len(samples) for samples, _ in clips) / RATE
+    print(f"\n模型 {engine.model_name}, {len(clips)} 个测试音频, 共 {audio_seconds:.1f}s")
+    print(f"{'input':>10} {'fallbacks':>10} {'segments':>9} {'RTF':>7} {'CER':>7}")
+    for label, prepare in (("raw", lambda s: s), ("dsp", process_in_chunks)):
+        fallbacks = segments = char_err = char_total = 0
+        elapsed = 0.0
+        for samples, reference in clips:
+            samples = prepare(samples)
+            start = time.perf_counter()
+            result = engine.transcribe_samples(samples, language=language)
+            elapsed += time.perf_counter() - start
+            if not result.ok:
+                raise RuntimeError(f"转写失败: {result.error}")
+            fallbacks += result.fallback_count
+            segments += len(result)
+            errors, total = char_errors(reference, result.text)
+            char_err += errors
+            char_total += total
+        print(f"{label:>10} {fallbacks:>10} {segments:>9} {elapsed / audio_seconds:>7.3f} "
+              f"{char_err / max(1, char_total):>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the capture DSP chain")
+    parser.add_argument("fixture_dir", nargs="?")
+    parser.add_argument("--model", default=None, help="Model name, defaults to the automatically selected model")
+    parser.add_argument("--language", default="zh")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    bench_filters(args.seconds)
+    if args.fixture_dir:
+        bench_fallbacks(args.fixture_dir, args.model, args.language)
+
+
+if __name__ == "__main__":
+    main()
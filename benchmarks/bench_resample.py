@@ -0,0 +1,93 @@
+"""采集重采样基准测试
+
+按采集回调的块大小(64ms)把合成的语音频段信号送入StreamingResampler，
+测量常见设备格式降混/重采样到16kHz单声道的耗时(每秒音频的毫秒数)和每个块的耗时；
+再用单频信号测量频率响应：通带(<=6kHz)衰减不超过1dB，会混叠到8kHz以下的
+阻带(>=8.5kHz)衰减至少60dB，否则报错。
+
+用法: python benchmarks/bench_resample.py [--seconds 60] [--formats 48000x1,48000x2,44100x1,44100x2]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.resample import StreamingResampler
+
+CHUNK_MS = 64  # 与录音器16kHz下1024帧的回调间隔一致
+PASSBAND_HZ = (1000, 3000, 6000)
+TRANSITION_HZ = (7000, 8000)  # 只显示，不检查
+STOPBAND_HZ = (8500, 9000, 10000, 12000, 16000, 20000)
+MAX_PASSBAND_LOSS_DB = 1.0
+MIN_STOPBAND_ATTENUATION_DB = 60.0
+
+
+def make_signal(seconds, rate, channels):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    mono = 6000 * np.sin(2 * np.pi * 220 * t) + 3000 * np.sin(2 * np.pi * 3100 * t) + rng.normal(0, 500, len(t))
+    return np.repeat(mono.astype(np.int16), channels)
+
+
+def tone_gain_db(rate, freq, amplitude=16000.0):
+    """单频信号经过重采样后的增益(dB)，跳过滤波器启动和结束的部分"""
+    resampler = StreamingResampler(rate, 16000, 1)
+    t = np.arange(rate) / rate
+    out = resampler.process((amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16))[2000:-2000]
+    rms = np.sqrt(np.mean(out.astype(np.float64) ** 2))
+    return 20 * np.log10(max(rms, 1e-3) / (amplitude / np.sqrt(2)))
+
+
+def check_response(formats):
+    """打印各输入采样率的频率响应并检查通带衰减和阻带衰减"""
+    freqs = PASSBAND_HZ + TRANSITION_HZ + STOPBAND_HZ
+    print(f"\n{'rate':>10} {'taps':>5} " + " ".join(f"{f / 1000:>6.1f}k" for f in freqs))
+    failures = []
+    for rate in sorted({int(fmt.split("x")[0]) for fmt in formats}, reverse=True):
+        gains = {f: tone_gain_db(rate, f) for f in freqs if f < rate / 2}
+        print(f"{rate:>10} {StreamingResampler(rate).taps:>5} "
+              + " ".join(f"{gains[f]:>7.1f}" if f in gains else f"{'-':>7}" for f in freqs))
+        failures += [f"{rate}Hz 通带 {f}Hz 衰减 {-gains[f]:.1f}dB" for f in PASSBAND_HZ
+                     if f in gains and gains[f] < -MAX_PASSBAND_LOSS_DB]
+        failures += [f"{rate}Hz 阻带 {f}Hz 只衰减 {-gains[f]:.1f}dB" for f in STOPBAND_HZ
+                     if f in gains and gains[f] > -MIN_STOPBAND_ATTENUATION_DB]
+    if failures:
+        raise RuntimeError("频率响应不满足要求: " + "; ".join(failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming capture resampling")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--formats", default="48000x1,48000x2,44100x1,44100x2,32000x1,22050x1")
+    args = parser.parse_args()
+
+    print(f"{'format':>10} {'up/down':>9} {'ms/s audio':>11} {'us/chunk':>9} {'max us':>8}")
+    for fmt in args.formats.split(","):
+        rate, channels = (int(v) for v in fmt.split("x"))
+        signal = make_signal(args.seconds, rate, channels)
+        chunk = int(rate * CHUNK_MS / 1000) * channels
+        resampler = StreamingResampler(rate, 16000, channels)
+        resampler.process(signal[:chunk])  # 预热
+        resampler.reset()
+
+        chunk_times = []
+        produced = 0
+        for i in range(0, len(signal), chunk):
+            start = time.perf_counter()
+            produced += len(resampler.process(signal[i:i + chunk]))
+            chunk_times.append(time.perf_counter() - start)
+        total = sum(chunk_times)
+        expected = int(args.seconds * 16000)
+        if abs(produced - expected) > 1:
+            raise RuntimeError(f"{fmt}: 输出 {produced} 个样本，预期 {expected}")
+        print(f"{fmt:>10} {f'{resampler.up}/{resampler.down}':>9} {total * 1000 / args.seconds:>11.3f} "
+              f"{total * 1e6 / len(chunk_times):>9.1f} {max(chunk_times) * 1e6:>8.1f}")
+    check_response(args.formats.split(","))
+
+
+if __name__ == "__main__":
+    main()
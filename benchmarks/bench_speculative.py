@@ -0,0 +1,96 @@
+"""草稿-验证解码基准测试
+
+在带参考文本的测试集上比较 large-v3 贪心解码和 distil-large-v3 草稿 + large-v3 验证：
+输出每个音频的耗时、加速比、草稿token接受率、与参考文本的字错误率，以及两种方式
+的输出是否一致。
+
+用法: python benchmarks/bench_speculative.py FIXTURE_DIR [--target large-v3] [--draft distil-large-v3] [--language zh]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config import Config
+from utils.logging import setup_logging
+from core.engine import WhisperEngine
+from core.autotune import load_fixtures, char_errors
+from core.speculative import SpeculativeDecoder
+
+# 与草稿-验证解码等价的大模型基线：贪心、无温度回退、无时间戳
+BASELINE_OPTIONS = {
+    "beam_size": 1,
+    "temperature": [0.0],
+    "condition_on_previous_text": False,
+    "without_timestamps": True,
+    "vad_filter": False,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark draft-and-verify decoding")
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--target", default="large-v3")
+    parser.add_argument("--draft", default="distil-large-v3")
+    parser.add_argument("--language", default="zh")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fixtures = load_fixtures(args.fixture_dir)
+    if not fixtures:
+        print(f"在 {args.fixture_dir} 中没有找到带参考文本的测试音频")
+        return
+
+    config = Config()
+    engine = WhisperEngine(config)
+    engine.load_model(args.draft, allow_download=False)
+    draft_model = engine.model
+    engine.load_model(args.target, allow_download=False)
+    decoder = SpeculativeDecoder(engine.model, draft_model)
+
+    # 预热，避免第一次调用的初始化开销计入结果
+    engine.transcribe(fixtures[0][0], language=args.language, decode_options=BASELINE_OPTIONS)
+    decoder.transcribe(fixtures[0][0], language=args.language)
+    decoder.reset_stats()
+
+    print(f"{'fixture':<28} {'base s':>8} {'spec s':>8} {'speedup':>8} {'accept':>7} {'CERb':>6} {'CERs':>6} {'same':>5}")
+    totals = {"base": 0.0, "spec": 0.0, "base_err": 0, "spec_err": 0, "chars": 0, "same": 0}
+    for audio_path, reference in fixtures:
+        start = time.perf_counter()
+        baseline = engine.transcribe(audio_path, language=args.language, decode_options=BASELINE_OPTIONS)
+        base_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        speculative = decoder.transcribe(audio_path, language=args.language)
+        spec_time = time.perf_counter() - start
+
+        base_err, chars = char_errors(reference, baseline.text)
+        spec_err, _ = char_errors(reference, speculative.text)
+        same = char_errors(baseline.text, speculative.text)[0] == 0
+        totals["base"] += base_time
+        totals["spec"] += spec_time
+        totals["base_err"] += base_err
+        totals["spec_err"] += spec_err
+        totals["chars"] += chars
+        totals["same"] += same
+        print(f"{os.path.basename(audio_path)[:28]:<28} {base_time:>8.2f} {spec_time:>8.2f} "
+              f"{base_time / max(spec_time, 1e-6):>7.2f}x {speculative.metrics['speculative_acceptance']:>6.0%} "
+              f"{base_err / max(1, chars):>6.3f} {spec_err / max(1, chars):>6.3f} {'yes' if same else 'no':>5}")
+
+    stats = decoder.stats
+    print()
+    print(f"总耗时: 基线 {totals['base']:.2f}s, 草稿-验证 {totals['spec']:.2f}s, "
+          f"加速 {totals['base'] / max(totals['spec'], 1e-6):.2f}x")
+    print(f"草稿token接受率: {decoder.acceptance_rate:.1%} ({stats['accepted']}/{stats['drafted']}), "
+          f"平均每轮接受 {stats['accepted'] / max(1, stats['rounds']):.1f} 个token, 大模型单步生成 {stats['target_steps']} 次")
+    print(f"CER: 基线 {totals['base_err'] / max(1, totals['chars']):.3f}, "
+          f"草稿-验证 {totals['spec_err'] / max(1, totals['chars']):.3f}; 输出一致 {totals['same']}/{len(fixtures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""变速转写基准测试
+
+在带参考文本的测试集上，对每个加速倍数测量实时率(RTF，相对原始音频时长)、
+WER/CER以及WSOLA变速本身的耗时。
+
+用法: python benchmarks/bench_tempo.py FIXTURE_DIR [--model large-v3] [--speeds 1.0,1.25,1.5] [--language zh]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.config import Config
+from utils.logging import setup_logging
+from core.engine import WhisperEngine
+from core.autotune import load_fixtures, get_audio_duration, word_errors, char_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tempo-compressed transcription")
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--model", default=None, help="Model name, defaults to the automatically selected model")
+    parser.add_argument("--speeds", default="1.0,1.25,1.5")
+    parser.add_argument("--language", default="zh")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fixtures = load_fixtures(args.fixture_dir)
+    if not fixtures:
+        print(f"在 {args.fixture_dir} 中没有找到带参考文本的测试音频")
+        return
+
+    engine = WhisperEngine(Config())
+    if args.model:
+        engine.load_model(args.model, allow_download=False)
+    else:
+        engine.ensure_model_loaded(allow_download=False)
+    # 预热
+    engine.transcribe(fixtures[0][0], language=args.language, speed=1.0)
+
+    audio_seconds = sum(get_audio_duration(path) for path, _ in fixtures)
+    print(f"模型 {engine.model_name}, {len(fixtures)} 个测试音频, 共 {audio_seconds:.1f}s")
+    print(f"{'speed':>6} {'RTF':>7} {'WER':>7} {'CER':>7} {'stretch ms/s':>13} {'speedup':>8}")
+    baseline_time = None
+    for speed in (float(s) for s in args.speeds.split(",")):
+        word_err = word_total = char_err = char_total = 0
+        stretch_time = 0.0
+        start = time.perf_counter()
+        for audio_path, reference in fixtures:
+            result = engine.transcribe(audio_path, language=args.language, speed=speed)
+            if not result.ok:
+                raise RuntimeError(f"转写 {audio_path} 失败: {result.error}")
+            stretch_time += result.timings.get("tempo", 0.0)
+            errors, total = word_errors(reference, result.text)
+            word_err += errors
+            word_total += total
+            errors, total = char_errors(reference, result.text)
+            char_err += errors
+            char_total += total
+        elapsed = time.perf_counter() - start
+        baseline_time = baseline_time or elapsed
+        print(f"{speed:>6.2f} {elapsed / audio_seconds:>7.3f} {word_err / max(1, word_total):>7.3f} "
+              f"{char_err / max(1, char_total):>7.3f} {stretch_time * 1000 / audio_seconds:>13.2f} "
+              f"{baseline_time / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
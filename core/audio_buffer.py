@@ -0,0 +1,120 @@
+import threading
+
+import numpy as np
+
+
+class AudioBuffer:
+    """采集音频使用的预分配int16缓冲区，单生产者写入，读者无锁读取零拷贝视图
+
+    所有位置都是从录音开始计算的绝对样本位置。采集线程调用write()把数据复制到
+    预分配的数组末尾；空间不足时先丢弃已经release()的部分，仍然不够则扩容，
+    两种情况都复制到一个新数组，旧数组不再被修改。因此读者拿到的视图在之后的
+    写入、释放和扩容中始终有效，不需要加锁也不需要复制。
+
+    生产者在写完数据后才一次性替换(数组, 起点, 终点)状态，读者只读取这个状态，
+    不会看到写了一半的数据。
+    """
+
+    def __init__(self, initial_seconds=60.0, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self._initial_capacity = max(1, int(initial_seconds * sample_rate))
+        self._release_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空缓冲区，位置从0重新开始"""
+        data = np.zeros(self._initial_capacity, dtype=np.int16)
+        self._state = (data, 0, 0)  # (数组, 数组第一个样本的绝对位置, 写入位置)
+        self._released = 0
+        self.reallocations = 0
+
+    @property
+    def start(self):
+        """仍然保留的第一个样本位置"""
+        return max(self._state[1], self._released)
+
+    @property
+    def end(self):
+        """已写入的样本数(包括已释放的部分)"""
+        return self._state[2]
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def capacity(self):
+        return len(self._state[0])
+
+    @property
+    def nbytes(self):
+        """当前占用的内存(字节)"""
+        return self._state[0].nbytes
+
+    def write(self, samples):
+        """追加int16样本(只能由一个线程调用)"""
+        if samples.dtype != np.int16:
+            samples = samples.astype(np.int16)
+        data, offset, end = self._state
+        position = end - offset
+        if position + len(samples) > len(data):
+            data, offset = self._reallocate(data, offset, end, len(samples))
+            position = end - offset
+        data[position:position + len(samples)] = samples
+        self._state = (data, offset, end + len(samples))
+
+    def _reallocate(self, data, offset, end, extra):
+        """把保留的数据复制到新数组：先丢弃已释放的部分，空间仍不足时扩容
+
+        每次扩容max(初始容量, 当前容量的1/4)：多占用的内存不超过约25%，
+        复制的总量仍然与录音长度成正比。
+        """
+        keep_from = max(offset, self._released)
+        kept = end - keep_from
+        capacity = len(data)
+        while kept + extra > capacity - self._initial_capacity // 4:  # 压缩后至少留出四分之一步长
+            capacity += max(self._initial_capacity, capacity // 4)
+        new_data = np.empty(capacity, dtype=np.int16)
+        new_data[:kept] = data[keep_from - offset:end - offset]
+        self.reallocations += 1
+        return new_data, keep_from
+
+    def view(self, start=None, end=None):
+        """返回[start, end)区间的只读视图，区间会被限制在仍然保留的范围内"""
+        data, offset, written = self._state
+        start = max(self.start if start is None else start, self.start, offset)
+        end = written if end is None else min(end, written)
+        if end <= start:
+            return data[:0]
+        view = data[start - offset:end - offset]
+        view.flags.writeable = False
+        return view
+
+    def release(self, upto):
+        """允许之后的扩容或压缩丢弃upto之前的样本，已经拿到的视图不受影响"""
+        with self._release_lock:
+            self._released = min(max(self._released, upto), self.end)
+        return self._released
+
+    def reader(self, start=None):
+        """创建一个独立的读取游标"""
+        return AudioReader(self, self.start if start is None else start)
+
+
+class AudioReader:
+    """单个消费者的读取游标，每次read()返回上次读取之后新写入的数据"""
+
+    def __init__(self, buffer, position=0):
+        self.buffer = buffer
+        self.position = position
+
+    @property
+    def available(self):
+        return self.buffer.end - self.position
+
+    def read(self, max_samples=None):
+        """返回新数据的只读视图并前移游标"""
+        start = max(self.position, self.buffer.start)
+        end = self.buffer.end if max_samples is None else min(self.buffer.end, start + max_samples)
+        view = self.buffer.view(start, end)
+        self.position = start + len(view)
+        return view
@@ -0,0 +1,143 @@
+import time
+import logging
+import threading
+
+import pyaudio
+
+logger = logging.getLogger(__name__)
+
+
+class AudioHost:
+    """进程内共享的PortAudio宿主：持有唯一的PyAudio实例、缓存设备表并统一打开音频流
+
+    PortAudio只在初始化时枚举设备，初始化和枚举在部分系统上要几十到几百毫秒。
+    这里只初始化一次，设备信息全部从缓存读取；设备插拔后调用refresh()重新初始化并枚举。
+    重新初始化会使已经打开的流失效，所以有流打开时refresh()只记下请求，
+    等最后一个流通过close()关闭后再执行。每次刷新完成后(包括推迟执行的刷新)
+    在执行刷新的线程中调用add_refresh_listener()注册的回调。
+    """
+
+    def __init__(self):
+        self._pa = None
+        self._devices = []  # 设备信息字典列表，下标即设备索引
+        self._streams = set()
+        self._refresh_pending = False
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    @property
+    def refresh_pending(self):
+        """是否有等待音频流关闭后执行的刷新"""
+        return self._refresh_pending
+
+    def add_refresh_listener(self, callback):
+        """注册设备表刷新后调用的回调(无参数)"""
+        self._listeners.append(callback)
+
+    @property
+    def pa(self):
+        with self._lock:
+            if self._pa is None:
+                self._initialize()
+            return self._pa
+
+    def _initialize(self):
+        init_start = time.perf_counter()
+        self._pa = pyaudio.PyAudio()
+        devices = []
+        for i in range(self._pa.get_device_count()):
+            try:
+                devices.append(dict(self._pa.get_device_info_by_index(i)))
+            except Exception as e:
+                logger.error(f"获取设备 {i} 信息失败: {e}")
+                devices.append({"index": i, "name": "", "maxInputChannels": 0, "maxOutputChannels": 0})
+        self._devices = devices
+        logger.info(f"PortAudio初始化完成，{len(devices)} 个设备，耗时 {(time.perf_counter() - init_start) * 1000:.1f}ms")
+
+    def devices(self):
+        """返回缓存的全部设备信息"""
+        with self._lock:
+            if self._pa is None:
+                self._initialize()
+            return list(self._devices)
+
+    def input_devices(self):
+        """返回可用输入设备的 (设备索引, 名称) 列表"""
+        return [(i, info.get('name')) for i, info in enumerate(self.devices()) if info.get('maxInputChannels', 0) > 0]
+
+    def device_info(self, index):
+        """返回缓存的设备信息，设备不存在时返回None"""
+        devices = self.devices()
+        if index is None or not 0 <= index < len(devices):
+            return None
+        return devices[index]
+
+    def find_input_device(self, name):
+        """按名称查找输入设备索引(设备表刷新后索引可能变化)"""
+        for index, device_name in self.input_devices():
+            if device_name == name:
+                return index
+        return None
+
+    def open(self, **kwargs):
+        """打开音频流，参数与PyAudio.open相同；用完后应调用close()"""
+        with self._lock:
+            stream = self.pa.open(**kwargs)
+            self._streams.add(stream)
+            return stream
+
+    def close(self, stream):
+        """停止并关闭由open()打开的流，最后一个流关闭时执行挂起的refresh()"""
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+        finally:
+            stream.close()
+            with self._lock:
+                self._streams.discard(stream)
+                deferred = self._refresh_pending and not self._streams
+            if deferred:
+                self.refresh()
+
+    def refresh(self):
+        """重新初始化PortAudio并枚举设备(设备插拔时调用)
+
+        Returns:
+            是否已经刷新；有流打开时推迟到流全部关闭后，返回False
+        """
+        with self._lock:
+            if self._streams:
+                self._refresh_pending = True
+                logger.info(f"有 {len(self._streams)} 个音频流打开，设备列表将在关闭后刷新")
+                return False
+            self._refresh_pending = False
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+            self._initialize()
+        # 在锁外通知，回调中可以再读取设备表或打开流
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"设备表刷新回调出错: {e}")
+        return True
+
+    def terminate(self):
+        with self._lock:
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+            self._streams.clear()
+
+
+_host = None
+
+
+def get_audio_host():
+    """返回进程内共享的音频宿主"""
+    global _host
+    if _host is None:
+        _host = AudioHost()
+    return _host
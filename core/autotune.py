@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import json
+import wave
+import logging
+import itertools
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".m4a", ".ogg")
+
+# 温度回退策略：只用贪心解码，或者使用faster-whisper默认的回退序列
+TEMPERATURE_MODES = {
+    "t0": [0.0],
+    "tfb": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+}
+
+# 默认的预设搜索网格
+DEFAULT_GRID = {
+    "beam_size": [1, 3, 5],
+    "best_of": [1, 5],
+    "temperature": ["t0", "tfb"],
+    "condition_on_previous_text": [True, False],
+    "vad_silence_ms": [None, 300, 500, 1000],
+}
+
+
+def preset_name(beam_size, best_of, temperature, condition_on_previous_text, vad_silence_ms) -> str:
+    """根据参数生成预设名称，例如 b5-bo1-tfb-ctx-vad500"""
+    ctx = "ctx" if condition_on_previous_text else "noctx"
+    vad = f"vad{vad_silence_ms}" if vad_silence_ms else "novad"
+    return f"b{beam_size}-bo{best_of}-{temperature}-{ctx}-{vad}"
+
+
+def make_preset(beam_size, best_of, temperature, condition_on_previous_text, vad_silence_ms) -> Dict[str, Any]:
+    """生成可以直接传给WhisperModel.transcribe的解码参数"""
+    preset = {
+        "beam_size": beam_size,
+        "best_of": best_of,
+        "temperature": list(TEMPERATURE_MODES[temperature]),
+        "condition_on_previous_text": condition_on_previous_text,
+        "vad_filter": bool(vad_silence_ms),
+    }
+    if vad_silence_ms:
+        preset["vad_parameters"] = dict(min_silence_duration_ms=vad_silence_ms)
+    return preset
+
+
+def build_preset_grid(grid: Optional[Dict[str, List[Any]]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """展开搜索网格，返回 [(预设名称, 解码参数)]
+
+    只使用贪心解码(t0)时best_of不起作用，这类重复组合会被跳过。
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    presets = []
+    for beam_size, best_of, temperature, ctx, vad in itertools.product(
+        grid["beam_size"], grid["best_of"], grid["temperature"],
+        grid["condition_on_previous_text"], grid["vad_silence_ms"]
+    ):
+        if temperature == "t0" and best_of != grid["best_of"][0]:
+            continue
+        presets.append((preset_name(beam_size, best_of, temperature, ctx, vad),
+                        make_preset(beam_size, best_of, temperature, ctx, vad)))
+    return presets
+
+
+def get_preset(name: str) -> Optional[Dict[str, Any]]:
+    """根据预设名称还原解码参数，名称无效返回None"""
+    match = re.fullmatch(r"b(\d+)-bo(\d+)-(t0|tfb)-(ctx|noctx)-(?:vad(\d+)|novad)", name)
+    if not match:
+        return None
+    beam_size, best_of, temperature, ctx, vad = match.groups()
+    return make_preset(int(beam_size), int(best_of), temperature, ctx == "ctx", int(vad) if vad else None)
+
+
+def load_fixtures(fixture_dir: str) -> List[Tuple[str, str]]:
+    """加载标注好的测试集：每个音频文件旁边有同名的.txt参考文本
+
+    Returns:
+        [(音频路径, 参考文本)]
+    """
+    fixtures = []
+    for filename in sorted(os.listdir(fixture_dir)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        ref_path = os.path.join(fixture_dir, stem + ".txt")
+        if not os.path.exists(ref_path):
+            logger.warning(f"测试音频 {filename} 没有参考文本 {stem}.txt，已跳过")
+            continue
+        with open(ref_path, "r", encoding="utf-8") as f:
+            fixtures.append((os.path.join(fixture_dir, filename), f.read().strip()))
+    return fixtures
+
+
+def get_audio_duration(audio_path: str) -> float:
+    """获取音频时长(秒)"""
+    if audio_path.lower().endswith(".wav"):
+        with wave.open(audio_path, "rb") as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    from faster_whisper import decode_audio
+    return len(decode_audio(audio_path)) / 16000.0
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本用于计算错误率：统一全半角、小写，去掉标点"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+
+def edit_distance(ref: List[str], hyp: List[str]) -> int:
+    """计算两个序列的编辑距离"""
+    if not ref:
+        return len(hyp)
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1]
+
+
+def word_errors(ref: str, hyp: str) -> Tuple[int, int]:
+    """返回(词错误数, 参考词数)"""
+    ref_words = normalize_text(ref).split()
+    return edit_distance(ref_words, normalize_text(hyp).split()), len(ref_words)
+
+
+def char_errors(ref: str, hyp: str) -> Tuple[int, int]:
+    """返回(字错误数, 参考字数)，忽略空格"""
+    ref_chars = list(normalize_text(ref).replace(" ", ""))
+    hyp_chars = list(normalize_text(hyp).replace(" ", ""))
+    return edit_distance(ref_chars, hyp_chars), len(ref_chars)
+
+
+def evaluate_preset(engine, fixtures, preset: Dict[str, Any], language="zh") -> Dict[str, float]:
+    """用一个预设转写整个测试集，返回WER、CER和实时率(RTF)"""
+    word_err = word_total = char_err = char_total = fallbacks = 0
+    decode_time = audio_time = 0.0
+    for audio_path, reference in fixtures:
+        audio_time += get_audio_duration(audio_path)
+        start = time.perf_counter()
+        result = engine.transcribe(audio_file=audio_path, language=language, decode_options=preset)
+        decode_time += time.perf_counter() - start
+        if not result.ok:
+            raise RuntimeError(f"转写 {audio_path} 失败: {result.error}")
+        hypothesis = result.text
+        fallbacks += result.fallback_count
+        errors, total = word_errors(reference, hypothesis)
+        word_err += errors
+        word_total += total
+        errors, total = char_errors(reference, hypothesis)
+        char_err += errors
+        char_total += total
+    return {
+        "wer": word_err / max(1, word_total),
+        "cer": char_err / max(1, char_total),
+        "rtf": decode_time / max(1e-6, audio_time),
+        "decode_seconds": decode_time,
+        "audio_seconds": audio_time,
+        "fallbacks": fallbacks,
+    }
+
+
+def pareto_front(results: List[Dict[str, Any]], metric="cer") -> List[Dict[str, Any]]:
+    """返回在错误率和RTF两个维度上都不被其他预设支配的结果，按RTF排序"""
+    front = []
+    for candidate in results:
+        dominated = any(
+            other[metric] <= candidate[metric] and other["rtf"] <= candidate["rtf"]
+            and (other[metric] < candidate[metric] or other["rtf"] < candidate["rtf"])
+            for other in results
+        )
+        if not dominated:
+            front.append(candidate)
+    return sorted(front, key=lambda r: r["rtf"])
+
+
+def run_autotune(engine, fixture_dir: str, models: Optional[List[str]] = None, language="zh",
+                 grid: Optional[Dict[str, List[Any]]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """在本地测试集上对每个模型运行预设网格
+
+    Returns:
+        {模型名称: [每个预设的结果]}
+    """
+    fixtures = load_fixtures(fixture_dir)
+    if not fixtures:
+        raise ValueError(f"在 {fixture_dir} 中没有找到带参考文本的测试音频")
+    models = models or [m["name"] for m in engine.available_models]
+    if not models:
+        raise ValueError("没有可用的本地模型")
+    presets = build_preset_grid(grid)
+    logger.info(f"自动调优: {len(fixtures)} 个测试音频, {len(models)} 个模型, {len(presets)} 个预设")
+
+    all_results = {}
+    for model_name in models:
+        # 只使用本地模型，不触发下载
+        engine.load_model(model_name, allow_download=False)
+        results = []
+        for name, preset in presets:
+            metrics = evaluate_preset(engine, fixtures, preset, language)
+            metrics.update(name=name, preset=preset)
+            results.append(metrics)
+            logger.info(f"[{model_name}] {name}: WER={metrics['wer']:.3f} CER={metrics['cer']:.3f} RTF={metrics['rtf']:.3f}")
+        all_results[model_name] = results
+    return all_results
+
+
+def format_report(all_results: Dict[str, List[Dict[str, Any]]], metric="cer") -> str:
+    """格式化每个模型的帕累托最优预设"""
+    lines = []
+    for model_name, results in all_results.items():
+        lines.append(f"== {model_name}: 帕累托最优预设 ({metric.upper()} vs RTF) ==")
+        lines.append(f"{'preset':<28} {'WER':>7} {'CER':>7} {'RTF':>7}")
+        for r in pareto_front(results, metric):
+            lines.append(f"{r['name']:<28} {r['wer']:>7.3f} {r['cer']:>7.3f} {r['rtf']:>7.3f}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def save_results(all_results: Dict[str, List[Dict[str, Any]]], path: str) -> None:
+    """保存完整的调优结果(JSON)"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(all_results, f, indent=2, ensure_ascii=False)
+
+
+def apply_preset(config, model_name: str, name: str) -> Dict[str, Any]:
+    """把预设写入配置，transcribe()会对该模型使用这个预设"""
+    preset = get_preset(name)
+    if preset is None:
+        raise ValueError(f"无效的预设名称: {name}")
+    presets = dict(config.get("decode_presets") or {})
+    presets[model_name] = preset
+    config.set("decode_presets", presets)
+    logger.info(f"已为模型 {model_name} 保存解码预设 {name}")
+    return preset
@@ -0,0 +1,264 @@
+import time
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 共享内存头部(int64)各字段的下标
+WRITE_POS = 0   # 已写入的样本总数(单调递增，环形缓冲区中的位置为 WRITE_POS % 容量)
+HEARTBEAT = 1   # 子进程每次采集回调递增的心跳计数(输入流停止时不再变化)
+OVERFLOWS = 2   # PortAudio报告的输入溢出次数
+STATUS = 3      # 子进程状态
+HEADER_FIELDS = 8
+HEADER_BYTES = HEADER_FIELDS * 8
+
+STARTING, RUNNING, FAILED, STOPPED = 0, 1, 2, 3
+
+
+def _capture_main(shm_name, capacity, device_index, native_capture, stop_event, sample_rate=16000, chunk=1024):
+    """采集子进程入口：持有PortAudio输入流，把16kHz单声道int16写入共享内存环形缓冲区
+
+    子进程只做采集和重采样，不受主进程中推理、NumPy和界面占用GIL的影响。
+    """
+    import pyaudio
+    from core.resample import StreamingResampler
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+    ring = np.ndarray((capacity,), dtype=np.int16, buffer=shm.buf, offset=HEADER_BYTES)
+    pa = None
+    stream = None
+    try:
+        pa = pyaudio.PyAudio()
+        rate, channels = sample_rate, 1
+        if native_capture:
+            info = pa.get_device_info_by_index(device_index)
+            rate = int(round(info.get('defaultSampleRate') or sample_rate))
+            channels = max(1, min(2, int(info.get('maxInputChannels') or 1)))
+        resampler = StreamingResampler(rate, sample_rate, channels)
+
+        def callback(in_data, frame_count, time_info, status):
+            if status & pyaudio.paInputOverflow:
+                header[OVERFLOWS] += 1
+            samples = resampler.process(np.frombuffer(in_data, dtype=np.int16))
+            n = min(len(samples), capacity)
+            samples = samples[len(samples) - n:]
+            position = int(header[WRITE_POS])
+            start = position % capacity
+            first = min(n, capacity - start)
+            ring[start:start + first] = samples[:first]
+            ring[:n - first] = samples[first:]
+            # 数据写完后才更新写入位置，主进程不会读到写了一半的块
+            header[WRITE_POS] = position + n
+            header[HEARTBEAT] += 1
+            return (None, pyaudio.paContinue)
+
+        stream = pa.open(
+            format=pyaudio.paInt16,
+            channels=channels,
+            rate=rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=int(chunk * rate / sample_rate),
+            stream_callback=callback
+        )
+        header[STATUS] = RUNNING
+        parent = mp.parent_process()
+        while not stop_event.is_set():
+            if parent is not None and not parent.is_alive():
+                break
+            stop_event.wait(0.05)
+        header[STATUS] = STOPPED
+    except Exception:
+        header[STATUS] = FAILED
+        raise
+    finally:
+        if stream is not None:
+            stream.stop_stream()
+            stream.close()
+        if pa is not None:
+            pa.terminate()
+        del header, ring
+        shm.close()
+
+
+class CaptureProcess:
+    """在独立子进程中采集音频，通过共享内存环形缓冲区交给主进程
+
+    主进程的泵线程每poll_interval秒读取新写入的音频并交给callback(samples, 新增溢出次数, 新丢失的样本数)。
+    心跳由子进程的采集回调递增，输入流停止(例如设备拔出)和子进程卡住一样会让心跳停止。
+    心跳超过heartbeat_timeout秒没有变化或进程退出时自动重启，重启期间缺失的音频
+    不补零，记录在restarts中；重启失败后按restart_backoff秒起倍增(最多max_restart_backoff秒)
+    的间隔重试。主进程读取落后超过环形缓冲区容量时丢失的样本记录在lost_samples中。
+
+    提供与PyAudio流相同的stop_stream()/close()/is_active()，录音器可以把它当作输入流使用。
+    """
+
+    def __init__(self, device_index, callback, native_capture=True, ring_seconds=10.0, sample_rate=16000,
+                 heartbeat_timeout=2.0, poll_interval=0.02, start_timeout=10.0, restart_backoff=1.0,
+                 max_restart_backoff=30.0):
+        self.device_index = device_index
+        self.callback = callback
+        self.native_capture = native_capture
+        self.sample_rate = sample_rate
+        self.capacity = int(ring_seconds * sample_rate)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.poll_interval = poll_interval
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.restarts = 0
+        self.lost_samples = 0
+        self._ctx = mp.get_context("spawn")  # 主进程有Qt和推理线程，不能fork
+        self._shm = None
+        self._header = None
+        self._ring = None
+        self._process = None
+        self._stop_event = None
+        self._pump_thread = None
+        self._running = False
+        self._read_pos = 0
+        self._overflows_seen = 0
+        self._retry_delay = restart_backoff
+        self._next_restart = 0.0
+
+    def start(self):
+        """创建共享内存并启动子进程，等待输入流打开后返回self；失败时抛出RuntimeError"""
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + self.capacity * 2)
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self._shm.buf)
+        self._ring = np.ndarray((self.capacity,), dtype=np.int16, buffer=self._shm.buf, offset=HEADER_BYTES)
+        self._header[:] = 0
+        try:
+            self._spawn()
+        except Exception:
+            self.close()
+            raise
+        self._running = True
+        self._pump_thread = threading.Thread(target=self._pump, daemon=True)
+        self._pump_thread.start()
+        return self
+
+    def _spawn(self):
+        spawn_start = time.perf_counter()
+        self._header[STATUS] = STARTING
+        self._stop_event = self._ctx.Event()
+        self._process = self._ctx.Process(
+            target=_capture_main,
+            args=(self._shm.name, self.capacity, self.device_index, self.native_capture, self._stop_event,
+                  self.sample_rate),
+            daemon=True
+        )
+        self._process.start()
+        deadline = time.monotonic() + self.start_timeout
+        while self._header[STATUS] == STARTING:
+            if not self._process.is_alive() or time.monotonic() > deadline:
+                self._kill()
+                raise RuntimeError("采集子进程启动失败")
+            time.sleep(0.01)
+        if self._header[STATUS] != RUNNING:
+            self._kill()
+            raise RuntimeError("采集子进程打开输入流失败")
+        self._last_heartbeat = int(self._header[HEARTBEAT])
+        self._heartbeat_time = time.monotonic()
+        logger.info(f"采集子进程已启动 (pid {self._process.pid})，耗时 {(time.perf_counter() - spawn_start) * 1000:.0f}ms")
+
+    def _kill(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._process is not None:
+            self._process.join(1.0)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(1.0)
+            self._process = None
+
+    def _pump(self):
+        while self._running:
+            tick = time.perf_counter()
+            try:
+                self._check_health()
+                lost = self.lost_samples
+                samples = self._read_new()
+                overflows = int(self._header[OVERFLOWS])
+                new_overflows, self._overflows_seen = overflows - self._overflows_seen, overflows
+                if len(samples) or new_overflows:
+                    self.callback(samples, new_overflows, self.lost_samples - lost)
+            except Exception as e:
+                logger.error(f"读取采集子进程音频出错: {e}")
+            time.sleep(max(0.0, self.poll_interval - (time.perf_counter() - tick)))
+
+    def _read_new(self):
+        """复制自上次读取之后写入环形缓冲区的音频"""
+        end = int(self._header[WRITE_POS])
+        start = self._read_pos
+        if end - start > self.capacity:
+            self.lost_samples += end - start - self.capacity
+            logger.warning(f"主进程读取落后，丢失 {(end - start - self.capacity) / self.sample_rate:.2f}s 音频")
+            start = end - self.capacity
+        self._read_pos = end
+        first = start % self.capacity
+        count = max(0, end - start)
+        if first + count <= self.capacity:
+            return self._ring[first:first + count].copy()
+        return np.concatenate((self._ring[first:], self._ring[:first + count - self.capacity]))
+
+    def _check_health(self):
+        """心跳停止或子进程退出时重启子进程"""
+        heartbeat = int(self._header[HEARTBEAT])
+        now = time.monotonic()
+        if heartbeat != self._last_heartbeat:
+            self._last_heartbeat = heartbeat
+            self._heartbeat_time = now
+            return
+        alive = self._process is not None and self._process.is_alive()
+        if alive and now - self._heartbeat_time < self.heartbeat_timeout:
+            return
+        if now < self._next_restart:
+            return
+        logger.warning(f"采集子进程{'没有采集到音频' if alive else '已退出'}，正在重启")
+        self._kill()
+        self.restarts += 1
+        try:
+            # 写入位置保留在共享内存中，新进程从当前位置继续写
+            self._overflows_seen = int(self._header[OVERFLOWS])
+            self._spawn()
+            self._retry_delay = self.restart_backoff
+        except Exception as e:
+            logger.error(f"重启采集子进程失败: {e}，{self._retry_delay:.1f}s 后重试")
+            self._next_restart = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, self.max_restart_backoff)
+
+    def is_active(self):
+        return self._running
+
+    def stop_stream(self):
+        """停止泵线程和子进程"""
+        self._running = False
+        if self._pump_thread is not None and self._pump_thread is not threading.current_thread():
+            self._pump_thread.join(1.0)
+        self._pump_thread = None
+        self._kill()
+
+    def close(self):
+        """释放共享内存"""
+        if self._running:
+            self.stop_stream()
+        if self._shm is not None:
+            self._header = None
+            self._ring = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def stats(self):
+        return {
+            "pid": self._process.pid if self._process is not None else None,
+            "restarts": self.restarts,
+            "lost_samples": self.lost_samples,
+            "overflows": self._overflows_seen,
+            "pending_samples": int(self._header[WRITE_POS]) - self._read_pos if self._header is not None else 0,
+        }
@@ -0,0 +1,177 @@
+import time
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureStats:
+    """采集健康指标：每个块的时间戳、溢出和断档、回调抖动，以及采集到消费者的延迟
+
+    采集回调对每个块调用on_chunk()，记录块结束时的样本位置、单调时钟时间和
+    PortAudio流时间(ADC时间)。流时间的间隔明显大于块时长时记为一次断档；
+    很多宿主API的流时间总是0，子进程采集也没有流时间，这时用单调时钟判断：
+    经过的时间比收到的音频多出的部分(滞后)在连续lag_window个块中都明显增加，
+    说明有音频丢失；偶尔迟到又很快补上的回调不算断档，时钟漂移由基准缓慢跟随。
+    单调时钟间隔与块时长之差就是回调抖动。消费者读取到某个样本位置时调用consumed()，
+    用该位置所在块的采集时间计算延迟。
+
+    只在采集线程中写入，消费者线程只读取，没有加锁；统计值允许有轻微误差。
+    """
+
+    def __init__(self, sample_rate=16000, timeline_size=4096, latency_history=1000, lag_window=4,
+                 gap_tolerance_s=0.1):
+        self.sample_rate = sample_rate
+        self.timeline_size = timeline_size
+        self.latency_history = latency_history
+        self.lag_window = lag_window
+        self.gap_tolerance = gap_tolerance_s
+        self.reset()
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.chunks = 0
+        self.overflows = 0
+        self.gaps = 0
+        self.gap_seconds = 0.0
+        self._ends = np.zeros(self.timeline_size, dtype=np.int64)      # 每块结束的样本位置
+        self._times = np.zeros(self.timeline_size, dtype=np.float64)   # 每块被采集回调收到的单调时钟时间
+        self._last_time = None
+        self._last_stream_time = None
+        self._first_time = None
+        self._audio_seconds = 0.0  # 第一块之后收到(或已知丢失)的音频时长
+        self._lag_base = None
+        self._recent_lags = deque(maxlen=self.lag_window)
+        self._jitter_sum = 0.0
+        self._jitter_sq = 0.0
+        self._jitter_count = 0
+        self.max_jitter = 0.0
+        self.latencies = {}  # 消费者名 -> 最近的延迟(秒)
+
+    def on_chunk(self, position, duration, stream_time=None, overflows=0, now=None, missing=0.0):
+        """记录一个块
+
+        Args:
+            position: 块写入后采集缓冲区的结束位置(样本)
+            duration: 块的时长(秒)
+            stream_time: PortAudio回调time_info中的流时间，没有或为0时用单调时钟判断断档
+            overflows: 这个块报告的输入溢出次数
+            missing: 已知在这个块之前丢失的音频时长(秒)，例如子进程模式下主进程读取落后丢掉的部分
+        """
+        now = time.monotonic() if now is None else now
+        index = self.chunks % self.timeline_size
+        self._ends[index] = position
+        self._times[index] = now
+        self.overflows += int(overflows)
+        if missing > 0:
+            self._add_gap(missing)
+        if self._last_time is not None:
+            jitter = (now - self._last_time) - duration
+            self._jitter_sum += jitter
+            self._jitter_sq += jitter * jitter
+            self._jitter_count += 1
+            self.max_jitter = max(self.max_jitter, abs(jitter))
+        if stream_time and self._last_stream_time:
+            lost = (stream_time - self._last_stream_time) - duration
+            if lost > duration * 0.5:
+                self._add_gap(lost)
+        if self._first_time is None:
+            self._first_time = now
+        else:
+            # 已知丢失的部分计入音频时长，不会再被时钟判断重复计数
+            self._audio_seconds += duration + max(0.0, missing)
+            if not (stream_time and self._last_stream_time):
+                self._check_clock_gap(now, duration)
+        self._last_time = now
+        self._last_stream_time = stream_time
+        self.chunks += 1
+
+    def _add_gap(self, seconds):
+        self.gaps += 1
+        self.gap_seconds += seconds
+
+    def _check_clock_gap(self, now, duration):
+        """用单调时钟判断断档：持续的滞后比基准多出超过容差时记一次"""
+        lag = (now - self._first_time) - self._audio_seconds
+        self._recent_lags.append(lag)
+        if len(self._recent_lags) < self.lag_window:
+            return
+        sustained = min(self._recent_lags)  # 迟到后很快补上的回调不影响最小值
+        if self._lag_base is None:
+            self._lag_base = sustained
+            return
+        lost = sustained - self._lag_base
+        if lost > max(duration, self.gap_tolerance):
+            self._add_gap(lost)
+            self._lag_base = sustained
+        else:
+            # 缓慢跟随采样时钟与单调时钟的漂移
+            self._lag_base += (sustained - self._lag_base) * 0.05
+
+    def capture_time(self, position):
+        """返回包含样本position的块被采集的时间，已经不在时间线中时返回None"""
+        count = min(self.chunks, self.timeline_size)
+        if count == 0:
+            return None
+        start = self.chunks - count
+        order = (np.arange(start, self.chunks) % self.timeline_size)
+        ends = self._ends[order]
+        i = int(np.searchsorted(ends, position, side="right"))
+        if i >= count or (i == 0 and start > 0):
+            return None
+        return float(self._times[order[i]])
+
+    def consumed(self, name, position, now=None):
+        """消费者已经读取到样本位置position(不含)时调用，记录最后一个样本的采集到消费延迟"""
+        if position <= 0:
+            return
+        captured = self.capture_time(position - 1)
+        if captured is None:
+            return
+        now = time.monotonic() if now is None else now
+        history = self.latencies.get(name)
+        if history is None:
+            history = self.latencies[name] = deque(maxlen=self.latency_history)
+        history.append(now - captured)
+
+    @property
+    def jitter(self):
+        """回调间隔抖动的标准差(秒)"""
+        if self._jitter_count < 2:
+            return 0.0
+        mean = self._jitter_sum / self._jitter_count
+        return float(np.sqrt(max(0.0, self._jitter_sq / self._jitter_count - mean * mean)))
+
+    def metrics(self):
+        metrics = {
+            "capture_seconds": time.monotonic() - self.started,
+            "capture_chunks": self.chunks,
+            "capture_overflows": self.overflows,
+            "capture_gaps": self.gaps,
+            "capture_gap_ms": self.gap_seconds * 1000,
+            "capture_jitter_ms": self.jitter * 1000,
+            "capture_max_jitter_ms": self.max_jitter * 1000,
+        }
+        for name, history in self.latencies.items():
+            if history:
+                values = np.fromiter(history, dtype=np.float64)
+                metrics[f"latency_{name}_ms"] = float(np.mean(values)) * 1000
+                metrics[f"latency_{name}_p95_ms"] = float(np.percentile(values, 95)) * 1000
+        return metrics
+
+    def log_summary(self):
+        m = self.metrics()
+        latencies = ", ".join(
+            f"{name} {m[f'latency_{name}_ms']:.0f}ms (p95 {m[f'latency_{name}_p95_ms']:.0f}ms)"
+            for name in self.latencies if f"latency_{name}_ms" in m
+        )
+        message = (f"采集统计: {m['capture_seconds']:.1f}s, {m['capture_chunks']} 块, 溢出 {m['capture_overflows']} 次, "
+                   f"断档 {m['capture_gaps']} 次 ({m['capture_gap_ms']:.0f}ms), "
+                   f"回调抖动 {m['capture_jitter_ms']:.1f}ms (最大 {m['capture_max_jitter_ms']:.1f}ms)"
+                   + (f", 采集到消费延迟: {latencies}" if latencies else ""))
+        if m["capture_overflows"] or m["capture_gaps"]:
+            logger.warning(message)
+        else:
+            logger.info(message)
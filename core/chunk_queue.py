@@ -0,0 +1,116 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+MERGE = "merge"
+POLICIES = (BLOCK, DROP_OLDEST, MERGE)
+
+
+def _join(chunks):
+    return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+
+class ChunkQueue:
+    """采集和下游消费者之间的有界音频块队列，满了以后按策略处理
+
+    - block: put()等待消费者腾出空间；offer()不等待，队列满时拒绝并计数
+    - drop_oldest: 丢弃最旧的块，只保证最新的音频(例如电平显示)
+    - merge: 把新块合并到队尾的槽位上，槽位数有界且不丢音频(例如实时转写)
+
+    每个槽位是一个块列表，合并只追加引用，拼接在消费者调用get()/drain()时完成，
+    采集回调只调用offer()，任何策略下都不会阻塞，耗时也不随积压增长。
+    """
+
+    def __init__(self, name, maxsize=8, policy=MERGE):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._items = deque()  # 槽位列表，每个槽位是按顺序合并的块列表
+        self._cond = threading.Condition()
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0   # drop_oldest丢弃的块数
+        self.merged = 0    # merge合并的块数
+        self.rejected = 0  # block策略下offer()被拒绝的块数
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def offer(self, chunk):
+        """不等待地放入一块，返回是否放入(只有block策略会拒绝)"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    self.rejected += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self._items[-1].append(chunk)
+                    self.merged += 1
+                    self.put_count += 1
+                    self._cond.notify()
+                    return True
+            self._items.append([chunk])
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify()
+            return True
+
+    def put(self, chunk, timeout=None):
+        """放入一块；block策略下队列满时等待，最多timeout秒，超时返回False"""
+        if self.policy != BLOCK:
+            return self.offer(chunk)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            self._items.append([chunk])
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """取出最旧的一块，超时返回None"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            self.get_count += 1
+            chunks = self._items.popleft()
+            self._cond.notify_all()
+        return _join(chunks)
+
+    def drain(self, timeout=None):
+        """取出全部排队的块并拼接为一个数组，超时返回None"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            chunks = [chunk for slot in self._items for chunk in slot]
+            self.get_count += len(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        return _join(chunks)
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "put": self.put_count,
+            "get": self.get_count,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "rejected": self.rejected,
+            "max_depth": self.max_depth,
+        }
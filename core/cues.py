@@ -0,0 +1,128 @@
+import queue
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 提示音定义: (频率Hz, 时长s) 序列，频率为0表示停顿
+CUES = {
+    "start": [(440, 0.2)],                      # 开始录音
+    "done": [(440, 0.2), (0, 0.1), (880, 0.2)],  # 转写完成
+}
+VOLUME = 0.5
+FADE_S = 0.005  # 淡入淡出，避免爆音
+
+
+def synthesize(parts, sample_rate, volume=VOLUME):
+    """按 (频率, 时长) 序列生成float32提示音"""
+    pieces = []
+    fade = int(FADE_S * sample_rate)
+    for freq, duration in parts:
+        n = int(sample_rate * duration)
+        if freq <= 0:
+            pieces.append(np.zeros(n, dtype=np.float32))
+            continue
+        tone = np.sin(2 * np.pi * freq * np.arange(n) / sample_rate).astype(np.float32) * volume
+        ramp = np.linspace(0.0, 1.0, min(fade, n // 2), dtype=np.float32)
+        tone[:len(ramp)] *= ramp
+        tone[n - len(ramp):] *= ramp[::-1]
+        pieces.append(tone)
+    return np.concatenate(pieces)
+
+
+class CuePlayer:
+    """异步提示音播放器
+
+    提示音按输出设备的采样率只合成一次，由后台线程在常开的输出流上播放，
+    play()只是把提示音放入队列，不会阻塞开始录音或界面线程。
+    输出流空闲idle_close_s秒后关闭，下次播放时重新打开，避免一直占用输出设备。
+    """
+
+    def __init__(self, host=None, idle_close_s=30.0):
+        if host is None:
+            from core.audio_host import get_audio_host
+            host = get_audio_host()
+        self.host = host
+        self.idle_close_s = idle_close_s
+        self._queue = queue.Queue()
+        self._stream = None
+        self._sample_rate = None
+        self._sounds = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def play(self, name):
+        """在后台播放提示音，立即返回"""
+        if name not in CUES:
+            logger.warning(f"未知的提示音: {name}")
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(name)
+
+    @staticmethod
+    def duration(name):
+        """提示音的时长(秒)"""
+        return sum(seconds for _, seconds in CUES.get(name, ()))
+
+    def release(self, timeout=1.0):
+        """关闭输出流(例如刷新音频设备前)，等待后台线程完成"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_close_s)
+            except queue.Empty:
+                self._close_stream()
+                continue
+            if isinstance(item, threading.Event):
+                self._close_stream()
+                item.set()
+                continue
+            try:
+                self._open_stream()
+                self._stream.write(self._sounds[item].tobytes())
+            except Exception as e:
+                logger.warning(f"播放提示音失败: {e}")
+                self._close_stream()
+
+    def _open_stream(self):
+        if self._stream is not None:
+            return
+        import pyaudio
+        try:
+            sample_rate = int(self.host.pa.get_default_output_device_info().get('defaultSampleRate') or 16000)
+        except Exception:
+            sample_rate = 16000
+        if sample_rate != self._sample_rate:
+            self._sounds = {name: synthesize(parts, sample_rate) for name, parts in CUES.items()}
+            self._sample_rate = sample_rate
+        self._stream = self.host.open(format=pyaudio.paFloat32, channels=1, rate=sample_rate, output=True)
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                self.host.close(stream)
+            except Exception as e:
+                logger.warning(f"关闭提示音输出流失败: {e}")
+
+
+_player = None
+
+
+def get_cue_player():
+    """返回进程内共享的提示音播放器"""
+    global _player
+    if _player is None:
+        _player = CuePlayer()
+    return _player
@@ -0,0 +1,247 @@
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 10  # 噪声门和自动增益按10ms帧计算电平
+
+
+def _db_to_amplitude(db):
+    return 10.0 ** (db / 20.0)
+
+
+def _frame_rms(samples, frame):
+    """按帧计算RMS(int16幅度)，不足一帧的尾部不参与计算；不足一帧的块作为一帧"""
+    n_frames = max(1, len(samples) // frame)
+    usable = samples[:n_frames * frame] if len(samples) >= frame else samples
+    blocks = usable.reshape(n_frames, -1)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    return rms, n_frames
+
+
+def _sample_gains(previous, frame_gains, frame, length):
+    """把每帧的增益线性插值到每个样本，从上一块结束时的增益平滑过渡，避免爆音
+
+    frame_gains[i]对应第i帧结束的位置，最后一帧之后保持不变。
+    """
+    points = np.concatenate([[previous], frame_gains])
+    x = np.arange(len(points)) * frame
+    return np.interp(np.arange(1, length + 1), x, points).astype(np.float32)
+
+
+class HighPassFilter:
+    """一阶高通滤波器(去除直流偏置和低频隆隆声)
+
+    y[n] = a * (y[n-1] + x[n] - x[n-1])。递推按子块用闭式解向量化：
+    y[n] = a^n * (y[0] + sum_k a^(1-k) * d[k])，子块长度限制a^-k的范围以保证精度。
+    """
+
+    name = "highpass"
+
+    def __init__(self, cutoff_hz=80.0, sample_rate=16000, block=256):
+        self.a = float(np.exp(-2 * np.pi * cutoff_hz / sample_rate))
+        self.block = block
+        powers = self.a ** np.arange(1, block + 1)
+        self._powers = powers
+        self._inverse = self.a / powers
+        self.reset()
+
+    def reset(self):
+        self._last_x = 0.0
+        self._last_y = 0.0
+
+    def process(self, x):
+        out = np.empty(len(x), dtype=np.float32)
+        diff = np.diff(x, prepend=self._last_x)
+        for i in range(0, len(x), self.block):
+            d = diff[i:i + self.block]
+            n = len(d)
+            y = self._powers[:n] * (self._last_y + np.cumsum(d * self._inverse[:n]))
+            out[i:i + n] = y
+            self._last_y = y[-1]
+        if len(x):
+            self._last_x = float(x[-1])
+        return out
+
+
+class NoiseGate:
+    """噪声门：电平低于阈值超过hold时间后把增益降到floor_db，高于阈值时立即打开
+
+    按帧判断，帧增益按attack/release时间常数平滑后插值到样本，只衰减不静音，
+    避免把弱音节完全切掉。
+    """
+
+    name = "gate"
+
+    def __init__(self, threshold_db=-50.0, floor_db=-20.0, hold_ms=150, attack_ms=5, release_ms=80,
+                 sample_rate=16000):
+        self.threshold = _db_to_amplitude(threshold_db) * 32768
+        self.floor = _db_to_amplitude(floor_db)
+        self.frame = int(sample_rate * FRAME_MS / 1000)
+        self.hold_frames = max(1, hold_ms // FRAME_MS)
+        self.attack = 1.0 - np.exp(-FRAME_MS / max(attack_ms, 1e-3))
+        self.release = 1.0 - np.exp(-FRAME_MS / max(release_ms, 1e-3))
+        self.reset()
+
+    def reset(self):
+        self.gain = 1.0
+        self._quiet_frames = 0
+
+    def process(self, x):
+        if len(x) == 0:
+            return x
+        rms, n_frames = _frame_rms(x, self.frame)
+        gains = np.empty(n_frames, dtype=np.float32)
+        gain = self.gain
+        for i, open_ in enumerate(rms > self.threshold):
+            self._quiet_frames = 0 if open_ else self._quiet_frames + 1
+            target = self.floor if self._quiet_frames > self.hold_frames else 1.0
+            gain += (target - gain) * (self.attack if target > gain else self.release)
+            gains[i] = gain
+        out = x * _sample_gains(self.gain, gains, len(x) / n_frames, len(x))
+        self.gain = gain
+        return out
+
+
+class AutoGain:
+    """自动增益：跟踪语音帧的电平，把它缓慢调整到target_dbfs
+
+    只用高于gate_db的帧更新电平估计，静音时保持增益不变，避免放大底噪。
+    增益上限max_gain_db，超出int16范围的部分由tanh软限幅。
+    """
+
+    name = "agc"
+
+    def __init__(self, target_dbfs=-20.0, max_gain_db=20.0, min_gain_db=-10.0, gate_db=-45.0,
+                 time_constant_s=1.5, sample_rate=16000):
+        self.target = _db_to_amplitude(target_dbfs) * 32768
+        self.max_gain = _db_to_amplitude(max_gain_db)
+        self.min_gain = _db_to_amplitude(min_gain_db)
+        self.gate = _db_to_amplitude(gate_db) * 32768
+        self.frame = int(sample_rate * FRAME_MS / 1000)
+        self.smoothing = 1.0 - np.exp(-FRAME_MS / 1000 / time_constant_s)
+        self.reset()
+
+    def reset(self):
+        self.gain = 1.0
+        self.level = None  # 语音电平估计(int16幅度)
+
+    def process(self, x):
+        if len(x) == 0:
+            return x
+        rms, _ = _frame_rms(x, self.frame)
+        speech = rms[rms > self.gate]
+        if len(speech):
+            level = self.level if self.level is not None else float(speech[0])
+            # 逐帧指数平滑，块内的语音帧近似按平均电平合并
+            decay = (1.0 - self.smoothing) ** len(speech)
+            level = level * decay + float(np.mean(speech)) * (1.0 - decay)
+            self.level = level
+        target_gain = self.gain if self.level is None else float(
+            np.clip(self.target / max(self.level, 1.0), self.min_gain, self.max_gain))
+        out = x * _sample_gains(self.gain, [target_gain], len(x), len(x))
+        self.gain = target_gain
+        # 软限幅：接近满幅时平滑压缩，而不是硬削波
+        limit = 32767.0
+        loud = np.abs(out) > 0.5 * limit
+        if loud.any():
+            out[loud] = np.sign(out[loud]) * (0.5 * limit + 0.5 * limit * np.tanh(
+                (np.abs(out[loud]) - 0.5 * limit) / (0.5 * limit)))
+        return out
+
+
+FILTERS = {
+    "highpass": HighPassFilter,
+    "gate": NoiseGate,
+    "agc": AutoGain,
+}
+
+
+class DSPChain:
+    """采集和推理之间的流式处理链，在采集回调中逐块处理int16音频
+
+    每个滤波器保存跨块的状态。每块有CPU预算budget_ms，连续over_budget_limit块
+    超出预算时，链中最后一个仍在运行的滤波器在本次录音剩余的时间里停用，
+    采集回调不会因为处理变慢而溢出。只按块跳过滤波器会让增益和直流在块之间跳变、
+    滤波器状态过期，在录音中产生咔嗒声，所以降级只发生一次且一直保持到reset()/restore()。
+    bypass为True时直接返回输入。
+    """
+
+    def __init__(self, filters=("highpass", "gate", "agc"), sample_rate=16000, budget_ms=2.0, bypass=False,
+                 over_budget_limit=3):
+        self.filters = [FILTERS[name](sample_rate=sample_rate) for name in filters]
+        self.active = list(self.filters)  # 当前仍在运行的滤波器
+        self.budget = budget_ms / 1000.0
+        self.bypass = bypass
+        self.over_budget_limit = over_budget_limit
+        self._over_budget_run = 0
+        self.reset_stats()
+
+    @classmethod
+    def from_config(cls, config, sample_rate=16000):
+        return cls(filters=config.get("dsp_filters", ["highpass", "gate", "agc"]), sample_rate=sample_rate,
+                   budget_ms=config.get("dsp_budget_ms", 2.0), bypass=config.get("dsp_bypass", True))
+
+    def reset(self):
+        """清除全部滤波器状态并重新启用停用的滤波器(新的输入流或新的录音开始时)"""
+        for f in self.filters:
+            f.reset()
+        self.active = list(self.filters)
+        self._over_budget_run = 0
+
+    def restore(self):
+        """重新启用停用的滤波器(清除它们过期的状态)，仍在运行的滤波器保持状态，用于连续的常开输入流"""
+        for f in self.filters:
+            if f not in self.active:
+                f.reset()
+        self.active = list(self.filters)
+        self._over_budget_run = 0
+
+    def reset_stats(self):
+        self.chunks = 0
+        self.samples = 0
+        self.over_budget = 0  # 超出预算的块数
+        self.dropped = []  # 因超出预算停用的滤波器
+        self.seconds = {f.name: 0.0 for f in self.filters}
+
+    def process(self, samples):
+        """处理一块int16音频，返回int16"""
+        if self.bypass or not self.active:
+            return samples
+        start = time.perf_counter()
+        x = samples.astype(np.float32)
+        tick = start
+        for f in self.active:
+            x = f.process(x)
+            now = time.perf_counter()
+            self.seconds[f.name] += now - tick
+            tick = now
+        self.chunks += 1
+        self.samples += len(samples)
+        if tick - start > self.budget:
+            self.over_budget += 1
+            self._over_budget_run += 1
+            if self._over_budget_run >= self.over_budget_limit:
+                self._drop_last()
+        else:
+            self._over_budget_run = 0
+        return np.clip(x, -32768, 32767).astype(np.int16)
+
+    def _drop_last(self):
+        """停用最后一个滤波器直到reset()/restore()(在采集回调中调用，日志很少触发)"""
+        dropped = self.active[-1]
+        self.active = self.active[:-1]
+        self.dropped.append(dropped.name)
+        self._over_budget_run = 0
+        logger.warning(f"音频处理链连续 {self.over_budget_limit} 块超出 {self.budget * 1000:.1f}ms 预算，"
+                       f"本次录音停用 {dropped.name}")
+
+    def log_stats(self, sample_rate=16000):
+        if self.bypass or not self.chunks:
+            return
+        audio_seconds = self.samples / sample_rate
+        costs = ", ".join(f"{name} {seconds * 1000 / audio_seconds:.2f}ms/s" for name, seconds in self.seconds.items())
+        dropped = f", 停用 {', '.join(self.dropped)}" if self.dropped else ""
+        logger.debug(f"音频处理链: {self.chunks} 块, 超出预算 {self.over_budget} 块{dropped}, {costs}")
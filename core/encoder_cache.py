@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EncoderCache:
+    """按特征哈希缓存Whisper编码器输出
+
+    安装后替换WhisperModel实例上的encode方法，faster-whisper内部对每个30秒窗口
+    调用encode时先用特征的blake2b哈希查找缓存。实时预览每次重新转写整段录音，
+    前面已经完整的窗口特征不变，只有末尾获得新音频的窗口需要重新编码。
+    """
+
+    def __init__(self, model, max_entries=12):
+        self.logger = logging.getLogger(__name__)
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._encode = model.encode
+        model.encode = self.encode
+
+    @staticmethod
+    def feature_key(features):
+        features = np.ascontiguousarray(features)
+        digest = hashlib.blake2b(features.view(np.uint8), digest_size=16)
+        digest.update(str(features.shape).encode())
+        return digest.hexdigest()
+
+    def encode(self, features):
+        key = self.feature_key(features)
+        with self._lock:
+            output = self._entries.get(key)
+            if output is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return output
+            self.misses += 1
+
+        output = self._encode(features)
+        with self._lock:
+            self._entries[key] = output
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return output
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self):
+        """返回 (命中次数, 未命中次数)，用于计算一次转写期间的命中率"""
+        return self.hits, self.misses
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def uninstall(self):
+        """恢复模型原来的encode方法并释放缓存"""
+        self.clear()
+        self.model.encode = self._encode
@@ -0,0 +1,147 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE  # Whisper每次编码30秒
+
+
+def frame_energies_db(samples, frame_samples):
+    """把int16/float音频按帧计算能量(dBFS)，返回每帧的dB值(向量化)"""
+    samples = np.asarray(samples)
+    n_frames = len(samples) // frame_samples
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:n_frames * frame_samples].reshape(n_frames, frame_samples).astype(np.float32)
+    if samples.dtype == np.int16:
+        frames *= 1.0 / 32768.0
+    power = np.mean(frames * frames, axis=1)
+    return (10.0 * np.log10(np.maximum(power, 1e-10))).astype(np.float32)
+
+
+def split_windows(audio, window_samples=WINDOW_SAMPLES, search_s=5.0, sample_rate=SAMPLE_RATE):
+    """把音频切成不超过30秒的窗口，切点选在每个窗口最后search_s秒内能量最低的位置
+
+    Returns:
+        [(开始样本, 结束样本)]
+    """
+    frame_samples = int(sample_rate * 0.03)
+    search = int(search_s * sample_rate)
+    windows = []
+    start = 0
+    while len(audio) - start > window_samples:
+        tail_start = start + window_samples - search
+        energies = frame_energies_db(audio[tail_start:start + window_samples], frame_samples)
+        cut = tail_start + int(np.argmin(energies)) * frame_samples + frame_samples // 2 if len(energies) else start + window_samples
+        windows.append((start, cut))
+        start = cut
+    if start < len(audio):
+        windows.append((start, len(audio)))
+    return windows
+
+
+class EnergyEndpointDetector:
+    """基于能量的语音端点检测
+
+    以固定长度的帧计算能量，阈值取 max(最低阈值, 噪声底 + 余量)。
+    可以流式地逐块输入音频，跟踪是否检测到语音以及末尾静音的长度；
+    也可以对整段录音一次性分析。
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=30, min_threshold_db=-50.0, margin_db=12.0,
+                 min_speech_ms=200, max_threshold_db=-35.0):
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.min_threshold_db = min_threshold_db
+        self.margin_db = margin_db
+        self.max_threshold_db = max_threshold_db
+        self.min_speech_frames = max(1, int(min_speech_ms / frame_ms))
+        self.reset()
+
+    def reset(self, ignore_until=0):
+        """重置流式检测状态，ignore_until之前的音频(例如开始提示音)当作静音，不更新噪声底"""
+        self.ignore_until = ignore_until
+        self.noise_floor_db = -60.0
+        self.position = 0  # 已处理的样本数
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._speech_run = 0
+        self.speech_seen = False
+        self.speech_start = None  # 第一段语音开始的样本位置
+        self.last_speech_end = None  # 最近一帧语音结束的样本位置
+
+    @property
+    def threshold_db(self):
+        return max(self.min_threshold_db, self.noise_floor_db + self.margin_db)
+
+    def process(self, samples):
+        """流式输入一块音频，更新语音/静音状态"""
+        if len(samples) == 0:
+            return
+        data = np.concatenate((self._pending, samples)) if len(self._pending) else np.asarray(samples)
+        energies = frame_energies_db(data, self.frame_samples)
+        used = len(energies) * self.frame_samples
+        self._pending = data[used:].copy()
+
+        for energy in energies:
+            frame_end = self.position + self.frame_samples
+            if self.position < self.ignore_until:
+                self._speech_run = 0
+            elif energy > self.threshold_db:
+                self._speech_run += 1
+                # 连续多帧超过阈值才认为是语音，避免按键声等短促噪声
+                if self._speech_run >= self.min_speech_frames:
+                    if not self.speech_seen:
+                        self.speech_start = frame_end - self._speech_run * self.frame_samples
+                    self.speech_seen = True
+                    self.last_speech_end = frame_end
+            else:
+                self._speech_run = 0
+                # 噪声底快速下降、缓慢上升
+                if energy < self.noise_floor_db:
+                    self.noise_floor_db = float(energy)
+                else:
+                    self.noise_floor_db += (float(energy) - self.noise_floor_db) * 0.01
+            self.position = frame_end
+
+    def trailing_silence_ms(self):
+        """返回最后一段语音之后的静音时长(毫秒)，还没有检测到语音时返回0"""
+        if not self.speech_seen or self.last_speech_end is None:
+            return 0.0
+        return (self.position - self.last_speech_end) * 1000.0 / self.sample_rate
+
+    def speech_mask(self, samples, ignore=None):
+        """对整段音频计算每帧是否为语音(向量化)，噪声底取能量的低分位数
+
+        整段都是语音时低分位数也是语音的能量，所以阈值不超过max_threshold_db，
+        宁可把静音当成语音，也不把语音当成静音。
+        ignore为 (开始样本, 结束样本) 时，与这个范围重叠的帧(例如开始提示音)当作静音。
+        """
+        energies = frame_energies_db(samples, self.frame_samples)
+        if len(energies) == 0:
+            return np.zeros(0, dtype=bool)
+        noise_floor = float(np.percentile(energies, 10))
+        threshold = min(max(self.min_threshold_db, noise_floor + self.margin_db), self.max_threshold_db)
+        mask = energies > threshold
+        if ignore is not None:
+            first = max(0, ignore[0] // self.frame_samples)
+            last = max(0, -(-ignore[1] // self.frame_samples))
+            mask[first:last] = False
+        # 去掉短于最小语音长度的孤立片段
+        if self.min_speech_frames > 1 and mask.any():
+            run_sums = np.convolve(mask.astype(np.int32), np.ones(self.min_speech_frames, dtype=np.int32), mode="valid")
+            long_enough = run_sums >= self.min_speech_frames
+            keep = np.zeros_like(mask)
+            for offset in range(self.min_speech_frames):
+                keep[offset:offset + len(long_enough)] |= long_enough
+            mask &= keep
+        return mask
+
+    def has_speech(self, samples, ignore=None):
+        """判断整段音频中是否包含语音"""
+        return bool(self.speech_mask(samples, ignore).any())
+
+    def speech_bounds(self, samples, ignore=None):
+        """返回整段音频中语音的 (开始样本, 结束样本)，没有语音返回None"""
+        mask = self.speech_mask(samples, ignore)
+        indices = np.flatnonzero(mask)
+        if len(indices) == 0:
+            return None
+        return int(indices[0] * self.frame_samples), int((indices[-1] + 1) * self.frame_samples)
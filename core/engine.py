@@ -4,6 +4,11 @@ import logging
 from huggingface_hub import snapshot_download
 import psutil
 from utils.config import Config
+from core.result import TranscriptionResult
+from core.encoder_cache import EncoderCache
+from utils.thread_budget import get_thread_budget
+from utils.system_resources import get_available_cpus, get_memory_gb
+from utils.model_paths import MODEL_REPOS, get_hf_cache_dir, get_repo_cache_dir, get_repo_id, resolve_local_model
 import sys
 import tempfile
 import numpy as np
@@ -17,6 +22,18 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
 logger = logging.getLogger(__name__)
 
+# int8 推理时各模型大致需要的内存(GB)
+MODEL_MIN_MEMORY_GB = {
+    "large-v3": 4.0,
+    "distil-large-v3": 3.0,
+    "medium": 2.5,
+    "distil-medium.en": 2.0,
+    "small": 1.5,
+    "distil-small.en": 1.5,
+    "base": 1.0,
+    "tiny": 0.5,
+}
+
 class WhisperEngine:
     def __init__(self, config: Config):
         self.config = config
@@ -27,6 +44,9 @@ class WhisperEngine:
         self.initialized = False
         self.buffer = []  # 用于实时转写的音频数据缓冲区
         self.buffer_size = 0  # 当前缓冲区大小(字节)
+        self.draft_model = None  # 草稿-验证解码使用的蒸馏模型
+        self.speculative = None
+        self.encoder_cache = None  # 编码器输出缓存，只在实时转写时安装
         self.available_models = self._detect_models()
         
     def _detect_models(self) -> List[Dict[str, Any]]:
@@ -34,20 +54,12 @@ class WhisperEngine:
         self.logger.info("Detecting downloaded models...")
         available_models = []
         
-        # 检查模型是否已下载
-        model_checks = [
-            ("large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-large-v3")),
-            ("medium", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-medium")),
-            ("small", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-small")),
-            ("base", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-base")),
-            ("tiny", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-tiny")),
-            ("distil-large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-large-v3")),
-            ("distil-small.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-small.en")),
-            ("distil-medium.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-medium.en"))
-        ]
+        models_dir = getattr(self.config, "models_dir", None)
         
-        for model_name, model_path in model_checks:
-            if os.path.exists(model_path):
+        # 检查模型是否已下载（只查找本地快照，不访问网络）
+        for model_name in MODEL_REPOS:
+            model_path = resolve_local_model(model_name, models_dir)
+            if model_path:
                 self.logger.info(f"Found {model_name} model at: {model_path}")
                 available_models.append({
                     "name": model_name,
@@ -63,37 +75,28 @@ class WhisperEngine:
         return available_models
     
     def _get_optimal_threads_for_model(self, model_name: str) -> int:
-        """根据模型和系统资源，返回最优的线程数"""
-        cpu_count = psutil.cpu_count(logical=False)
-        if cpu_count is None:
-            cpu_count = psutil.cpu_count(logical=True)
-            if cpu_count is None:
-                cpu_count = 2
+        """根据模型和全局线程预算，返回最优的线程数"""
+        return get_thread_budget().inference_threads(model_name)
         
-        if model_name == "large-v3" or model_name == "distil-large-v3":
-            return min(cpu_count, 8)  # 使用最多8个线程
-        elif model_name == "medium" or model_name == "distil-medium.en":
-            return min(cpu_count, 6)  # 使用最多6个线程
-        elif model_name == "small" or model_name == "distil-small.en":
-            return min(cpu_count, 4)  # 使用最多4个线程
-        else:  # base, tiny or other
-            return min(cpu_count, 2)  # 使用最多2个线程
+    def _fits_memory(self, model_name: str, system_ram: float) -> bool:
+        """检查可用内存(考虑cgroup限制)是否足够运行该模型"""
+        required = MODEL_MIN_MEMORY_GB.get(model_name, 1.0)
+        if system_ram and system_ram < required:
+            self.logger.info(f"可用内存 {system_ram:.1f} GB 不足以运行 {model_name} (需要约 {required} GB)，跳过")
+            return False
+        return True
         
     def get_optimal_settings(self) -> Dict[str, Any]:
         """根据系统资源情况，优化配置参数"""
         # 检查系统内存和CPU
-        system_ram = psutil.virtual_memory().total / (1024 ** 3)  # GB
-        cpu_count = psutil.cpu_count(logical=False)
-        if cpu_count is None:
-            cpu_count = psutil.cpu_count(logical=True)
-            if cpu_count is None:
-                cpu_count = 2
+        system_ram = get_memory_gb()  # GB，考虑cgroup内存限制
+        cpu_count = get_available_cpus()  # 考虑CPU亲和性和cgroup配额
                 
         # 首先检查是否有可用的已下载模型
         if self.available_models:
             # 优先使用large-v3
             for model_info in self.available_models:
-                if model_info["name"] == "large-v3":
+                if model_info["name"] == "large-v3" and self._fits_memory("large-v3", system_ram):
                     self.logger.info(f"Using pre-downloaded large-v3 model")
                     return {
                         "model_name": "large-v3",
@@ -105,7 +108,7 @@ class WhisperEngine:
             
             # 如果没有large-v3，但有medium
             for model_info in self.available_models:
-                if model_info["name"] == "medium":
+                if model_info["name"] == "medium" and self._fits_memory("medium", system_ram):
                     self.logger.info(f"Using pre-downloaded medium model")
                     return {
                         "model_name": "medium",
@@ -117,7 +120,7 @@ class WhisperEngine:
             
             # 如果没有medium，但有small
             for model_info in self.available_models:
-                if model_info["name"] == "small":
+                if model_info["name"] == "small" and self._fits_memory("small", system_ram):
                     self.logger.info(f"Using pre-downloaded small model")
                     return {
                         "model_name": "small",
@@ -127,8 +130,11 @@ class WhisperEngine:
                         "threads": model_info["threads"]
                     }
             
-            # 使用任何已下载的模型
-            model_info = self.available_models[0]
+            # 使用任何内存足够的已下载模型，都不够时使用需要内存最少的模型
+            model_info = next(
+                (m for m in self.available_models if self._fits_memory(m["name"], system_ram)),
+                None
+            ) or min(self.available_models, key=lambda m: MODEL_MIN_MEMORY_GB.get(m["name"], 1.0))
             self.logger.info(f"Using pre-downloaded {model_info['name']} model")
             return {
                 "model_name": model_info["name"],
@@ -141,35 +147,35 @@ class WhisperEngine:
         # 如果没有已下载的模型，根据系统资源选择
         self.logger.info("No downloaded models found, selecting based on system resources")
         # 检查是否已下载大模型
-        large_model_path = os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-large-v3")
-        if os.path.exists(large_model_path):
+        large_model_path = resolve_local_model("large-v3", getattr(self.config, "models_dir", None))
+        if large_model_path and self._fits_memory("large-v3", system_ram):
             self.logger.info(f"Found large-v3 model at: {large_model_path}")
             model_name = "large-v3"
             compute_type = "int8"
             beam_size = 5
             # 对于多核CPU，使用更多线程
-            threads = min(cpu_count, 8)  # 使用最多8个线程，避免过度使用
+            threads = self._get_optimal_threads_for_model(model_name)
         # 如果系统内存>=16GB且CPU核心数>=8，使用medium模型
         elif system_ram >= 16 and cpu_count >= 8:
             self.logger.info(f"System has {system_ram:.1f} GB RAM and {cpu_count} CPU cores. Using medium model.")
             model_name = "medium"
             compute_type = "int8"
             beam_size = 5
-            threads = min(cpu_count, 6)  # 使用最多6个线程
+            threads = self._get_optimal_threads_for_model(model_name)
         # 如果系统内存>=8GB且CPU核心数>=4，使用small模型
         elif system_ram >= 8 and cpu_count >= 4:
             self.logger.info(f"System has {system_ram:.1f} GB RAM and {cpu_count} CPU cores. Using small model.")
             model_name = "small"
             compute_type = "int8"
             beam_size = 5
-            threads = min(cpu_count, 4)  # 使用最多4个线程
+            threads = self._get_optimal_threads_for_model(model_name)
         # 否则使用tiny模型
         else:
             self.logger.info(f"System has {system_ram:.1f} GB RAM and {cpu_count} CPU cores. Using tiny model.")
             model_name = "tiny"
             compute_type = "int8"
             beam_size = 3
-            threads = min(cpu_count, 2)  # 使用最多2个线程
+            threads = self._get_optimal_threads_for_model(model_name)
             
         self.logger.info(f"Using {model_name} model with {threads} threads")
         
@@ -195,8 +201,13 @@ class WhisperEngine:
         except:
             return False
             
-    def ensure_model_loaded(self):
-        """确保模型已加载"""
+    def ensure_model_loaded(self, allow_download=None):
+        """确保模型已加载
+        
+        模型总是从本地快照目录加载，加载过程不访问Hugging Face Hub。
+        Args:
+            allow_download: 本地没有模型时是否允许下载，默认读取配置项allow_model_download
+        """
         if self.model is not None:
             return
             
@@ -208,56 +219,87 @@ class WhisperEngine:
         device = self.settings["device"]
         compute_type = self.settings["compute_type"]
         beam_size = self.settings["beam_size"]
-        threads = self.settings.get("threads", min(psutil.cpu_count(), 4))
+        threads = self.settings.get("threads") or self._get_optimal_threads_for_model(model_name)
+        
+        if allow_download is None:
+            allow_download = bool(self.config.get("allow_model_download", False))
         
         try:
             from faster_whisper import WhisperModel
             
+            resolve_start = time.time()
+            model_path = resolve_local_model(model_name, getattr(self.config, "models_dir", None))
+            if model_path is None:
+                if not allow_download:
+                    raise FileNotFoundError(f"本地未找到模型 {model_name}，请先下载模型")
+                self.logger.info(f"本地未找到模型 {model_name}，开始下载")
+                model_path = self.download_model(model_name)
+                if model_path is None:
+                    raise FileNotFoundError(f"模型 {model_name} 下载失败")
+            self.logger.debug(f"模型路径解析耗时: {(time.time() - resolve_start) * 1000:.1f}ms, 路径: {model_path}")
+            
+            # 草稿-验证解码器持有上一个目标模型，换模型后按需重新创建；草稿模型也一并释放
+            self.speculative = None
+            if self.model_name != model_name:
+                self.draft_model = None
+            
             self.logger.info(f"Loading model: {model_name} with settings: {self.settings}")
+            load_start = time.time()
             self.model = WhisperModel(
-                model_size_or_path=model_name,
+                model_size_or_path=model_path,
                 device=device,
                 compute_type=compute_type,
-                download_root=self.config.models_dir if hasattr(self.config, "models_dir") else None,
-                cpu_threads=threads
+                cpu_threads=threads,
+                local_files_only=True
             )
             self.model_name = model_name
             self.initialized = True
-            self.logger.info("模型加载成功")
+            self.encoder_cache = None  # 缓存绑定在旧模型上，随旧模型一起释放
+            budget = get_thread_budget()
+            budget.apply_library_limits()
+            budget.log_allocation()
+            self.logger.info(f"模型加载成功，耗时 {time.time() - load_start:.2f}秒")
         except Exception as e:
             self.logger.error(f"加载模型失败: {e}")
             raise
                 
+    def load_model(self, model_name, allow_download=None):
+        """卸载当前模型并加载指定模型"""
+        self.model = None
+        self.speculative = None
+        self.encoder_cache = None
+        self.initialized = False
+        self.settings = {
+            "model_name": model_name,
+            "device": "cpu",
+            "compute_type": "int8",
+            "beam_size": 5,
+            "threads": self._get_optimal_threads_for_model(model_name)
+        }
+        self.ensure_model_loaded(allow_download=allow_download)
+                
     def download_model(self, model_name="large-v3"):
-        """检查模型是否存在，如果不存在则下载"""
-        # 检查默认缓存路径
-        cache_dir = os.path.expanduser("~/.cache/huggingface/hub")
-        model_dir = os.path.join(cache_dir, "models--Systran--faster-whisper-large-v3", "snapshots")
+        """检查模型是否存在，如果不存在则下载，返回本地快照目录"""
+        models_dir = getattr(self.config, "models_dir", None)
         
-        # 如果模型目录存在，说明已经下载过
-        if os.path.exists(model_dir):
-            print(f"找到已下载的模型目录: {model_dir}")
-            # 获取最新的快照
-            snapshots = os.listdir(model_dir)
-            if snapshots:
-                latest_snapshot = snapshots[0]
-                model_path = os.path.join(model_dir, latest_snapshot)
-                print(f"使用模型: {model_path}")
-                return model_path
+        # 如果本地已有快照，直接使用最新的快照
+        model_path = resolve_local_model(model_name, models_dir)
+        if model_path:
+            print(f"使用模型: {model_path}")
+            return model_path
                 
-        # 如果模型不存在，使用 huggingface-cli 下载
-        print("开始下载模型...")
+        # 如果模型不存在，使用 huggingface-cli 下载到HF缓存
+        print(f"开始下载模型 {model_name}...")
         try:
             import subprocess
+            cache_dir = get_hf_cache_dir()
             cmd = [
                 "huggingface-cli",
                 "download",
                 "--resume-download",
-                "Systran/faster-whisper-large-v3",
-                "--local-dir",
-                os.path.dirname(model_dir),
-                "--local-dir-use-symlinks",
-                "False"
+                get_repo_id(model_name),
+                "--cache-dir",
+                cache_dir
             ]
             
             result = subprocess.run(cmd, capture_output=True, text=True)
@@ -266,225 +308,427 @@ class WhisperEngine:
                 return None
                 
             # 再次检查模型目录
-            if os.path.exists(model_dir):
-                snapshots = os.listdir(model_dir)
-                if snapshots:
-                    latest_snapshot = snapshots[0]
-                    model_path = os.path.join(model_dir, latest_snapshot)
-                    print(f"模型下载完成: {model_path}")
-                    return model_path
+            model_path = resolve_local_model(model_name, models_dir)
+            if model_path:
+                print(f"模型下载完成: {model_path}")
+                return model_path
                     
-            print("模型下载失败")
+            print(f"模型下载失败，未在 {get_repo_cache_dir(model_name, cache_dir)} 找到完整快照")
             return None
             
         except Exception as e:
             print(f"下载模型失败: {str(e)}")
             return None
     
-    def transcribe(self, audio_file: str, language="zh", initial_prompt=None, target_language=None) -> str:
-        """使用批量模式转写音频文件，返回完整文本
+    def _get_speculative_decoder(self):
+        """配置启用speculative_decode且本地有草稿模型时，返回草稿-验证解码器，否则返回None"""
+        if not self.config.get("speculative_decode", False):
+            return None
+        draft_name = self.config.get("speculative_draft_model", "distil-large-v3")
+        if self.model_name == draft_name:
+            return None
+        if self.speculative is not None:
+            return self.speculative
+            
+        try:
+            from faster_whisper import WhisperModel
+            from core.speculative import SpeculativeDecoder
+            
+            if self.draft_model is None or self.draft_model[0] != draft_name:
+                draft_path = resolve_local_model(draft_name, getattr(self.config, "models_dir", None))
+                if draft_path is None:
+                    self.logger.warning(f"本地未找到草稿模型 {draft_name}，不使用草稿-验证解码")
+                    return None
+                # 两个模型同时驻留内存
+                spare_ram = get_memory_gb() - MODEL_MIN_MEMORY_GB.get(self.model_name, 1.0)
+                if not self._fits_memory(draft_name, spare_ram):
+                    return None
+                load_start = time.time()
+                model = WhisperModel(
+                    model_size_or_path=draft_path,
+                    device=self.settings["device"],
+                    compute_type=self.settings["compute_type"],
+                    # 草稿模型与目标模型交替运行，不平分推理线程(见ThreadBudget)
+                    cpu_threads=self._get_optimal_threads_for_model(draft_name),
+                    local_files_only=True
+                )
+                self.draft_model = (draft_name, model)
+                self.logger.info(f"草稿模型 {draft_name} 加载成功，耗时 {time.time() - load_start:.2f}秒")
+            self.speculative = SpeculativeDecoder(self.model, self.draft_model[1])
+            preset = self.get_decode_preset()
+            if preset:
+                self.logger.info(f"草稿-验证解码固定使用贪心解码，忽略解码预设 {preset}")
+            return self.speculative
+        except Exception as e:
+            self.logger.error(f"初始化草稿-验证解码失败: {e}")
+            return None
+    
+    def get_decode_preset(self, model_name=None) -> Optional[Dict[str, Any]]:
+        """返回配置中为当前模型保存的解码预设(由autotune写入)，没有则返回None"""
+        model_name = model_name or self.model_name or (self.settings or {}).get("model_name")
+        presets = self.config.get("decode_presets") or {}
+        return presets.get(model_name)
+        
+    def _build_decode_options(self, decode_options=None) -> Dict[str, Any]:
+        """合并默认解码参数、配置中的预设和调用方指定的参数"""
+        options = {
+            "beam_size": self.settings.get("beam_size", 5),
+            "vad_filter": True,
+            "vad_parameters": dict(min_silence_duration_ms=500),
+        }
+        preset = self.get_decode_preset()
+        if preset:
+            options.update(preset)
+        if decode_options:
+            options.update(decode_options)
+        return options
+    
+    def transcribe(self, audio_file: str, language="zh", initial_prompt=None, target_language=None,
+                   decode_options=None, speed=None) -> TranscriptionResult:
+        """使用批量模式转写音频文件
         Args:
             audio_file: 音频文件路径
             language: 音频的语言，默认为zh（中文），设置为auto则自动检测
             initial_prompt: 初始提示，用于引导转写
             target_language: 目标语言代码，用于翻译
+            decode_options: 额外的解码参数(beam_size、temperature等)，覆盖配置中的预设
+            speed: 转写前把语速加快的倍数(例如1.25)，默认按配置项tempo_speed只对长录音加速
+        Returns:
+            TranscriptionResult，出错时error字段不为空
         """
         if not os.path.exists(audio_file):
             self.logger.error(f"音频文件不存在: {audio_file}")
-            return "错误：音频文件不存在"
+            return TranscriptionResult.from_error("音频文件不存在")
             
         try:
-            self.ensure_model_loaded()
+            start_time = time.perf_counter()
+            load_time = self._timed_ensure_model_loaded()
             
             self.logger.info(f"Transcribing audio file: {audio_file}, language: {language}, target_language: {target_language}")
+            result = self._transcribe_source(audio_file, language, initial_prompt, target_language, decode_options, speed)
+            result.timings["model_load"] = load_time
+            result.timings["total"] = time.perf_counter() - start_time
+            return result
+        except Exception as e:
+            self.logger.error(f"转写过程中出错: {str(e)}")
+            return TranscriptionResult.from_error(str(e))
+            
+    def transcribe_samples(self, samples: np.ndarray, language="zh", initial_prompt=None, target_language=None,
+                           decode_options=None, speed=None) -> TranscriptionResult:
+        """转写内存中的16kHz单声道音频(int16或float32)"""
+        if samples is None or len(samples) == 0:
+            return TranscriptionResult()
+            
+        try:
+            start_time = time.perf_counter()
+            load_time = self._timed_ensure_model_loaded()
+            
+            if samples.dtype == np.int16:
+                audio = samples.astype(np.float32) / 32768.0
+            else:
+                audio = samples.astype(np.float32, copy=False)
+            self.logger.info(f"Transcribing {len(audio) / 16000:.2f}s of audio, language: {language}, target_language: {target_language}")
+            result = self._transcribe_source(audio, language, initial_prompt, target_language, decode_options, speed)
+            result.timings["model_load"] = load_time
+            result.timings["total"] = time.perf_counter() - start_time
+            return result
+        except Exception as e:
+            self.logger.error(f"转写过程中出错: {str(e)}")
+            return TranscriptionResult.from_error(str(e))
+            
+    def transcribe_files(self, audio_files: List[str], language="zh", pack=True, gap_s=0.5,
+                         decode_options=None) -> List[TranscriptionResult]:
+        """批量转写多个音频文件，按输入顺序返回每个文件的TranscriptionResult
+        
+        Whisper每次都把输入补齐到30秒，大量几秒长的短音频逐个转写时编码器大部分时间
+        花在补齐的静音上。pack=True时把短音频用gap_s秒静音连接起来装满30秒窗口一起转写，
+        再根据词级时间戳把结果拆回每个文件。
+        """
+        from faster_whisper import decode_audio
+        from core.packing import pack_clips, concatenate_clips, split_by_clip
+        
+        results: List[Optional[TranscriptionResult]] = [None] * len(audio_files)
+        if not pack:
+            for i, audio_file in enumerate(audio_files):
+                results[i] = self.transcribe(audio_file, language=language, decode_options=decode_options)
+            return results
+            
+        try:
+            load_time = self._timed_ensure_model_loaded()
+        except Exception as e:
+            self.logger.error(f"加载模型失败: {e}")
+            return [TranscriptionResult.from_error(str(e)) for _ in audio_files]
             
-            # 转写音频时捕获并安全释放资源
+        clips = {}
+        for i, audio_file in enumerate(audio_files):
             try:
-                # 转写音频
-                beam_size = self.settings.get("beam_size", 5)
-                
-                # 根据是否需要翻译设置任务类型和参数
-                if target_language and target_language != language:
-                    # 翻译任务
-                    task = "translate"
-                    # 确保faster-whisper使用正确的语言参数
-                    segments, info = self.model.transcribe(
-                        audio_file,
-                        beam_size=beam_size,
-                        language=None if language == "auto" else language,  # 源语言
-                        initial_prompt=initial_prompt,
-                        task=task,  # 翻译任务
-                        vad_filter=True,
-                        vad_parameters=dict(min_silence_duration_ms=500),
-                        # 明确指定翻译目标语言
-                        translate_to=target_language
-                    )
-                else:
-                    # 普通转写任务
-                    task = "transcribe"
-                    segments, info = self.model.transcribe(
-                        audio_file,
-                        beam_size=beam_size,
-                        language=None if language == "auto" else language,
-                        initial_prompt=initial_prompt,
-                        task=task,
-                        vad_filter=True,
-                        vad_parameters=dict(min_silence_duration_ms=500)
-                    )
-                
-                # 记录语言检测结果和翻译信息
-                detected_language = info.language if hasattr(info, "language") else "unknown"
-                language_probability = info.language_probability if hasattr(info, "language_probability") else 0.0
-                
-                self.logger.info(f"Detected language: {detected_language} (probability: {language_probability})")
-                if target_language and target_language != language:
-                    self.logger.info(f"Translating to: {target_language}")
+                clips[i] = decode_audio(audio_file, sampling_rate=16000)
+            except Exception as e:
+                self.logger.error(f"读取音频文件 {audio_file} 失败: {e}")
+                results[i] = TranscriptionResult.from_error(str(e))
                 
-                # 立即收集所有片段文本并释放segments引用，防止内存访问错误
-                transcript = ""
-                for segment in segments:
-                    transcript += segment.text + " "
+        indices = sorted(clips)
+        packs = pack_clips([len(clips[i]) / 16000 for i in indices], gap_s=gap_s)
+        self.logger.info(f"打包转写: {len(indices)} 个音频装入 {len(packs)} 个窗口")
+        
+        options = self._build_decode_options(decode_options)
+        # 打包的音频之间互不相关，不使用上文；需要词级时间戳来拆分结果；VAD会移除静音间隔
+        options.update(word_timestamps=True, condition_on_previous_text=False, vad_filter=False)
+        options.pop("vad_parameters", None)
+        
+        for pack in packs:
+            members = [indices[k] for k in pack]
+            if len(members) == 1:
+                results[members[0]] = self.transcribe_samples(clips[members[0]], language=language,
+                                                              decode_options=decode_options)
+                continue
+            try:
+                pack_start = time.perf_counter()
+                audio, spans = concatenate_clips([clips[i] for i in members], gap_s=gap_s)
+                segments, info = self.model.transcribe(
+                    audio,
+                    language=None if language == "auto" else language,
+                    task="transcribe",
+                    **options
+                )
+                clip_results = split_by_clip(list(segments), spans, gap_s=gap_s)
+                elapsed = time.perf_counter() - pack_start
+                for i, clip_result in zip(members, clip_results):
+                    clip_result.language = info.language
+                    clip_result.language_probability = info.language_probability
+                    # 打包窗口的耗时按时长分摊到每个音频
+                    clip_result.timings["total"] = elapsed * clip_result.duration / max(1e-6, info.duration)
+                    clip_result.metrics["packed_with"] = len(members)
+                    results[i] = clip_result
+            except Exception as e:
+                self.logger.error(f"打包转写出错: {e}")
+                for i in members:
+                    results[i] = TranscriptionResult.from_error(str(e))
                     
-                # 显式删除segments和info，避免后续访问可能导致的内存错误
-                del segments
-                del info
-                
-                # 清理文本
-                transcript = transcript.strip()
+        self.logger.debug(f"打包转写模型加载耗时: {load_time:.2f}秒")
+        return results
+            
+    def _timed_ensure_model_loaded(self) -> float:
+        """加载模型(如果需要)，返回加载耗时(秒)"""
+        if self.model is not None:
+            return 0.0
+        start_time = time.perf_counter()
+        self.ensure_model_loaded()
+        return time.perf_counter() - start_time
+            
+    def _collect_result(self, segments, info) -> TranscriptionResult:
+        """把faster-whisper的片段生成器收集为TranscriptionResult"""
+        result = TranscriptionResult(
+            language=getattr(info, "language", None),
+            language_probability=getattr(info, "language_probability", 0.0),
+            duration=getattr(info, "duration", 0.0)
+        )
+        for segment in segments:
+            result.add_segment(segment.start, segment.end, segment.text,
+                               segment.avg_logprob, getattr(segment, "temperature", 0.0) or 0.0)
+        return result
+            
+    def _get_tempo_speed(self, speed, duration) -> float:
+        """返回实际使用的加速倍数：调用方指定的值，或者长录音使用配置项tempo_speed"""
+        if speed is None:
+            if duration < self.config.get("tempo_min_duration_s", 60):
+                return 1.0
+            speed = self.config.get("tempo_speed", 1.0)
+        return max(1.0, float(speed or 1.0))
+            
+    def _transcribe_stretched(self, audio, speed, language, initial_prompt, target_language, decode_options) -> TranscriptionResult:
+        """加快语速(保持音高)后转写，再把片段时间换算回原始时间轴"""
+        from core.tempo import time_stretch
+        
+        stretch_start = time.perf_counter()
+        stretched = time_stretch(audio, speed)
+        stretch_time = time.perf_counter() - stretch_start
+        self.logger.info(f"以 {speed:.2f} 倍语速转写 {len(audio) / 16000:.1f}s 音频 (变速耗时 {stretch_time:.2f}s)")
+        result = self._transcribe_source(stretched, language, initial_prompt, target_language, decode_options, speed=1.0)
+        result.rescale(speed)
+        result.timings["tempo"] = stretch_time
+        result.metrics["tempo_speed"] = speed
+        return result
+            
+    def _transcribe_source(self, source, language, initial_prompt, target_language, decode_options,
+                           speed=None) -> TranscriptionResult:
+        """对音频文件路径或float32数组执行转写"""
+        try:
+            if speed != 1.0 and (speed is not None or self.config.get("tempo_speed", 1.0) != 1.0):
+                audio = source
+                if isinstance(source, str):
+                    from faster_whisper import decode_audio
+                    audio = decode_audio(source, sampling_rate=16000)
+                speed = self._get_tempo_speed(speed, len(audio) / 16000)
+                if speed != 1.0:
+                    return self._transcribe_stretched(audio, speed, language, initial_prompt, target_language, decode_options)
+                source = audio
+            
+            # 草稿-验证解码只用于不带提示的普通转写，并且调用方没有指定解码参数
+            translating = target_language and target_language != language
+            if not translating and not initial_prompt and not decode_options:
+                speculative = self._get_speculative_decoder()
+                if speculative is not None:
+                    options = self._build_decode_options()
+                    vad_parameters = (options.get("vad_parameters") or {}) if options.get("vad_filter") else None
+                    result = speculative.transcribe(source, language, vad_parameters=vad_parameters)
+                    if result.is_empty or "感谢使用" in result.text:
+                        self.logger.warning("转写结果为空或全是广告内容")
+                        result.clear_segments()
+                    return result
+            
+            # 转写音频
+            options = self._build_decode_options(decode_options)
+            prepare_start = time.perf_counter()
+            
+            # 根据是否需要翻译设置任务类型和参数
+            if target_language and target_language != language:
+                # 翻译任务
+                task = "translate"
+                # 确保faster-whisper使用正确的语言参数
+                segments, info = self.model.transcribe(
+                    source,
+                    language=None if language == "auto" else language,  # 源语言
+                    initial_prompt=initial_prompt,
+                    task=task,  # 翻译任务
+                    # 明确指定翻译目标语言
+                    translate_to=target_language,
+                    **options
+                )
+            else:
+                # 普通转写任务
+                task = "transcribe"
+                segments, info = self.model.transcribe(
+                    source,
+                    language=None if language == "auto" else language,
+                    initial_prompt=initial_prompt,
+                    task=task,
+                    **options
+                )
+            
+            # 记录语言检测结果和翻译信息
+            detected_language = info.language if hasattr(info, "language") else "unknown"
+            language_probability = info.language_probability if hasattr(info, "language_probability") else 0.0
+            
+            self.logger.info(f"Detected language: {detected_language} (probability: {language_probability})")
+            if target_language and target_language != language:
+                self.logger.info(f"Translating to: {target_language}")
+            
+            # 立即收集所有片段并释放segments引用，防止内存访问错误
+            decode_start = time.perf_counter()
+            result = self._collect_result(segments, info)
+            result.timings["prepare"] = decode_start - prepare_start
+            result.timings["decode"] = time.perf_counter() - decode_start
                 
-                # 校验结果是否为空或者广告内容
-                if not transcript or "感谢使用" in transcript:
-                    self.logger.warning("转写结果为空或全是广告内容")
-                    return "请说话..."
-                    
-                return transcript
-            except Exception as e:
-                self.logger.error(f"转写音频过程中出错: {str(e)}")
-                # 捕获内部错误但继续抛出
-                raise
-            finally:
-                # 确保清理所有资源
-                if hasattr(self, 'model') and self.model is not None:
-                    try:
-                        # 显式释放模型资源
-                        del self.model
-                        self.model = None
-                    except Exception as e:
-                        self.logger.error(f"释放模型资源时出错: {str(e)}")
+            # 显式删除segments和info，避免后续访问可能导致的内存错误
+            del segments
+            del info
+            
+            # 校验结果是否为空或者广告内容
+            if result.is_empty or "感谢使用" in result.text:
+                self.logger.warning("转写结果为空或全是广告内容")
+                result.clear_segments()
                 
+            return result
         except Exception as e:
-            self.logger.error(f"转写过程中出错: {str(e)}")
-            return f"错误：{str(e)}"
+            self.logger.error(f"转写音频过程中出错: {str(e)}")
+            # 捕获内部错误但继续抛出
+            raise
             
-    def add_audio_chunk(self, audio_chunk: bytes) -> None:
-        """添加音频数据块到缓冲区，用于实时转写"""
+    def add_audio_chunk(self, audio_chunk) -> None:
+        """添加音频数据块(16kHz int16数组或bytes)到缓冲区，用于实时转写"""
+        if isinstance(audio_chunk, bytes):
+            audio_chunk = np.frombuffer(audio_chunk, dtype=np.int16)
         self.buffer.append(audio_chunk)
-        self.buffer_size += len(audio_chunk)
+        self.buffer_size += audio_chunk.nbytes
         
     def clear_buffer(self) -> None:
-        """清空音频缓冲区"""
+        """清空音频缓冲区，卸载编码器缓存"""
         self.buffer = []
         self.buffer_size = 0
+        if self.encoder_cache:
+            self.encoder_cache.uninstall()
+            self.encoder_cache = None
+            
+    def _install_encoder_cache(self):
+        """实时转写时在当前模型上安装编码器缓存
+
+        只有实时预览会反复编码相同的窗口；批量和文件转写每个窗口只编码一次，
+        安装缓存只会多占内存，所以不在加载模型时安装，由clear_buffer卸载。
+        """
+        if self.encoder_cache and self.encoder_cache.model is self.model:
+            return self.encoder_cache
+        cache_size = self.config.get("encoder_cache_size", 12)
+        self.encoder_cache = EncoderCache(self.model, cache_size) if cache_size else None
+        return self.encoder_cache
         
-    def get_realtime_transcription(self, language="zh", target_language=None) -> Optional[str]:
-        """实时转写当前缓冲区中的音频数据
+    def get_realtime_transcription(self, language="zh", target_language=None, samples=None) -> Optional[TranscriptionResult]:
+        """实时转写当前录音，没有结果时返回None
+        
+        录音按固定的30秒窗口切分后逐个窗口转写。前面已经完整的窗口每次特征都相同，
+        编码结果直接从编码器缓存中取出，只有末尾获得新音频的窗口需要重新编码。
         Args:
             language: 音频的语言，默认为zh（中文），设置为auto则自动检测
             target_language: 目标语言代码，用于翻译
+            samples: 到目前为止录制的16kHz int16音频，默认使用add_audio_chunk添加的缓冲区
         """
-        if not self.buffer or self.buffer_size == 0:
+        if samples is None:
+            if not self.buffer or self.buffer_size == 0:
+                return None
+            samples = self.buffer[0] if len(self.buffer) == 1 else np.concatenate(self.buffer)
+            self.buffer = [samples]  # 合并后只保留一个数组，下次只需要拼接新增的块
+            
+        # 如果缓冲区太小，可能无法有效识别
+        if len(samples) < 4000:  # 至少需要0.25秒的音频(16000Hz采样率)
             return None
             
         try:
             self.ensure_model_loaded()
-
-            # 如果缓冲区太小，可能无法有效识别
-            if self.buffer_size < 8000:  # 至少需要0.5秒的音频(16000Hz采样率，16位)
-                return None
-                
-            # 将缓冲区数据保存为临时文件
-            temp_file_path = None
-            try:
-                # 使用更安全的方式处理临时文件
-                temp_dir = tempfile.gettempdir()
-                temp_file_path = os.path.join(temp_dir, f"whisper_temp_{int(time.time()*1000)}.wav")
-                
-                # 写入WAV头
-                wf = wave.open(temp_file_path, 'wb')
-                wf.setnchannels(1)
-                wf.setsampwidth(2)  # 16-bit
-                wf.setframerate(16000)
-                
-                # 创建并写入缓冲区数据的副本，避免原始数据被修改
-                buffer_copy = self.buffer.copy()
-                all_audio_data = b''.join(buffer_copy)
-                wf.writeframes(all_audio_data)
-                wf.close()
-                
-                # 转写临时文件
-                beam_size = self.settings.get("beam_size", 5)
-                
-                # 根据是否需要翻译设置任务类型和参数
-                if target_language and target_language != language:
-                    # 翻译任务
-                    task = "translate"
-                    # 确保faster-whisper使用正确的语言参数
-                    segments, info = self.model.transcribe(
-                        temp_file_path,
-                        beam_size=3,  # 使用较小的beam size以提高速度
-                        language=None if language == "auto" else language,  # 源语言
-                        task=task,  # 翻译任务
-                        vad_filter=True,
-                        vad_parameters=dict(min_silence_duration_ms=300),  # 减少静音判断时间
-                        word_timestamps=False,  # 不需要单词级时间戳
-                        condition_on_previous_text=True,  # 利用上下文改善实时体验
-                        no_speech_threshold=0.3,  # 降低无语音阈值，更积极地识别
-                        # 明确指定翻译目标语言
-                        translate_to=target_language
-                    )
-                else:
-                    # 普通转写任务
-                    task = "transcribe"
-                    segments, info = self.model.transcribe(
-                        temp_file_path,
-                        beam_size=3,  # 使用较小的beam size以提高速度
-                        language=None if language == "auto" else language,
-                        task=task,
-                        vad_filter=True,
-                        vad_parameters=dict(min_silence_duration_ms=300),  # 减少静音判断时间
-                        word_timestamps=False,  # 不需要单词级时间戳
-                        condition_on_previous_text=True,  # 利用上下文改善实时体验
-                        no_speech_threshold=0.3,  # 降低无语音阈值，更积极地识别
-                    )
-                
-                # 立即提取文本并释放segments引用
-                transcript = ""
-                for segment in segments:
-                    transcript += segment.text + " "
+            self._install_encoder_cache()
+            from core.endpoint import split_windows
+            
+            audio = samples.astype(np.float32) / 32768.0 if samples.dtype == np.int16 else samples
+            options = dict(
+                beam_size=3,  # 使用较小的beam size以提高速度
+                language=None if language == "auto" else language,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=300),  # 减少静音判断时间
+                word_timestamps=False,  # 不需要单词级时间戳
+                condition_on_previous_text=True,  # 利用上下文改善实时体验
+                no_speech_threshold=0.3,  # 降低无语音阈值，更积极地识别
+            )
+            # 根据是否需要翻译设置任务类型和参数
+            if target_language and target_language != language:
+                options.update(task="translate", translate_to=target_language)
+            else:
+                options.update(task="transcribe")
                 
-                # 显式释放资源
+            hits, misses = self.encoder_cache.snapshot() if self.encoder_cache else (0, 0)
+            result = TranscriptionResult(duration=len(audio) / 16000)
+            for start, end in split_windows(audio):
+                segments, info = self.model.transcribe(audio[start:end], **options)
+                # 立即收集片段并释放segments引用
+                window_result = self._collect_result(segments, info)
                 del segments
                 del info
-                del buffer_copy
+                result.extend(window_result, offset=start / 16000)
                 
-                transcript = transcript.strip()
+            if self.encoder_cache:
+                window_hits = self.encoder_cache.hits - hits
+                window_misses = self.encoder_cache.misses - misses
+                result.metrics["encoder_cache_hits"] = window_hits
+                result.metrics["encoder_cache_misses"] = window_misses
+                result.metrics["encoder_cache_hit_rate"] = window_hits / max(1, window_hits + window_misses)
+                self.logger.debug(
+                    f"实时转写编码器缓存命中 {window_hits}/{window_hits + window_misses}，"
+                    f"累计命中率 {self.encoder_cache.hit_rate:.0%}"
+                )
                 
-                # 结果处理
-                if not transcript:
-                    return None
-                    
-                return transcript
-            except Exception as e:
-                self.logger.error(f"实时转写音频文件处理过程中出错: {str(e)}")
+            # 结果处理
+            if result.is_empty:
                 return None
-            finally:
-                # 确保临时文件被删除
-                if temp_file_path and os.path.exists(temp_file_path):
-                    try:
-                        os.unlink(temp_file_path)
-                    except Exception as cleanup_err:
-                        self.logger.warning(f"无法删除临时文件: {cleanup_err}")
                 
+            return result
         except Exception as e:
             self.logger.error(f"实时转写过程中出错: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
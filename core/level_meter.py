@@ -0,0 +1,112 @@
+import time
+import logging
+import threading
+
+import numpy as np
+
+LOG_FULL_SCALE = np.log10(32768)
+
+
+def level_percent(rms):
+    """把int16幅度的RMS转换为0-100的电平(对数比例，提高低音量的灵敏度)，支持数组"""
+    normalized = np.log10(np.maximum(1.0, rms)) / LOG_FULL_SCALE * 100
+    return np.clip(normalized * 1.5, 0, 100)
+
+
+def block_levels(samples, block_samples):
+    """按块计算RMS和峰值(float32，向量化)，返回 (rms数组, peak数组)"""
+    n_blocks = len(samples) // block_samples
+    if n_blocks == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    blocks = samples[:n_blocks * block_samples].reshape(n_blocks, block_samples).astype(np.float32)
+    rms = np.sqrt(np.mean(blocks * blocks, axis=1))
+    peak = np.max(np.abs(blocks), axis=1)
+    return rms, peak
+
+
+class LevelMeter:
+    """录音电平表：在独立线程中以固定频率读取采集缓冲区，计算每个块的电平
+
+    采集回调只负责复制数据，电平计算全部在这里完成。每1/rate_hz秒的音频计算一个
+    RMS/峰值，结果写入固定长度的history数组(环形)，可视化组件直接读取。
+    设置了detector(EnergyEndpointDetector)时，同样的音频也送入端点检测。
+    """
+
+    def __init__(self, rate_hz=20, history_size=50, sample_rate=16000):
+        self.logger = logging.getLogger(__name__)
+        self.rate_hz = rate_hz
+        self.block_samples = int(sample_rate / rate_hz)
+        self.history = np.zeros(history_size, dtype=np.float32)  # 电平(0-100)的环形历史
+        self.index = 0  # 下一个要写入的位置
+        self.level = 0  # 最新的电平(0-100)
+        self.peak = 0.0  # 最新块的峰值(0-1)
+        self.detector = None  # 可选的流式端点检测器
+        self.stats = None  # 可选的CaptureStats，记录采集到电平计算的延迟
+        self._thread = None
+        self._stop_event = None  # 每个线程一个停止事件，旧线程不会因为重新开始而继续运行
+
+    def start(self, buffer, ignore_until=0):
+        """开始读取buffer(AudioBuffer)中新写入的音频，端点检测把ignore_until之前的音频当作静音"""
+        previous = self._thread
+        self.stop()
+        if previous is not None:
+            # 等旧线程处理完当前这一块再重置，避免两个线程同时更新history和端点检测
+            previous.join(1.0)
+        self.history[:] = 0
+        self.index = 0
+        self.level = 0
+        self.peak = 0.0
+        if self.detector is not None:
+            self.detector.reset(ignore_until)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(buffer.reader(buffer.end), self._stop_event),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # 不等待线程结束：线程的停止事件被设置后立即从等待中返回并退出，停止录音不会被阻塞
+        if self._stop_event is not None:
+            self._stop_event.set()
+        self._stop_event = None
+        self._thread = None
+        self.level = 0
+        self.peak = 0.0
+
+    @property
+    def running(self):
+        return self._stop_event is not None
+
+    def _run(self, reader, stop_event):
+        interval = 1.0 / self.rate_hz
+        while not stop_event.is_set():
+            tick = time.perf_counter()
+            try:
+                # 只读取完整的块，剩余部分留到下一次
+                whole = reader.available // self.block_samples * self.block_samples
+                if whole > 0:
+                    samples = reader.read(whole)
+                    self.update(samples)
+                    if self.stats is not None:
+                        self.stats.consumed("meter", reader.position)
+                    detector = self.detector
+                    if detector is not None:
+                        detector.process(samples)
+            except Exception as e:
+                self.logger.error(f"计算音频电平出错: {e}")
+            stop_event.wait(max(0.0, interval - (time.perf_counter() - tick)))
+
+    def update(self, samples):
+        """计算samples中每个完整块的电平并写入历史"""
+        rms, peak = block_levels(samples, self.block_samples)
+        if len(rms) == 0:
+            return
+        levels = level_percent(rms)[-len(self.history):]
+        positions = (self.index + np.arange(len(levels))) % len(self.history)
+        self.history[positions] = levels
+        self.index = (self.index + len(levels)) % len(self.history)
+        self.level = int(levels[-1])
+        self.peak = float(peak[-1]) / 32768.0
+
+    def levels(self):
+        """按时间顺序返回电平历史(最旧的在前)"""
+        return np.roll(self.history, -self.index)
@@ -0,0 +1,121 @@
+import time
+import logging
+import threading
+
+from core.endpoint import EnergyEndpointDetector
+from core.result import TranscriptionResult
+
+
+class LongFormTranscriber:
+    """长录音模式：录音过程中在自然停顿处滚动完成转写
+
+    每当未完成的音频超过min_chunk_s并且出现足够长的停顿，就在停顿中间切出一段
+    在后台转写，同时让录音器释放这段音频(录音已经增量写入磁盘)。没有停顿的
+    音频超过max_chunk_s时强制切分，因此内存占用与录音总时长无关。
+    停止录音时只需要转写最后一段未完成的音频。
+    """
+
+    def __init__(self, engine, language="zh", target_language=None, min_chunk_s=15.0, max_chunk_s=60.0,
+                 silence_ms=500, on_chunk=None, sample_rate=16000):
+        self.logger = logging.getLogger(__name__)
+        self.engine = engine
+        self.language = language
+        self.target_language = target_language
+        self.sample_rate = sample_rate
+        self.min_chunk = int(min_chunk_s * sample_rate)
+        self.max_chunk = int(max_chunk_s * sample_rate)
+        self.silence_ms = silence_ms
+        self.on_chunk = on_chunk  # 每完成一段调用 on_chunk(result)
+        self.detector = EnergyEndpointDetector(sample_rate=sample_rate)
+        self.result = TranscriptionResult()
+        self.finalized_upto = 0  # 已经切出并提交转写的样本位置
+        self.chunk_count = 0
+        self._read_pos = 0
+        self._queue = []  # 等待转写的 (开始, 结束, 音频)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._worker_running = False
+
+    def update(self, recorder):
+        """在录音循环中定期调用：检测停顿并切分已完成的音频"""
+        if self._read_pos == 0 and recorder.cue_window is not None:
+            # 开始提示音可能被录进去，它比最短语音长，不跳过会被当作一段语音
+            self.detector.reset(ignore_until=recorder.cue_window[1])
+        new_samples = recorder.get_samples(self._read_pos)
+        if len(new_samples) == 0:
+            return
+        self._read_pos += len(new_samples)
+        self.detector.process(new_samples)
+
+        pending = self.detector.position - self.finalized_upto
+        if pending < self.min_chunk:
+            return
+
+        cut = None
+        last_speech = self.detector.last_speech_end
+        if (last_speech is not None and last_speech > self.finalized_upto
+                and self.detector.trailing_silence_ms() >= self.silence_ms):
+            # 在停顿中间切分，两边都保留一部分静音
+            cut = last_speech + (self.detector.position - last_speech) // 2
+        elif pending >= self.max_chunk:
+            self.logger.warning(f"{pending / self.sample_rate:.0f}s 内没有检测到停顿，强制切分")
+            cut = self.detector.position
+
+        if cut is not None:
+            samples = recorder.get_samples(self.finalized_upto)[:cut - self.finalized_upto]
+            self._submit(self.finalized_upto, cut, samples)
+            # samples是零拷贝视图，释放后缓冲区不会再修改这个数组，视图仍然有效；
+            # 转写完成、视图被丢弃后这部分内存才真正回收
+            recorder.discard_before(cut)
+
+    def _submit(self, start, end, samples):
+        self.finalized_upto = end
+        with self._lock:
+            self._queue.append((start, end, samples))
+            if not self._worker_running:
+                self._worker_running = True
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        """按顺序转写排队的音频段"""
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._worker_running = False
+                    return
+                start, end, samples = self._queue.pop(0)
+            self._decode(start, end, samples)
+
+    def _decode(self, start, end, samples, notify=True):
+        decode_start = time.time()
+        chunk = self.engine.transcribe_samples(samples, language=self.language, target_language=self.target_language)
+        self.chunk_count += 1
+        if not chunk.ok:
+            self.logger.error(f"第 {self.chunk_count} 段转写失败: {chunk.error}")
+        self.result.extend(chunk, offset=start / self.sample_rate)
+        self.logger.info(
+            f"完成第 {self.chunk_count} 段 ({start / self.sample_rate:.1f}s - {end / self.sample_rate:.1f}s)，"
+            f"耗时 {time.time() - decode_start:.2f}s"
+        )
+        if notify and self.on_chunk is not None and chunk.ok and not chunk.is_empty:
+            self.on_chunk(chunk)
+        return chunk
+
+    def finalize(self, recorder):
+        """停止录音后调用：等待排队的转写完成，只转写最后一段未完成的音频
+
+        最后一段仍然保留在录音器的缓冲区中(只有已完成的音频被释放)，
+        不需要读取磁盘上的整个录音文件。
+        Returns:
+            (最后一段的结果, 整个录音合并后的结果)
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        tail = TranscriptionResult()
+        remaining = recorder.get_samples(self.finalized_upto)
+        if len(remaining) > 0:
+            tail = self._decode(self.finalized_upto, self.finalized_upto + len(remaining), remaining, notify=False)
+        return tail, self.result
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from core.result import TranscriptionResult
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30.0
+
+
+def pack_clips(durations: List[float], window_s=WINDOW_SECONDS, gap_s=0.5) -> List[List[int]]:
+    """按输入顺序把短音频装入不超过window_s秒的窗口，相邻音频之间留gap_s秒静音
+
+    超过window_s的音频单独成组，按普通方式转写。
+    Returns:
+        每组音频的下标列表
+    """
+    packs = []
+    current = []
+    current_length = 0.0
+    for index, duration in enumerate(durations):
+        needed = duration + (gap_s if current else 0.0)
+        if current and current_length + needed > window_s:
+            packs.append(current)
+            current, current_length, needed = [], 0.0, duration
+        current.append(index)
+        current_length += needed
+    if current:
+        packs.append(current)
+    return packs
+
+
+def concatenate_clips(clips: List[np.ndarray], gap_s=0.5) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """把多段float32音频用静音连接起来，返回 (拼接后的音频, 每段的(开始, 结束)秒)"""
+    gap = np.zeros(int(gap_s * SAMPLE_RATE), dtype=np.float32)
+    parts = []
+    spans = []
+    position = 0
+    for i, clip in enumerate(clips):
+        if i > 0:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(clip.astype(np.float32, copy=False))
+        spans.append((position / SAMPLE_RATE, (position + len(clip)) / SAMPLE_RATE))
+        position += len(clip)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32), spans
+
+
+def split_by_clip(segments, spans: List[Tuple[float, float]], gap_s=0.5) -> List[TranscriptionResult]:
+    """根据词级时间戳把打包转写的片段拆回每段音频
+
+    每个词按中点归入所在的音频(包括它后面一半的静音间隔)，时间换算到该音频自己的时间轴。
+    同一片段中属于同一段音频的词合并为一个片段。
+    """
+    results = [TranscriptionResult(duration=end - start) for start, end in spans]
+    bounds = [end + gap_s / 2 for _, end in spans]
+    for segment in segments:
+        current = None
+        words = []
+        for word in segment.words or []:
+            middle = (word.start + word.end) / 2
+            index = next((i for i, bound in enumerate(bounds) if middle < bound), len(spans) - 1)
+            if index != current and words:
+                _add_words(results[current], spans[current][0], words, segment)
+                words = []
+            current = index
+            words.append(word)
+        if words:
+            _add_words(results[current], spans[current][0], words, segment)
+    return results
+
+
+def _add_words(result, offset, words, segment):
+    start = max(0.0, words[0].start - offset)
+    end = min(result.duration, words[-1].end - offset)
+    result.add_segment(start, max(start, end), "".join(word.word for word in words),
+                       segment.avg_logprob, getattr(segment, "temperature", 0.0) or 0.0)
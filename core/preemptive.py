@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+
+from core.endpoint import EnergyEndpointDetector
+from core.result import TranscriptionResult
+from core.recording_writer import read_int16
+
+
+class PreemptiveDecoder:
+    """在用户按下停止之前，利用末尾静音提前开始最终转写
+
+    录音过程中持续检测语音端点，一旦检测到说话后出现足够长的静音，就在后台
+    转写到目前为止尚未转写的音频。停止录音时，如果之后没有新的语音则直接复用
+    已有结果，否则只转写新增的音频并追加到结果后面。
+    """
+
+    def __init__(self, engine, language="zh", target_language=None, silence_ms=700, sample_rate=16000):
+        self.logger = logging.getLogger(__name__)
+        self.engine = engine
+        self.language = language
+        self.target_language = target_language
+        self.silence_ms = silence_ms
+        self.sample_rate = sample_rate
+        self.detector = EnergyEndpointDetector(sample_rate=sample_rate)
+        self.parts = []  # 已完成的 (开始样本, 结束样本, TranscriptionResult)
+        self.decoded_upto = 0  # 已经提交转写的音频位置
+        self._read_pos = 0  # 已经送入端点检测的音频位置
+        self._thread = None
+        self._lock = threading.Lock()
+        self._speech_since_decode = False
+
+    @property
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def update(self, recorder):
+        """在录音循环中定期调用：读取新音频并在检测到末尾静音时提交转写"""
+        if self._read_pos == 0 and recorder.cue_window is not None:
+            # 开始提示音可能被录进去，它比最短语音长，不跳过会被当作一段语音
+            self.detector.reset(ignore_until=recorder.cue_window[1])
+        new_samples = recorder.get_samples(self._read_pos)
+        if len(new_samples) == 0:
+            return
+        self._read_pos += len(new_samples)
+        self.detector.process(new_samples)
+        if self.detector.last_speech_end is not None and self.detector.last_speech_end > self.decoded_upto:
+            self._speech_since_decode = True
+
+        if (self._speech_since_decode and not self.busy
+                and self.detector.trailing_silence_ms() >= self.silence_ms):
+            end = self.detector.position
+            samples = recorder.get_samples(self.decoded_upto)[:end - self.decoded_upto]
+            self._submit(self.decoded_upto, end, samples)
+
+    def _submit(self, start, end, samples):
+        """在后台线程中转写 [start, end) 区间的音频"""
+        self.decoded_upto = end
+        self._speech_since_decode = False
+        self.logger.info(f"检测到末尾静音，提前转写 {start / self.sample_rate:.2f}s - {end / self.sample_rate:.2f}s")
+        self._thread = threading.Thread(target=self._decode, args=(start, end, samples), daemon=True)
+        self._thread.start()
+
+    def _decode(self, start, end, samples):
+        decode_start = time.time()
+        result = self.engine.transcribe_samples(samples, language=self.language, target_language=self.target_language)
+        with self._lock:
+            self.parts.append((start, end, result))
+        self.logger.debug(f"提前转写完成，耗时 {time.time() - decode_start:.2f}s: {result.text}")
+
+    def finalize(self, audio_file):
+        """停止录音后调用，返回合并后的TranscriptionResult；没有可复用的提前转写结果时返回None"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if not self.parts:
+            return None
+
+        samples = read_int16(audio_file)
+
+        extra = samples[self.decoded_upto:]
+        if len(extra) > 0 and self.detector.has_speech(extra):
+            self.logger.info(f"停止前有新的语音，只转写新增的 {len(extra) / self.sample_rate:.2f}s 音频")
+            self._decode(self.decoded_upto, len(samples), extra)
+        else:
+            self.logger.info("停止前没有新的语音，直接复用提前转写的结果")
+
+        if any(not result.ok for _, _, result in self.parts):
+            self.logger.warning("提前转写出错，改为完整转写")
+            return None
+
+        merged = TranscriptionResult()
+        for start, _, result in sorted(self.parts, key=lambda part: part[0]):
+            merged.extend(result, offset=start / self.sample_rate)
+        merged.metrics["preemptive_parts"] = len(self.parts)
+        return merged
@@ -7,22 +7,58 @@ from datetime import datetime
 import logging
 import numpy as np
 import threading
+from core.audio_buffer import AudioBuffer
+from core.level_meter import LevelMeter
+from core.recording_writer import RecordingWriter
+from core.resample import StreamingResampler
+from core.audio_host import get_audio_host
+from core.cues import get_cue_player
+from core.endpoint import EnergyEndpointDetector
+from core.chunk_queue import ChunkQueue, MERGE
+from core.capture_process import CaptureProcess
+from core.capture_stats import CaptureStats
 
 class AudioRecorder:
+    CHUNK = 1024  # 每次从音频流读取的帧数
+    RATE = 16000  # 采样率
+    CUE_GUARD_S = 0.15  # 开始提示音排队、打开输出流和输出延迟的余量
+    
     def __init__(self, temp_dir=None):
         self.logger = logging.getLogger(__name__)
-        self.pyaudio = pyaudio.PyAudio()
+        self.host = get_audio_host()  # 共享的PortAudio实例和设备表
+        self.cues = get_cue_player()  # 后台播放提示音
         self.stream = None
-        self.frames = []
+        self.buffer = AudioBuffer(sample_rate=self.RATE)  # 采集的int16音频，读者获得零拷贝视图
+        self.meter = LevelMeter(sample_rate=self.RATE)  # 在采集回调之外计算电平
         self.is_recording = False
         self.temp_dir = temp_dir if temp_dir else os.path.join(os.path.expanduser("~"), ".voice_typer", "temp")
         self.current_filename = None
-        self.recording_thread = None
+        self.realtime_thread = None
         self.lock = threading.Lock()
-        self.current_audio_level = 0
+        self.overflow_count = 0        # PortAudio报告的输入溢出次数
+        self.warm_enabled = False      # 是否保持输入流常开(预录模式)
+        self.preroll_ms = 300          # 常开模式下开始录音时包含的之前的音频长度
+        self._warm_device = None       # 常开输入流使用的设备，None表示没有常开的输入流
+        self._preroll = None           # 常开模式下未录音时保存最近音频的缓冲区
+        self._preroll_pending = False
+        self._warm_since = 0.0
+        self.callback_seconds = 0.0    # 采集回调累计耗时
+        self.callback_count = 0
         self.device_index = None
         self.realtime_callback = None  # 实时转写回调函数
         self.realtime_mode = False     # 实时转写模式标志
+        self.file_format = "wav"       # 录音文件格式: wav 或 flac(需要soundfile)
+        self.writer = None             # 录音过程中增量写入磁盘的后台写入器
+        self.native_capture = True     # 以设备默认采样率和声道数采集，再重采样为16kHz单声道
+        self._resampler = None         # 当前输入流使用的重采样器，None表示设备直接输出16kHz单声道
+        self.dsp = None                # 采集和推理之间的处理链(DSPChain)，None表示不处理
+        self.endpoint = EnergyEndpointDetector(sample_rate=self.RATE)  # 录音结束后判断语音范围
+        self._subscribers = []         # 采集回调推送音频块的有界队列(只整体替换，回调中不加锁)
+        self.capture_process = False   # 是否在独立子进程中采集(通过共享内存传回音频)
+        self.capture_stats = CaptureStats(sample_rate=self.RATE)  # 每次录音的采集健康指标
+        self.meter.stats = self.capture_stats
+        self._stream_rate = self.RATE  # 输入流的实际采样率
+        self.cue_window = None         # 麦克风可能录到开始提示音的 (开始样本, 结束样本)，端点检测当作静音
         
         # 初始化设备
         self._ensure_temp_dir()
@@ -51,15 +87,7 @@ class AudioRecorder:
     def get_input_devices(self):
         """获取可用的音频输入设备列表"""
         try:
-            devices = []
-            for i in range(self.pyaudio.get_device_count()):
-                try:
-                    device_info = self.pyaudio.get_device_info_by_index(i)
-                    if device_info and device_info.get('maxInputChannels') > 0:
-                        devices.append((i, device_info.get('name')))
-                except Exception as e:
-                    self.logger.error(f"获取设备 {i} 信息失败: {e}")
-            return devices
+            return self.host.input_devices()
         except Exception as e:
             self.logger.error(f"获取输入设备列表失败: {e}")
             return []
@@ -76,6 +104,7 @@ class AudioRecorder:
             self.logger.warning("Already recording")
             return False
             
+        call_start = time.perf_counter()
         timestamp = int(time.time())
         self.current_filename = os.path.join(self.temp_dir, f"recording_{timestamp}.wav")
         self.logger.debug(f"Starting recording to {self.current_filename}")
@@ -93,9 +122,9 @@ class AudioRecorder:
             self.logger.error("未指定录音设备")
             return False
             
-        # 验证设备是否存在
+        # 验证设备是否存在(使用缓存的设备表)
         try:
-            device_info = self.pyaudio.get_device_info_by_index(self.device_index)
+            device_info = self.host.device_info(self.device_index)
             if not device_info:
                 self.logger.error(f"设备ID {self.device_index} 不存在")
                 return False
@@ -105,236 +134,432 @@ class AudioRecorder:
             self.logger.error(f"验证设备ID {self.device_index} 失败: {e}")
             return False
         
+        if self.warm_enabled and self.open_warm_stream(self.device_index):
+            return self._start_warm_recording(call_start)
+        
+        realtime_queue = None
         try:
             self.logger.debug(f"Using device index: {self.device_index}")
             
-            # 播放短提示音表示开始录音
-            try:
-                self._play_beep()
-            except Exception as e:
-                self.logger.warning(f"播放提示音失败: {e}")
-            
-            self.stream = self.pyaudio.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=16000,
-                input=True,
-                input_device_index=self.device_index,
-                frames_per_buffer=1024
-            )
+            # 提示音在后台播放，不占用录音启动时间；它与录音开始重叠，端点检测跳过这一段
+            self.cues.play("start")
             
-            self.frames = []
+            self.buffer.reset()
+            self._mark_start_cue(0)
+            self.meter.start(self.buffer, ignore_until=self.cue_window[1])
+            self._start_writer()
+            self.overflow_count = 0
+            if self.dsp is not None:
+                # 新打开的输入流与上次录音不连续，清除滤波器和自动增益的状态
+                self.dsp.reset()
+                self.dsp.reset_stats()
+            self.capture_stats.reset()
+            realtime_queue = self._subscribe_realtime()
             self.is_recording = True
             
-            self.recording_thread = threading.Thread(target=self._record)
-            self.recording_thread.daemon = True  # 设置为守护线程
-            self.recording_thread.start()
+            # 回调模式：PortAudio在自己的线程中调用_stream_callback，不需要读取线程
+            open_start = time.perf_counter()
+            self.stream = self._open_input_stream(self.device_index)
+            self.logger.debug(f"录音启动延迟(打开设备): {(time.perf_counter() - open_start) * 1000:.1f}ms")
             
-            # 确保线程已成功启动
-            time.sleep(0.1)
-            if not self.recording_thread.is_alive():
-                self.logger.error("Recording thread failed to start")
-                self.is_recording = False
-                return False
+            if realtime_queue is not None:
+                self.realtime_thread = threading.Thread(target=self._realtime_loop, args=(realtime_queue,), daemon=True)
+                self.realtime_thread.start()
                 
+            self.logger.debug(f"录音启动总延迟: {(time.perf_counter() - call_start) * 1000:.1f}ms")
             self.logger.info("Recording started successfully")
             return True
         except Exception as e:
             self.logger.error(f"Error starting recording: {str(e)}")
             if self.stream:
-                self.stream.close()
+                self.host.close(self.stream)
                 self.stream = None
+            if self.writer is not None:
+                self.writer.finish()
+                self.writer = None
+            if realtime_queue is not None:
+                self.unsubscribe(realtime_queue)
+            self.meter.stop()
             self.is_recording = False
             return False
             
-    def _play_beep(self):
-        """播放简短的提示音表示开始录音"""
-        try:
-            # 使用PyAudio播放简短提示音
-            beep_stream = self.pyaudio.open(
-                format=pyaudio.paFloat32,
-                channels=1,
-                rate=16000,
-                output=True
-            )
-            
-            # 生成简短的提示音（440Hz，200ms）
-            duration = 0.2  # 秒
-            volume = 0.5   # 音量（0.0-1.0）
-            fs = 16000     # 采样率
-            samples = (np.sin(2*np.pi*np.arange(fs*duration)*440/fs)).astype(np.float32)
-            samples = samples * volume
-            
-            # 播放提示音
-            beep_stream.write(samples.tobytes())
-            
-            # 关闭流
-            beep_stream.stop_stream()
-            beep_stream.close()
-            
-        except Exception as e:
-            self.logger.warning(f"播放提示音失败: {e}")
-    
     def stop(self):
         if not self.is_recording:
             self.logger.warning("Not recording")
             return None
             
         self.is_recording = False
+        self.meter.stop()
         
-        # 使用临时变量保存当前文件名
-        current_file = self.current_filename
-        
-        # 确保停止录音线程
-        if self.recording_thread:
+        # 安全关闭音频流，stop_stream()返回后回调不会再被调用；常开模式下保持输入流
+        stop_start = time.perf_counter()
+        if isinstance(self.stream, CaptureProcess):
+            self.log_capture_process_stats()
+        if self.stream and self._warm_device is None:
             try:
-                self.recording_thread.join(timeout=2.0)  # 设置超时时间
-                if self.recording_thread.is_alive():
-                    self.logger.warning("Recording thread did not terminate properly")
-            except Exception as e:
-                self.logger.error(f"Error joining recording thread: {e}")
-            finally:
-                self.recording_thread = None
-            
-        # 安全关闭音频流
-        if self.stream:
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
+                self.host.close(self.stream)
             except Exception as e:
                 self.logger.error(f"Error closing audio stream: {e}")
             finally:
                 self.stream = None
+        self.logger.debug(f"录音停止延迟(关闭设备): {(time.perf_counter() - stop_start) * 1000:.1f}ms")
+        if self.overflow_count:
+            self.logger.warning(f"录音期间发生 {self.overflow_count} 次输入溢出")
+        if self.dsp is not None:
+            self.dsp.log_stats(self.RATE)
+        self.capture_stats.log_summary()
         
-        # 使用锁保护帧操作并保存录音
+        # 实时回调线程只是定期轮询，不需要等待它结束
+        self.realtime_thread = None
+        
+        # 大部分音频已经在录音过程中写入磁盘，这里只需要写完剩余部分并关闭文件
         try:
-            with self.lock:
-                if len(self.frames) > 0:
-                    frames_copy = list(self.frames)  # 创建帧数据的副本
-                    self.frames = []  # 清空原始帧列表
-                    self._save_recording_from_frames(frames_copy, current_file)
-                    frames_copy = None  # 显式释放副本
-                    return current_file
-                else:
-                    self.logger.warning("No frames recorded")
-                    return None
+            save_start = time.perf_counter()
+            writer, self.writer = self.writer, None
+            current_file = writer.finish() if writer is not None else None
+            if current_file is None:
+                self.logger.warning("No frames recorded")
+                return None
+            self.logger.info(f"Recording saved to {current_file} (完成写入耗时 {(time.perf_counter() - save_start) * 1000:.1f}ms)")
+            return current_file
         except Exception as e:
             self.logger.error(f"Error in stop method: {e}")
             return None
         finally:
             # 确保清理所有资源
             self.current_filename = None
-            self.current_audio_level = 0
             self.realtime_callback = None
             self.realtime_mode = False
     
-    def _save_recording_from_frames(self, frames, filename):
-        """从帧列表保存录音到指定文件"""
-        try:
-            if not frames or len(frames) == 0:
-                self.logger.warning("No frames to save")
-                return False
+    def _open_input_stream(self, device_index):
+        """以回调模式打开输入流
+
+        native_capture开启时使用设备的默认采样率和声道数(最多2个)，避免驱动内部重采样
+        或不支持16kHz的设备打开失败，回调中再流式降混/重采样为16kHz单声道；
+        以原生格式打开失败时退回直接请求16kHz单声道。
+        capture_process开启时由子进程持有输入流(包括重采样)，失败时退回在本进程中采集。
+        """
+        if self.capture_process:
+            try:
+                self._resampler = None
+                return CaptureProcess(device_index, self._process_callback, native_capture=self.native_capture,
+                                      sample_rate=self.RATE).start()
+            except Exception as e:
+                self.logger.warning(f"启动采集子进程失败，改为在本进程中采集: {e}")
+                
+        if self.native_capture:
+            try:
+                device_info = self.host.device_info(device_index)
+                rate = int(round(device_info.get('defaultSampleRate') or self.RATE))
+                channels = max(1, min(2, int(device_info.get('maxInputChannels') or 1)))
+                resampler = StreamingResampler(rate, self.RATE, channels)
+                self._resampler = None if resampler.passthrough else resampler
+                self._stream_rate = rate
+                stream = self.host.open(
+                    format=pyaudio.paInt16,
+                    channels=channels,
+                    rate=rate,
+                    input=True,
+                    input_device_index=device_index,
+                    frames_per_buffer=int(self.CHUNK * rate / self.RATE),
+                    stream_callback=self._stream_callback
+                )
+                self.logger.info(f"输入流以设备原生格式打开: {rate}Hz, {channels} 声道"
+                                 + ("" if self._resampler is None else f"，重采样为 {self.RATE}Hz 单声道"))
+                return stream
+            except Exception as e:
+                self._resampler = None
+                self.logger.warning(f"以设备原生格式打开输入流失败，改为直接请求 {self.RATE}Hz 单声道: {e}")
                 
-            wf = wave.open(filename, 'wb')
-            wf.setnchannels(1)
-            wf.setsampwidth(self.pyaudio.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(16000)
-            wf.writeframes(b''.join(frames))
-            wf.close()
-            self.logger.info(f"Recording saved to {filename}")
+        self._resampler = None
+        self._stream_rate = self.RATE
+        return self.host.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.RATE,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=self.CHUNK,
+            stream_callback=self._stream_callback
+        )
+    
+    def _start_writer(self):
+        """开始把当前录音增量写入磁盘"""
+        self.writer = RecordingWriter(self.current_filename, sample_rate=self.RATE, file_format=self.file_format)
+        self.writer.stats = self.capture_stats
+        self.writer.start(self.buffer)
+        self.current_filename = self.writer.filename
+    
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio回调：只把数据复制进采集缓冲区，其他处理都在回调之外进行"""
+        callback_start = time.perf_counter()
+        received = time.monotonic()
+        overflowed = bool(status & pyaudio.paInputOverflow)
+        if overflowed:
+            self.overflow_count += 1
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        self._handle_samples(samples)
+        if self.is_recording:
+            stream_time = time_info.get('input_buffer_adc_time') if time_info else None
+            self.capture_stats.on_chunk(self.buffer.end, frame_count / self._stream_rate, stream_time,
+                                        overflowed, received)
+        self.callback_seconds += time.perf_counter() - callback_start
+        self.callback_count += 1
+        if self.is_recording or self._warm_device is not None:
+            return (None, pyaudio.paContinue)
+        return (None, pyaudio.paComplete)
+        
+    def _process_callback(self, samples, overflows, lost_samples=0):
+        """采集子进程模式下由泵线程调用，samples已经是16kHz单声道"""
+        callback_start = time.perf_counter()
+        self.overflow_count += overflows
+        if len(samples):
+            self._handle_samples(samples)
+            if self.is_recording:
+                self.capture_stats.on_chunk(self.buffer.end, len(samples) / self.RATE, None, overflows,
+                                            missing=lost_samples / self.RATE)
+        self.callback_seconds += time.perf_counter() - callback_start
+        self.callback_count += 1
+        
+    def log_capture_process_stats(self):
+        stats = self.stream.stats()
+        message = f"采集子进程: 重启 {stats['restarts']} 次，丢失 {stats['lost_samples'] / self.RATE:.2f}s 音频"
+        if stats['restarts'] or stats['lost_samples']:
+            self.logger.warning(message)
+        else:
+            self.logger.debug(message)
+        
+    def _handle_samples(self, samples):
+        """处理一块16kHz单声道音频：处理链、写入采集缓冲区(或预录缓冲区)并推送给订阅的队列"""
+        if self.dsp is not None:
+            samples = self.dsp.process(samples)
+        if self.is_recording:
+            if self._preroll_pending:
+                # 常开模式开始录音后的第一个回调：先写入预录的音频
+                self._preroll_pending = False
+                preroll = self._preroll.view(self._preroll.end - self._preroll_samples)
+                self.buffer.write(preroll)
+                self._publish(preroll)
+            self.buffer.write(samples)
+            self._publish(samples)
+        elif self._preroll is not None:
+            self._preroll.write(samples)
+            self._preroll.release(self._preroll.end - self._preroll_samples)
+        
+    @property
+    def _preroll_samples(self):
+        return int(self.preroll_ms * self.RATE / 1000)
+        
+    @property
+    def warm(self):
+        """常开输入流是否已经打开"""
+        return self._warm_device is not None
+        
+    def open_warm_stream(self, device_index=None):
+        """打开常开的输入流：未录音时只保留最近preroll_ms的音频，开始录音不需要打开设备"""
+        if device_index is not None:
+            self.device_index = device_index
+        if self.device_index is None:
+            return False
+        if self._warm_device == self.device_index:
             return True
-        except Exception as e:
-            self.logger.error(f"Error saving recording: {str(e)}")
+        if self.is_recording:
             return False
-    
-    def _save_recording(self):
-        """保存当前录音帧到文件"""
+        self.close_warm_stream()
+        
         try:
-            return self._save_recording_from_frames(self.frames, self.current_filename)
+            open_start = time.perf_counter()
+            self._preroll = AudioBuffer(initial_seconds=max(1.0, self.preroll_ms / 500), sample_rate=self.RATE)
+            self.callback_seconds = 0.0
+            self.callback_count = 0
+            if self.dsp is not None:
+                self.dsp.reset()
+            self.stream = self._open_input_stream(self.device_index)
+            self._warm_device = self.device_index
+            self._warm_since = time.perf_counter()
+            self.logger.info(f"常开输入流已打开 (设备 {self.device_index}，预录 {self.preroll_ms}ms)，"
+                             f"耗时 {(time.perf_counter() - open_start) * 1000:.1f}ms")
+            return True
         except Exception as e:
-            self.logger.error(f"Error saving recording: {str(e)}")
+            self.logger.error(f"打开常开输入流失败: {e}")
+            self.stream = None
+            self._preroll = None
             return False
-    
-    def _record(self):
-        try:
-            last_realtime_update = time.time()
-            realtime_frames = []  # 实时模式的帧缓冲
             
-            self.logger.debug("Recording thread started")
-            time_since_last_level_log = 0
+    def close_warm_stream(self):
+        """关闭常开的输入流(录音过程中不会关闭)"""
+        if self._warm_device is None or self.is_recording:
+            return
+        self.log_warm_stats()
+        self._warm_device = None
+        if self.stream:
+            try:
+                self.host.close(self.stream)
+            except Exception as e:
+                self.logger.error(f"Error closing audio stream: {e}")
+            finally:
+                self.stream = None
+        self._preroll = None
+        
+    def warm_stats(self):
+        """常开输入流的开销：回调次数、平均每次回调耗时(us)和占用的CPU比例"""
+        elapsed = max(1e-6, time.perf_counter() - self._warm_since)
+        return {
+            "seconds": elapsed,
+            "callbacks": self.callback_count,
+            "callback_us": self.callback_seconds * 1e6 / max(1, self.callback_count),
+            "cpu_percent": self.callback_seconds / elapsed * 100,
+        }
+        
+    def log_warm_stats(self):
+        if self._warm_device is None:
+            return
+        stats = self.warm_stats()
+        self.logger.debug(
+            f"常开输入流已运行 {stats['seconds']:.0f}s: 回调 {stats['callbacks']} 次，"
+            f"平均 {stats['callback_us']:.1f}us，CPU占用 {stats['cpu_percent']:.3f}%"
+        )
+        
+    def _start_warm_recording(self, call_start):
+        """常开模式下开始录音：只需要标记位置，预录的音频由下一次回调写入"""
+        self.log_warm_stats()
+        self.buffer.reset()
+        # 缓冲区先写入预录的音频，提示音从预录之后开始
+        self._mark_start_cue(min(len(self._preroll), self._preroll_samples))
+        self.meter.start(self.buffer, ignore_until=self.cue_window[1])
+        self._start_writer()
+        self.overflow_count = 0
+        if self.dsp is not None:
+            # 常开输入流是连续的，预录的音频已经带着当前状态处理过，只重新启用停用的滤波器
+            self.dsp.restore()
+            self.dsp.reset_stats()
+        self.capture_stats.reset()
+        realtime_queue = self._subscribe_realtime()
+        self._preroll_pending = True
+        self.is_recording = True
+        self.logger.debug(f"录音启动延迟(常开输入流): {(time.perf_counter() - call_start) * 1000:.1f}ms")
+        
+        self.cues.play("start")
+            
+        if realtime_queue is not None:
+            self.realtime_thread = threading.Thread(target=self._realtime_loop, args=(realtime_queue,), daemon=True)
+            self.realtime_thread.start()
+        self.logger.info("Recording started successfully")
+        return True
+        
+    def _mark_start_cue(self, start):
+        """记录开始提示音可能出现在录音中的范围
+
+        提示音与录音同时开始播放，麦克风听得到扬声器时它会被录进去，长度超过最短语音，
+        不跳过的话会被当作语音，没有说话的录音也会被转写，免按键模式会在提示音之后自动停止。
+        """
+        self.cue_window = (start, start + int((self.cues.duration("start") + self.CUE_GUARD_S) * self.RATE))
+        
+    def subscribe(self, name, maxsize=8, policy=MERGE):
+        """为下游消费者创建一个有界队列，采集回调把之后的每个音频块放入队列
+        
+        采集回调只调用ChunkQueue.offer()，消费者再慢也不会阻塞采集。实时转写的引擎
+        和realtime_callback使用merge队列；需要不间断的完整音频或按位置随机读取的消费者
+        (写入器、带端点检测的电平表、提前转写和长录音)直接读取AudioBuffer，它们落后时
+        只是积压，同样不会阻塞采集。订阅应在开始录音之前，才能收到录音的第一块。
+        """
+        queue = ChunkQueue(name, maxsize=maxsize, policy=policy)
+        self._subscribers = self._subscribers + [queue]
+        return queue
+        
+    def unsubscribe(self, queue):
+        """停止向队列推送音频块，并记录队列的丢弃/合并计数"""
+        self._subscribers = [q for q in self._subscribers if q is not queue]
+        stats = queue.stats()
+        message = (f"音频队列 {queue.name} ({stats['policy']}): 放入 {stats['put']} 块，"
+                   f"丢弃 {stats['dropped']}，合并 {stats['merged']}，拒绝 {stats['rejected']}，最大积压 {stats['max_depth']}")
+        if stats['dropped'] or stats['merged'] or stats['rejected']:
+            self.logger.info(message)
+        else:
+            self.logger.debug(message)
+        
+    def _publish(self, samples):
+        for queue in self._subscribers:
+            queue.offer(samples)
             
+    def _subscribe_realtime(self):
+        if self.realtime_mode and self.realtime_callback:
+            return self.subscribe("realtime", policy=MERGE)
+        return None
+        
+    def _realtime_loop(self, queue):
+        """实时转写模式：定期把队列中的新音频交给realtime_callback
+        
+        回调在这个线程中执行，回调较慢时新音频在队列中合并，不影响采集。
+        """
+        callback = self.realtime_callback
+        position = self.buffer.start  # 队列从录音开始订阅，位置与采集缓冲区一致
+        try:
             while self.is_recording:
+                time.sleep(0.3)  # 每300毫秒发送一次
+                new_samples = queue.drain(timeout=0)
+                if new_samples is None or callback is None:
+                    continue
+                position += len(new_samples)
+                self.capture_stats.consumed("realtime", position)
                 try:
-                    start_time = time.time()
-                    data = self.stream.read(1024, exception_on_overflow=False)
-                    with self.lock:
-                        self.frames.append(data)
-                    
-                    # 计算音频电平
-                    audio_array = np.frombuffer(data, dtype=np.int16)
-                    abs_data = np.abs(audio_array)
-                    level = 0
-                    
-                    if len(abs_data) > 0:
-                        # 计算更准确的音频电平
-                        # 1. 计算RMS (root mean square)
-                        mean_squared = np.mean(abs_data**2)
-                        # 确保值有效并避免无效值错误
-                        if mean_squared > 0:
-                            rms = np.sqrt(mean_squared)
-                            # 2. 归一化到0-100的范围，使用对数比例
-                            # 增强音频电平显示，使其对低音量更敏感
-                            normalized_level = np.log10(max(1, rms)) / np.log10(32768) * 100
-                            # 提高低音量显示的灵敏度
-                            level = min(100, max(0, int(normalized_level * 1.5)))
-                    
-                    self.current_audio_level = level
-                    
-                    # 每秒记录一次音频电平
-                    time_since_last_level_log += time.time() - start_time
-                    if time_since_last_level_log >= 0.5:  # 改为每0.5秒记录一次
-                        self.logger.debug(f"Current audio level: {self.current_audio_level}")
-                        time_since_last_level_log = 0
-                    
-                    # 实时转写模式处理
-                    if self.realtime_mode and self.realtime_callback:
-                        # 将数据添加到实时帧缓冲区
-                        realtime_frames.append(data)
-                        
-                        # 更频繁地发送更新，每300毫秒一次
-                        current_time = time.time()
-                        if current_time - last_realtime_update >= 0.3:  # 从0.5秒减少到0.3秒
-                            if realtime_frames:
-                                # 回调处理音频数据块，并传递当前音频电平
-                                self.realtime_callback(b''.join(realtime_frames), self.current_audio_level)
-                                
-                                # 清空实时帧缓冲区，保持较小的延迟
-                                realtime_frames = []
-                                
-                                # 更新时间戳
-                                last_realtime_update = current_time
-                                
-                                # 记录调试信息
-                                self.logger.debug(f"发送实时音频数据块，音频电平: {self.current_audio_level}")
-                except IOError as e:
-                    # 捕获常见的音频流错误并记录
-                    self.logger.error(f"Audio stream error: {e}")
-                    if "Input overflowed" in str(e):
-                        # 输入溢出通常不是严重问题，可以继续
-                        continue
-                    else:
-                        # 其他IO错误可能需要停止录音
-                        self.is_recording = False
-                        break
+                    # 回调处理新音频(只读)，并传递当前音频电平
+                    callback(new_samples, self.current_audio_level)
                 except Exception as e:
-                    self.logger.error(f"Error reading from audio stream: {e}")
-                    self.is_recording = False
-                    break
-                    
-        except Exception as e:
-            self.logger.error(f"Error during recording: {str(e)}")
-            self.is_recording = False
+                    self.logger.error(f"实时回调出错: {e}")
+        finally:
+            self.unsubscribe(queue)
+                
+    @property
+    def current_audio_level(self):
+        """最新的音频电平(0-100)，由电平表线程计算"""
+        if not self.is_recording:
+            return 0
+        return self.meter.level
     
+    @property
+    def samples_recorded(self):
+        """当前录音已采集的样本数(包括已释放的部分)"""
+        return self.buffer.end
+        
+    def get_samples(self, start=0):
+        """返回当前录音从start样本开始的int16音频数据(只读视图，不复制)"""
+        return self.buffer.view(start)
+        
+    def speech_bounds(self, pad_ms=300):
+        """对当前(刚结束的)录音做语音端点检测
+        
+        Returns:
+            包含语音的 (开始样本, 结束样本)，前后各保留pad_ms；没有语音时返回None
+        """
+        samples = self.buffer.view()
+        offset = self.buffer.start
+        ignore = None
+        if self.cue_window is not None:
+            ignore = (self.cue_window[0] - offset, self.cue_window[1] - offset)
+        bounds = self.endpoint.speech_bounds(samples, ignore)
+        if bounds is None:
+            return None
+        pad = int(pad_ms * self.RATE / 1000)
+        return offset + max(0, bounds[0] - pad), offset + min(len(samples), bounds[1] + pad)
+        
+    def discard_before(self, sample_index):
+        """释放sample_index之前的音频(只释放已经写入磁盘的部分)
+        
+        Returns:
+            实际释放到的样本位置
+        """
+        start = self.buffer.start
+        if self.writer is not None:
+            sample_index = min(sample_index, self.writer.position)
+        if sample_index <= start:
+            return start
+        self.buffer.release(sample_index)
+        self.logger.debug(f"释放 {(sample_index - start) / self.RATE:.1f}s 已完成转写的音频，当前保留 {len(self.buffer) / self.RATE:.1f}s")
+        return self.buffer.start
+        
     def get_audio_level(self):
         # 在未录音状态下生成一些随机的低电平值，确保波形显示可见
         if not self.is_recording:
@@ -345,8 +570,7 @@ class AudioRecorder:
         try:
             if self.is_recording:
                 self.stop()
-            if hasattr(self, 'pyaudio') and self.pyaudio:
-                self.pyaudio.terminate()
+            self.close_warm_stream()
         except Exception as e:
             logging.error(f"Error in AudioRecorder.__del__: {e}")
 
@@ -356,10 +580,12 @@ class AudioRecorder:
         
         # 检查设备是否有效
         try:
-            device_info = self.pyaudio.get_device_info_by_index(device_index)
+            device_info = self.host.device_info(device_index)
             if device_info and device_info.get('maxInputChannels') > 0:
                 self.logger.info(f"录音设备设置成功: {device_info.get('name')} (ID: {device_index})")
                 self.device_index = device_index
+                if self.warm and self._warm_device != device_index:
+                    self.open_warm_stream(device_index)
                 return True
             else:
                 self.logger.error(f"无效的录音设备 ID: {device_index}")
@@ -0,0 +1,180 @@
+import os
+import glob
+import time
+import wave
+import logging
+import threading
+
+import numpy as np
+
+PARTIAL_SUFFIX = ".partial"
+
+logger = logging.getLogger(__name__)
+
+
+def _has_soundfile():
+    try:
+        import soundfile  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def read_int16(path):
+    """读取录音文件(WAV或FLAC)为16kHz int16数组"""
+    if path.lower().endswith(".flac"):
+        import soundfile
+        samples, _ = soundfile.read(path, dtype="int16")
+        return samples
+    with wave.open(path, "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+class RecordingWriter:
+    """录音过程中在后台线程把采集的音频增量写入磁盘
+
+    写入线程通过AudioBuffer的读取游标按固定间隔取出新音频，采集回调不做任何磁盘操作。
+    缓冲区就是采集和写入之间的队列：录音器只会释放已经写入磁盘的音频，
+    写入落后超过max_backlog_s时记录警告。
+
+    录音过程中写入 <文件名>.partial：WAV每次写入后都会更新文件头，FLAC由libsndfile
+    逐帧编码(需要安装soundfile)。停止时只需要写完剩余音频并重命名；程序崩溃留下的
+    .partial文件可以在下次启动时用recover_partial_recordings()恢复。
+    """
+
+    def __init__(self, filename, sample_rate=16000, file_format="wav", interval=0.25, max_backlog_s=5.0):
+        if file_format == "flac" and not _has_soundfile():
+            logger.warning("未安装soundfile，录音改为保存为WAV")
+            file_format = "wav"
+        self.file_format = file_format
+        self.filename = os.path.splitext(filename)[0] + "." + file_format
+        self.partial_filename = self.filename + PARTIAL_SUFFIX
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_backlog = int(max_backlog_s * sample_rate)
+        self.position = 0  # 已经写入磁盘的样本位置
+        self.max_backlog_seen = 0
+        self.stats = None  # 可选的CaptureStats，记录采集到写入磁盘的延迟
+        self._file = None
+        self._reader = None
+        self._thread = None
+        self._running = False
+        self._write_lock = threading.Lock()
+
+    def _open(self):
+        if self.file_format == "flac":
+            import soundfile
+            return soundfile.SoundFile(self.partial_filename, "w", samplerate=self.sample_rate, channels=1,
+                                       format="FLAC", subtype="PCM_16")
+        wf = wave.open(self.partial_filename, "wb")
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(self.sample_rate)
+        return wf
+
+    def start(self, buffer):
+        """开始把buffer中的音频写入文件"""
+        self._file = self._open()
+        self._reader = buffer.reader(buffer.start)
+        self.position = self._reader.position
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            tick = time.perf_counter()
+            try:
+                backlog = self._reader.available
+                self.max_backlog_seen = max(self.max_backlog_seen, backlog)
+                if backlog > self.max_backlog:
+                    logger.warning(f"录音写入落后 {backlog / self.sample_rate:.1f}s")
+                self._write_available()
+            except Exception as e:
+                logger.error(f"写入录音文件出错: {e}")
+            time.sleep(max(0.0, self.interval - (time.perf_counter() - tick)))
+
+    def _write_available(self):
+        with self._write_lock:
+            if self._file is None:
+                return
+            samples = self._reader.read()
+            if len(samples) == 0:
+                return
+            if self.file_format == "flac":
+                self._file.write(samples)
+                self._file.flush()
+            else:
+                self._file.writeframes(samples)  # 同时更新WAV文件头
+            self.position = self._reader.position
+            if self.stats is not None:
+                self.stats.consumed("writer", self.position)
+
+    def finish(self):
+        """写入剩余音频并关闭文件，返回最终的文件路径；没有录到音频时删除文件并返回None"""
+        self._running = False
+        self._thread = None
+        self._write_available()
+        with self._write_lock:
+            if self._file is None:
+                return None
+            self._file.close()
+            self._file = None
+        if self.position == 0:
+            os.remove(self.partial_filename)
+            return None
+        os.replace(self.partial_filename, self.filename)
+        return self.filename
+
+
+def _repair_wav(path):
+    """根据文件大小重写WAV文件头(崩溃时文件头可能少记了最后一次写入)
+
+    Returns:
+        (样本数, 采样率)
+    """
+    header_size = 44
+    with open(path, "r+b") as f:
+        f.seek(24)
+        sample_rate = int.from_bytes(f.read(4), "little") or 16000
+        f.seek(0, os.SEEK_END)
+        data_size = f.tell() - header_size
+        data_size -= data_size % 2
+        if data_size <= 0:
+            return 0, sample_rate
+        f.seek(4)
+        f.write((36 + data_size).to_bytes(4, "little"))
+        f.seek(40)
+        f.write(data_size.to_bytes(4, "little"))
+    return data_size // 2, sample_rate
+
+
+def recover_partial_recordings(directory):
+    """恢复程序崩溃时留下的.partial录音文件，返回恢复的文件路径列表"""
+    recovered = []
+    for partial in sorted(glob.glob(os.path.join(directory, "*" + PARTIAL_SUFFIX))):
+        target = partial[:-len(PARTIAL_SUFFIX)]
+        try:
+            if target.lower().endswith(".flac"):
+                # libsndfile可以读取截断的FLAC，重新编码一次得到完整的文件
+                import soundfile
+                samples, sample_rate = soundfile.read(partial, dtype="int16")
+                frames = len(samples)
+                if frames == 0:
+                    logger.info(f"中断的录音 {partial} 没有音频，已删除")
+                    os.remove(partial)
+                    continue
+                soundfile.write(target, samples, sample_rate, format="FLAC", subtype="PCM_16")
+                os.remove(partial)
+            else:
+                frames, sample_rate = _repair_wav(partial)
+                if frames == 0:
+                    logger.info(f"中断的录音 {partial} 没有音频，已删除")
+                    os.remove(partial)
+                    continue
+                os.replace(partial, target)
+            logger.info(f"已恢复中断的录音: {target} ({frames / sample_rate:.1f}s)")
+            recovered.append(target)
+        except Exception as e:
+            logger.error(f"恢复录音 {partial} 失败: {e}")
+    return recovered
@@ -0,0 +1,80 @@
+from math import gcd
+
+import numpy as np
+
+
+def design_lowpass(up, down, taps_per_phase=32, rolloff=0.9, beta=8.0):
+    """设计多相重采样使用的Kaiser窗sinc低通滤波器(在上采样后的采样率下)"""
+    n_taps = taps_per_phase * up
+    cutoff = 0.5 / max(up, down) * rolloff  # 归一化截止频率(周期/样本)
+    t = np.arange(n_taps) - (n_taps - 1) / 2.0
+    h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(n_taps, beta)
+    # 归一化为每个相位的直流增益为1
+    return (h / h.sum() * up).astype(np.float32)
+
+
+class StreamingResampler:
+    """流式多相重采样器：把设备原生采样率/声道的int16音频转换为16kHz单声道
+
+    先对声道取平均，再以有理数比例 up/down 做多相FIR滤波。每个输出样本只计算
+    对应相位的系数，整块输出通过滑动窗口视图和einsum一次算完。
+    降采样时截止频率按down缩小，滤波器长度也按 max(up, down)/up 放大，
+    使过渡带宽度(以输出采样率计)和阻带衰减与比例无关：48kHz->16kHz每个相位96个系数。
+    块之间保留每相位系数数-1个输入样本和输出相位，结果与一次性处理整段音频一致。
+    """
+
+    def __init__(self, in_rate, out_rate=16000, channels=1, taps_per_phase=32):
+        in_rate = int(round(in_rate))
+        divisor = gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.taps = -(-taps_per_phase * max(self.up, self.down) // self.up)  # 每个相位的系数数
+        h = design_lowpass(self.up, self.down, self.taps)
+        # phases[p, k] = h[p + k * up]，与输入 x[base - k] 相乘
+        self.phases = h.reshape(self.taps, self.up).T.copy()
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._consumed = 0  # 已经进入历史的输入样本数
+        self._produced = 0  # 已经输出的样本数
+
+    @property
+    def passthrough(self):
+        return self.up == self.down and self.channels == 1
+
+    def downmix(self, samples):
+        """交错的多声道int16 -> 单声道float32"""
+        if self.channels == 1:
+            return samples.astype(np.float32)
+        frames = len(samples) // self.channels
+        return samples[:frames * self.channels].reshape(frames, self.channels).mean(axis=1, dtype=np.float32)
+
+    def process(self, samples):
+        """处理一块交错int16音频，返回16kHz单声道int16"""
+        if self.passthrough:
+            return samples
+        mono = self.downmix(samples)
+        if self.up == self.down:
+            return np.clip(mono, -32768, 32767).astype(np.int16)
+
+        x = np.concatenate([self._history, mono])
+        available = self._consumed + len(mono)  # 全局可用的输入样本数
+        # 输出n需要的最后一个输入样本是 (n * down) // up，必须已经到达
+        last = (available * self.up - 1) // self.down
+        n = np.arange(self._produced, last + 1, dtype=np.int64)
+        positions = n * self.down
+        bases = positions // self.up - self._consumed + (self.taps - 1)  # 在x中的下标
+        phases = positions % self.up
+
+        # windows[i] = x[i : i + taps] 倒序后与相位系数相乘
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.taps)[:, ::-1]
+        out = np.einsum("ij,ij->i", windows[bases - (self.taps - 1)], self.phases[phases])
+
+        self._produced = last + 1
+        self._consumed = available
+        self._history = x[len(x) - (self.taps - 1):].copy()
+        return np.clip(out, -32768, 32767).astype(np.int16)
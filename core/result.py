@@ -0,0 +1,116 @@
+from array import array
+import math
+
+
+class TranscriptionResult:
+    """一次转写的结果
+
+    片段的时间和置信度保存在紧凑的数组中，文本只在第一次访问text时拼接。
+    出错时不抛出异常的入口会设置error字段，而不是把错误信息写进文本。
+    """
+
+    __slots__ = (
+        "_texts", "starts", "ends", "avg_logprobs", "temperatures",
+        "language", "language_probability", "duration", "timings", "metrics", "error", "_text",
+    )
+
+    def __init__(self, language=None, language_probability=0.0, duration=0.0, error=None):
+        self._texts = []
+        self.starts = array("f")
+        self.ends = array("f")
+        self.avg_logprobs = array("f")
+        self.temperatures = array("f")
+        self.language = language
+        self.language_probability = language_probability
+        self.duration = duration
+        self.timings = {}  # 各阶段耗时(秒)
+        self.metrics = {}  # 其他解码指标
+        self.error = error
+        self._text = None
+
+    @classmethod
+    def from_error(cls, message):
+        """创建一个表示失败的结果"""
+        return cls(error=message)
+
+    def add_segment(self, start, end, text, avg_logprob=0.0, temperature=0.0):
+        """追加一个片段"""
+        self._texts.append(text.strip())
+        self.starts.append(start)
+        self.ends.append(end)
+        self.avg_logprobs.append(avg_logprob)
+        self.temperatures.append(temperature)
+        self._text = None
+
+    def extend(self, other, offset=0.0):
+        """追加另一个结果的所有片段，时间整体偏移offset秒"""
+        for start, end, text, logprob, temperature in other.segments():
+            self.add_segment(start + offset, end + offset, text, logprob, temperature)
+        if other.language and not self.language:
+            self.language = other.language
+            self.language_probability = other.language_probability
+        self.duration = max(self.duration, other.duration + offset)
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        if other.error and not self.error:
+            self.error = other.error
+
+    def rescale(self, factor):
+        """把所有时间乘以factor(例如变速转写后换算回原始时间轴)"""
+        for i in range(len(self.starts)):
+            self.starts[i] *= factor
+            self.ends[i] *= factor
+        self.duration *= factor
+
+    def clear_segments(self):
+        """丢弃所有片段(例如识别为广告或幻觉内容时)"""
+        self._texts = []
+        self.starts = array("f")
+        self.ends = array("f")
+        self.avg_logprobs = array("f")
+        self.temperatures = array("f")
+        self._text = None
+
+    def segments(self):
+        """逐个返回 (开始, 结束, 文本, 平均对数概率, 温度)"""
+        return zip(self.starts, self.ends, self._texts, self.avg_logprobs, self.temperatures)
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = " ".join(t for t in self._texts if t)
+        return self._text
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def is_empty(self):
+        return not self.text
+
+    @property
+    def confidence(self):
+        """按片段时长加权的平均token概率"""
+        total = weighted = 0.0
+        for start, end, logprob in zip(self.starts, self.ends, self.avg_logprobs):
+            length = max(end - start, 1e-3)
+            total += length
+            weighted += length * math.exp(logprob)
+        return weighted / total if total else 0.0
+
+    @property
+    def fallback_count(self):
+        """使用了温度回退(temperature > 0)的片段数"""
+        return sum(1 for t in self.temperatures if t > 0)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        if self.error:
+            return f"TranscriptionResult(error={self.error!r})"
+        return f"TranscriptionResult(segments={len(self)}, language={self.language!r}, text={self.text[:40]!r})"
@@ -0,0 +1,182 @@
+import time
+import logging
+
+import numpy as np
+
+from core.endpoint import split_windows
+from core.result import TranscriptionResult
+
+SAMPLE_RATE = 16000
+MAX_WINDOW_TOKENS = 224  # 每个窗口最多生成的token数，与Whisper的sample_len一致
+
+
+class SpeculativeDecoder:
+    """草稿-验证(speculative)解码：蒸馏模型提出token，大模型一次前向验证
+
+    distil-large-v3的编码器与large-v3相同(蒸馏时冻结)，所以每个窗口只用大模型编码一次，
+    两个模型共用编码结果。每一轮由草稿模型贪心生成最多lookahead个token，大模型用
+    align()对整段 前缀+草稿 做一次teacher forcing前向，得到每个草稿token的概率。
+    概率大于0.5的token必然是大模型的argmax，因此接受到第一个不满足条件的token为止，
+    被拒绝的位置由大模型生成一个token。最终输出与大模型贪心解码一致，而大部分token
+    只需要草稿模型逐个生成。
+
+    两个模型交替运行而不是同时运行，所以各自都可以使用全部推理线程。
+    只支持不带时间戳的转写任务，每个窗口输出一个片段。
+
+    输出只等价于大模型的贪心解码(beam_size=1、不做温度回退)，与引擎默认的
+    beam_size=5加温度回退的结果可能不同。
+    """
+
+    def __init__(self, target_model, draft_model, lookahead=32, accept_prob=0.5):
+        self.logger = logging.getLogger(__name__)
+        self.target = target_model
+        self.draft = draft_model
+        self.lookahead = lookahead
+        self.accept_prob = accept_prob
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"drafted": 0, "accepted": 0, "rounds": 0, "target_steps": 0, "windows": 0}
+
+    @property
+    def acceptance_rate(self):
+        return self.stats["accepted"] / max(1, self.stats["drafted"])
+
+    def _encode(self, audio):
+        """计算log-mel特征并用大模型编码，返回 (编码结果, 有效帧数)"""
+        extractor = self.target.feature_extractor
+        features = extractor(audio)
+        num_frames = min(features.shape[-1], extractor.nb_max_frames)
+        features = features[:, :extractor.nb_max_frames]
+        if features.shape[-1] < extractor.nb_max_frames:
+            features = np.pad(features, ((0, 0), (0, extractor.nb_max_frames - features.shape[-1])))
+        return self.target.encode(features), num_frames
+
+    def _detect_language(self, encoder_output):
+        results = self.target.model.detect_language(encoder_output)
+        token, probability = results[0][0]
+        return token[2:-2], probability
+
+    def _make_tokenizer(self, language):
+        from faster_whisper.tokenizer import Tokenizer
+        return Tokenizer(self.target.hf_tokenizer, self.target.model.is_multilingual,
+                         task="transcribe", language=language)
+
+    def _generate(self, model, encoder_output, prompt, prefix, max_new_tokens):
+        """在 提示+已接受token 之后贪心生成最多max_new_tokens个新token
+
+        CTranslate2的max_length包括提示token(faster-whisper同样传入 len(prompt) + 新token数)。
+        """
+        decoder_prompt = prompt + prefix
+        result = model.model.generate(encoder_output, [decoder_prompt], beam_size=1,
+                                      max_length=len(decoder_prompt) + max_new_tokens,
+                                      include_prompt_in_result=False)
+        tokens = list(result[0].sequences_ids[0])
+        # 结果只应包含新生成的token；保险起见去掉可能带回的已接受前缀，避免重复追加
+        if prefix and tokens[:len(prefix)] == prefix:
+            tokens = tokens[len(prefix):]
+        return tokens[:max_new_tokens]
+
+    def _decode_window(self, encoder_output, num_frames, tokenizer):
+        """对一个窗口进行草稿-验证解码，返回 (token列表, 已验证token的平均对数概率)"""
+        sot = list(tokenizer.sot_sequence)
+        prompt = sot + [tokenizer.no_timestamps]
+        tokens = []
+        logprobs = []
+        while len(tokens) < MAX_WINDOW_TOKENS:
+            self.stats["rounds"] += 1
+            budget = min(self.lookahead, MAX_WINDOW_TOKENS - len(tokens))
+            draft = self._generate(self.draft, encoder_output, prompt, tokens, budget)
+
+            accepted = 0
+            if draft:
+                alignment = self.target.model.align(encoder_output, sot, [tokens + draft], num_frames)[0]
+                probs = alignment.text_token_probs[len(tokens):]
+                for prob in probs:
+                    if prob <= self.accept_prob:
+                        break
+                    logprobs.append(float(np.log(prob)))
+                    accepted += 1
+                self.stats["drafted"] += len(draft)
+                self.stats["accepted"] += accepted
+                tokens.extend(draft[:accepted])
+
+            if accepted == budget:
+                # 草稿全部被接受且没有结束，继续下一轮
+                continue
+
+            # 草稿在此处被拒绝或草稿模型认为已经结束：由大模型决定这个位置的token
+            self.stats["target_steps"] += 1
+            correction = self._generate(self.target, encoder_output, prompt, tokens, 1)
+            if not correction:
+                break
+            tokens.extend(correction)
+        return tokens, (float(np.mean(logprobs)) if logprobs else 0.0)
+
+    def _apply_vad(self, audio, vad_parameters):
+        """用faster-whisper的Silero VAD去掉静音，返回 (语音部分拼接后的音频, 时间映射)，没有语音时音频为None"""
+        from faster_whisper.vad import VadOptions, SpeechTimestampsMap, get_speech_timestamps
+
+        chunks = get_speech_timestamps(audio, VadOptions(**vad_parameters))
+        if not chunks:
+            return None, None
+        speech = np.concatenate([audio[chunk["start"]:chunk["end"]] for chunk in chunks])
+        return speech, SpeechTimestampsMap(chunks, SAMPLE_RATE)
+
+    def transcribe(self, audio, language="zh", vad_parameters=None):
+        """转写16kHz float32音频或音频文件，返回TranscriptionResult
+
+        vad_parameters不为None时先用VAD去掉静音(与model.transcribe的vad_filter相同)，
+        片段时间换算回原始音频的时间轴。
+        """
+        if isinstance(audio, str):
+            from faster_whisper import decode_audio
+            audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+
+        drafted, accepted = self.stats["drafted"], self.stats["accepted"]
+        result = TranscriptionResult(duration=len(audio) / SAMPLE_RATE)
+        timestamps = None
+        if vad_parameters is not None:
+            audio, timestamps = self._apply_vad(audio, vad_parameters)
+            if audio is None:
+                return result
+        encode_time = decode_time = 0.0
+        tokenizer = None
+        for start, end in split_windows(audio):
+            encode_start = time.perf_counter()
+            encoder_output, num_frames = self._encode(audio[start:end])
+            decode_start = time.perf_counter()
+            encode_time += decode_start - encode_start
+
+            if tokenizer is None:
+                if language in (None, "auto"):
+                    language, probability = self._detect_language(encoder_output)
+                    result.language_probability = probability
+                else:
+                    result.language_probability = 1.0
+                result.language = language
+                tokenizer = self._make_tokenizer(language)
+
+            tokens, avg_logprob = self._decode_window(encoder_output, num_frames, tokenizer)
+            decode_time += time.perf_counter() - decode_start
+            self.stats["windows"] += 1
+            text = tokenizer.decode(tokens)
+            if text.strip():
+                segment_start, segment_end = start / SAMPLE_RATE, end / SAMPLE_RATE
+                if timestamps is not None:
+                    segment_start = timestamps.get_original_time(segment_start)
+                    segment_end = timestamps.get_original_time(segment_end)
+                result.add_segment(segment_start, segment_end, text, avg_logprob)
+
+        window_drafted = self.stats["drafted"] - drafted
+        window_accepted = self.stats["accepted"] - accepted
+        result.timings["encode"] = encode_time
+        result.timings["decode"] = decode_time
+        result.metrics["speculative_drafted"] = window_drafted
+        result.metrics["speculative_accepted"] = window_accepted
+        result.metrics["speculative_acceptance"] = window_accepted / max(1, window_drafted)
+        self.logger.info(
+            f"草稿-验证解码: 接受 {window_accepted}/{window_drafted} 个草稿token "
+            f"({result.metrics['speculative_acceptance']:.0%})，编码 {encode_time:.2f}s，解码 {decode_time:.2f}s"
+        )
+        return result
@@ -0,0 +1,51 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def time_stretch(audio, speed, sample_rate=SAMPLE_RATE, frame_ms=40, tolerance_ms=10):
+    """用WSOLA算法在不改变音高的情况下加快语速
+
+    输出以固定的合成步长(半帧)叠加汉宁窗帧，每一帧在输入中的名义位置按speed倍推进，
+    并在±tolerance_ms范围内寻找与上一帧自然延续最相似的位置，避免相位不连续。
+    Args:
+        audio: 16kHz float32音频
+        speed: 加速倍数，例如1.25表示输出时长为输入的1/1.25
+    Returns:
+        float32音频，长度约为 len(audio) / speed
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    if speed == 1.0 or len(audio) == 0:
+        return audio
+
+    frame = int(sample_rate * frame_ms / 1000)
+    synthesis_hop = frame // 2
+    analysis_hop = synthesis_hop * speed
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+    window = np.hanning(frame + 2)[1:-1].astype(np.float32)  # 50%重叠时叠加和为常数
+
+    # 两端补零，保证搜索区间和最后一帧不越界
+    padded = np.concatenate([np.zeros(tolerance, np.float32), audio, np.zeros(frame + 2 * tolerance, np.float32)])
+    n_frames = int((len(audio) - frame) / analysis_hop) + 2 if len(audio) > frame else 1
+    output = np.zeros(n_frames * synthesis_hop + frame, dtype=np.float32)
+    norm = np.zeros_like(output)
+
+    previous = tolerance  # 上一帧在padded中的实际起点
+    for k in range(n_frames):
+        nominal = int(round(k * analysis_hop)) + tolerance
+        if k == 0:
+            position = nominal
+        else:
+            # 上一帧的自然延续作为模板，在名义位置附近找相关性最大的起点
+            template = padded[previous + synthesis_hop:previous + synthesis_hop + frame]
+            region = padded[nominal - tolerance:nominal + tolerance + frame]
+            correlation = np.correlate(region, template, mode="valid")
+            position = nominal - tolerance + int(np.argmax(correlation))
+        out = k * synthesis_hop
+        output[out:out + frame] += padded[position:position + frame] * window
+        norm[out:out + frame] += window
+        previous = position
+
+    length = int(round(len(audio) / speed))
+    norm = np.maximum(norm[:length], 1e-3)
+    return output[:length] / norm
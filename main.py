@@ -11,12 +11,13 @@ from pathlib import Path
 
 from utils.logging import setup_logging
 from utils.config import Config
+from utils.thread_budget import configure_thread_env
 
 logger = logging.getLogger("voice_typer")
 
-# 设置配置和日志
-config = Config()
-setup_logging(config)
+# 配置在main()中创建：采集子进程以spawn方式启动时会把本模块重新导入为
+# __mp_main__，模块级的初始化会在子进程里再读一遍配置、重复设置日志和线程预算
+config = None
 
 def cleanup_old_recordings(keep_recent=3):
     """清理旧的录音文件，只保留最近的几个文件"""
@@ -28,14 +29,14 @@ def cleanup_old_recordings(keep_recent=3):
     
     # 查找所有录音文件
     recording_files = []
-    for file_path in glob.glob(os.path.join(temp_dir, "recording_*.wav")):
+    for file_path in glob.glob(os.path.join(temp_dir, "recording_*.*")):
         try:
-            # 从文件名中获取时间戳
-            filename = os.path.basename(file_path)
-            if not filename.startswith("recording_"):
+            # 从文件名中获取时间戳(录音可能是.wav或.flac，写入中的.partial文件不处理)
+            filename, ext = os.path.splitext(os.path.basename(file_path))
+            if not filename.startswith("recording_") or ext not in (".wav", ".flac"):
                 continue
                 
-            timestamp_str = filename.replace("recording_", "").replace(".wav", "")
+            timestamp_str = filename.replace("recording_", "")
             if not timestamp_str.isdigit():
                 continue
                 
@@ -67,6 +68,12 @@ def parse_args():
     parser = argparse.ArgumentParser(description='Voice Typer')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
     parser.add_argument('--test-input', action='store_true', help='Test text input functionality')
+    parser.add_argument('--autotune', metavar='FIXTURE_DIR', help='Run decoder preset autotuning on a labeled fixture directory')
+    parser.add_argument('--models', help='Comma separated model names used by --autotune / --apply-preset')
+    parser.add_argument('--language', default='zh', help='Audio language used by --autotune / --transcribe')
+    parser.add_argument('--apply-preset', metavar='PRESET', help='Write a decoder preset into the config for the selected models')
+    parser.add_argument('--transcribe', nargs='+', metavar='FILE', help='Transcribe audio files and print one line per file')
+    parser.add_argument('--pack', action='store_true', help='Pack short files into shared 30-second windows for --transcribe')
     return parser.parse_args()
 
 def test_text_input():
@@ -102,55 +109,81 @@ def test_text_input():
     
     logger.info("文本输入测试完成")
 
+def run_autotune_command(args):
+    """运行解码预设自动调优，或把指定预设写入配置"""
+    from core import autotune
+    from core.engine import WhisperEngine
+    
+    engine = WhisperEngine(config)
+    models = [m.strip() for m in args.models.split(",")] if args.models else None
+    
+    if args.autotune:
+        results = autotune.run_autotune(engine, args.autotune, models=models, language=args.language)
+        metric = "cer" if args.language in ("zh", "ja", "ko") else "wer"
+        print(autotune.format_report(results, metric=metric))
+        results_path = os.path.join(config.config_dir, "autotune_results.json")
+        autotune.save_results(results, results_path)
+        logger.info(f"调优结果已保存到: {results_path}")
+        models = models or list(results.keys())
+    
+    if args.apply_preset:
+        if not models:
+            print("请使用 --models 指定要应用预设的模型")
+            return
+        for model_name in models:
+            autotune.apply_preset(config, model_name, args.apply_preset)
+            print(f"模型 {model_name} 已使用预设 {args.apply_preset}")
+
+def run_transcribe_command(args):
+    """批量转写命令行指定的音频文件，每个文件输出一行"""
+    from core.engine import WhisperEngine
+    
+    engine = WhisperEngine(config)
+    if args.models:
+        engine.load_model(args.models.split(",")[0].strip(), allow_download=False)
+    
+    start_time = time.perf_counter()
+    results = engine.transcribe_files(args.transcribe, language=args.language, pack=args.pack)
+    elapsed = time.perf_counter() - start_time
+    
+    audio_seconds = 0.0
+    for audio_file, result in zip(args.transcribe, results):
+        audio_seconds += result.duration
+        print(f"{audio_file}\t{result.text if result.ok else '[error] ' + result.error}")
+    logger.info(f"转写 {len(results)} 个文件 ({audio_seconds:.1f}s 音频) 耗时 {elapsed:.2f}s，"
+                f"RTF {elapsed / max(audio_seconds, 1e-6):.3f}{'，打包模式' if args.pack else ''}")
+
 def play_notification_sound():
-    """播放提示音以提示转写完成"""
+    """在后台播放转写完成提示音，立即返回"""
     try:
-        # 使用PyAudio播放简短提示音
-        try:
-            import pyaudio
-            import numpy as np
-            
-            pa = pyaudio.PyAudio()
-            beep_stream = pa.open(
-                format=pyaudio.paFloat32,
-                channels=1,
-                rate=16000,
-                output=True
-            )
-            
-            # 生成提示音（440Hz和880Hz，各200ms）
-            duration = 0.2  # 秒
-            volume = 0.5   # 音量（0.0-1.0）
-            fs = 16000     # 采样率
-            
-            # 第一个音（440Hz）
-            samples1 = (np.sin(2*np.pi*np.arange(fs*duration)*440/fs)).astype(np.float32)
-            samples1 = samples1 * volume
-            
-            # 短暂停顿
-            pause = np.zeros(int(fs*0.1), dtype=np.float32)
-            
-            # 第二个音（880Hz）
-            samples2 = (np.sin(2*np.pi*np.arange(fs*duration)*880/fs)).astype(np.float32)
-            samples2 = samples2 * volume
-            
-            # 合并两个提示音
-            samples = np.concatenate([samples1, pause, samples2])
-            
-            # 播放提示音
-            beep_stream.write(samples.tobytes())
-            
-            # 关闭流
-            beep_stream.stop_stream()
-            beep_stream.close()
-            pa.terminate()
-            
-            logger.debug("播放转写完成提示音")
-            
-        except Exception as e:
-            logger.warning(f"播放提示音失败: {e}")
+        from core.cues import get_cue_player
+        get_cue_player().play("done")
+        logger.debug("播放转写完成提示音")
     except Exception as e:
-        logger.error(f"播放通知声音过程中出错: {e}")
+        logger.warning(f"播放提示音失败: {e}")
+
+def on_audio_devices_changed(window, recorder):
+    """音频设备插拔：关闭常开输入流和提示音输出流，刷新共享的设备表
+    
+    刷新完成后由on_audio_devices_refreshed更新设备列表。录音中不能重新初始化PortAudio，
+    只记下请求，录音循环结束时重新发出devices_changed。
+    """
+    from core.audio_host import get_audio_host
+    from core.cues import get_cue_player
+    host = get_audio_host()
+    if recorder.is_recording:
+        logger.info("录音中检测到音频设备变化，录音结束后刷新设备列表")
+        host.refresh()  # 有流打开，只记下请求
+        return
+    recorder.close_warm_stream()
+    get_cue_player().release()
+    host.refresh()
+
+def on_audio_devices_refreshed(window, recorder):
+    """共享设备表刷新后(包括输入流关闭后才执行的推迟刷新)：更新设备列表，重新打开常开输入流"""
+    window.init_device_list()
+    if recorder.warm_enabled and not recorder.warm and not recorder.is_recording:
+        recorder.open_warm_stream(window.get_selected_device_id())
 
 def transcribe_audio(audio_file, model_type="large-v3", language="zh", initial_prompt=None, target_language=None):
     """从音频文件转写文本
@@ -176,7 +209,7 @@ def transcribe_audio(audio_file, model_type="large-v3", language="zh", initial_p
         initial_prompt=initial_prompt, 
         target_language=target_language
     )
-    logger.info(f"转写结果: {result}")
+    logger.info(f"转写结果: {result.text if result.ok else result.error}")
     
     # 计算录音统计信息
     file_size = os.path.getsize(audio_file) / (1024 * 1024)  # 转换为MB
@@ -190,6 +223,49 @@ def transcribe_audio(audio_file, model_type="large-v3", language="zh", initial_p
     
     return result
 
+# 本次运行中因为没有语音或首尾静音而没有送入模型的音频
+silence_stats = {"recordings": 0, "skipped": 0, "saved_s": 0.0}
+MIN_TRIM_S = 0.5  # 首尾静音合计少于这个时长时不裁剪，直接转写录音文件
+
+def transcribe_recording(engine, recorder, file_path, preemptive, language, target_language):
+    """转写刚结束的录音：没有语音时跳过推理并返回None，否则裁掉首尾静音后转写"""
+    duration = len(recorder.get_samples()) / recorder.RATE
+    bounds = recorder.speech_bounds()
+    silence_stats["recordings"] += 1
+    
+    if bounds is None:
+        silence_stats["skipped"] += 1
+        silence_stats["saved_s"] += duration
+        logger.info(f"录音中没有检测到语音，跳过转写 ({duration:.1f}s)")
+        result = None
+    else:
+        result = preemptive.finalize(file_path) if preemptive is not None else None
+        if result is None:
+            start, end = bounds
+            trimmed = duration - (end - start) / recorder.RATE
+            if trimmed >= MIN_TRIM_S:
+                silence_stats["saved_s"] += trimmed
+                logger.info(f"裁掉首尾静音 {trimmed:.1f}s，转写 {start / recorder.RATE:.2f}s - {end / recorder.RATE:.2f}s")
+                result = engine.transcribe_samples(
+                    recorder.get_samples(start)[:end - start],
+                    language=language,
+                    target_language=target_language
+                )
+            else:
+                # 进行完整转写
+                result = engine.transcribe(
+                    audio_file=file_path,
+                    language=language,
+                    target_language=target_language
+                )
+    
+    if result is not None:
+        # 采集指标和解码耗时放在一起，便于区分结果慢是采集还是推理导致的
+        result.metrics.update(recorder.capture_stats.metrics())
+    logger.info(f"本次运行共 {silence_stats['recordings']} 次录音，跳过 {silence_stats['skipped']} 次没有语音的录音，"
+                f"少转写 {silence_stats['saved_s']:.1f}s 静音")
+    return result
+
 def run_recording_loop(window, engine, recorder):
     """录音和转写的主循环
     Args:
@@ -207,8 +283,28 @@ def run_recording_loop(window, engine, recorder):
     
     logger.info(f"录音设置 - 模式: {window.transcription_mode}, 语言: {selected_language}, 翻译目标: {target_language}")
     
+    # 长录音模式(仅批量模式)：在停顿处滚动完成转写，不限制录音时长
+    long_form = not is_realtime_mode and config.get("long_form", False)
+    
     # 设置最大录音时间为5分钟
-    timeout = time.time() + 300  # 5分钟超时
+    timeout = None if long_form else time.time() + 300  # 5分钟超时
+    
+    # 免按键模式：说话后末尾静音达到auto_stop_silence_ms时自动停止(长录音模式中的停顿是正常的，不启用)
+    auto_stop_ms = config.get("auto_stop_silence_ms", 1200) if config.get("auto_stop", False) and not long_form else None
+    if auto_stop_ms:
+        from core.endpoint import EnergyEndpointDetector
+        recorder.meter.detector = EnergyEndpointDetector(sample_rate=recorder.RATE)
+    else:
+        recorder.meter.detector = None
+    speech_end_time = None  # 自动停止时语音结束的时间
+    
+    # 实时模式下引擎通过有界队列接收新音频：转写较慢时新块在队列中合并，采集不受影响
+    engine_queue = None
+    if is_realtime_mode:
+        from core.chunk_queue import MERGE
+        engine.clear_buffer()
+        engine_queue = recorder.subscribe("engine", policy=MERGE)  # 在开始录音前订阅，不漏掉第一块
+    engine_position = 0
     
     try:
         # 开始录音
@@ -225,34 +321,73 @@ def run_recording_loop(window, engine, recorder):
         realtime_text = ""
         last_transcribe_time = time.time()
         
+        # 批量模式下利用末尾静音提前开始最终转写
+        preemptive = None
+        longform = None
+        if long_form:
+            from core.longform import LongFormTranscriber
+            longform = LongFormTranscriber(
+                engine,
+                language=selected_language,
+                target_language=target_language,
+                min_chunk_s=config.get("long_form_min_chunk_s", 15),
+                on_chunk=lambda chunk: window.append_partial_result(chunk.text)
+            )
+        elif not is_realtime_mode and config.get("preemptive_decode", True):
+            from core.preemptive import PreemptiveDecoder
+            preemptive = PreemptiveDecoder(
+                engine,
+                language=selected_language,
+                target_language=target_language,
+                silence_ms=config.get("preemptive_silence_ms", 700)
+            )
+        
         # 监听录音循环
         while window.is_recording:
-            if time.time() > timeout:
+            if timeout is not None and time.time() > timeout:
                 logger.info("录音超时，自动停止")
                 window.update_status("录音超时，自动停止")
                 break
                 
+            # 端点检测在电平表线程中随采集进行，这里只检查末尾静音
+            detector = recorder.meter.detector
+            if auto_stop_ms and detector.trailing_silence_ms() >= auto_stop_ms:
+                logger.info(f"检测到 {detector.trailing_silence_ms():.0f}ms 末尾静音，自动停止录音")
+                speech_end_time = time.time() - (detector.position - detector.last_speech_end) / recorder.RATE
+                break
+                
             # 更新音频电平
             try:
                 from PySide6.QtWidgets import QApplication
-                level = recorder.current_audio_level
-                window.update_audio_level(level)
+                # 电平由录音器的电平表线程计算，这里只把历史数组交给波形显示
+                window.update_audio_history(recorder.meter.levels())
                 QApplication.processEvents()
                 
                 # 实时转写模式处理
+                if engine_queue is not None:
+                    new_samples = engine_queue.drain(timeout=0)
+                    if new_samples is not None:
+                        engine.add_audio_chunk(new_samples)
+                        engine_position += len(new_samples)
+                        recorder.capture_stats.consumed("engine", engine_position)
                 if is_realtime_mode and time.time() - last_transcribe_time > 2.0:  # 每2秒尝试一次实时转写
-                    # 使用引擎进行实时转写
+                    # 使用引擎进行实时转写(转写add_audio_chunk累积的音频)
                     transcript = engine.get_realtime_transcription(
                         language=selected_language, 
                         target_language=target_language
                     )
                     
-                    if transcript:
+                    if transcript is not None and not transcript.is_empty:
                         # 更新UI显示转写结果
                         window.update_result(transcript)
-                        realtime_text = transcript
+                        realtime_text = transcript.text
                         
                     last_transcribe_time = time.time()
+                
+                if preemptive is not None:
+                    preemptive.update(recorder)
+                if longform is not None:
+                    longform.update(recorder)
             except Exception as e:
                 logger.error(f"录音循环中出错: {e}")
                 window.update_status(f"录音过程中出错: {str(e)}")
@@ -262,30 +397,48 @@ def run_recording_loop(window, engine, recorder):
         # 停止录音
         logger.info("停止录音")
         window.update_status("正在处理录音...")
+        stop_time = time.time()
         file_path = recorder.stop()
         
+        if longform is not None:
+            # 长录音模式只需要转写最后一段未完成的音频
+            window.update_status("正在转写最后一段...")
+            tail, result = longform.finalize(recorder)
+            logger.info(f"停止到得到文本耗时: {time.time() - stop_time:.2f}秒，共 {longform.chunk_count} 段")
+            if result.is_empty:
+                window.update_status("请说话...")
+            else:
+                window.update_result(tail, clipboard_text=result.text)
+                window.update_status("转写完成")
+                play_notification_sound()
         # 如果是批量模式或实时模式没有得到结果，则进行完整转写
-        if file_path and os.path.exists(file_path):
+        elif file_path and os.path.exists(file_path):
             if not is_realtime_mode or not realtime_text:
                 logger.info(f"开始转写录音文件: {file_path}")
                 window.update_status("正在转写...")
                 
-                # 进行完整转写
-                result = engine.transcribe(
-                    audio_file=file_path,
-                    language=selected_language,
-                    target_language=target_language
-                )
+                result = transcribe_recording(engine, recorder, file_path, preemptive,
+                                              selected_language, target_language)
+                logger.info(f"停止到得到文本耗时: {time.time() - stop_time:.2f}秒")
+                if speech_end_time is not None:
+                    logger.info(f"语音结束到得到文本耗时: {time.time() - speech_end_time:.2f}秒 "
+                                f"(其中静音等待 {stop_time - speech_end_time:.2f}秒)")
                 
-                if result:
+                if result is None:
+                    # 没有检测到语音，没有运行模型
+                    window.update_status("请说话...")
+                elif not result.ok:
+                    window.update_status(f"转写失败: {result.error}")
+                elif result.is_empty:
+                    window.update_status("请说话...")
+                else:
                     # 更新UI显示转写结果
                     window.update_result(result)
                     window.update_status("转写完成")
+                    logger.debug(f"转写耗时: {result.timings}, 置信度: {result.confidence:.2f}")
                     
                     # 播放提示音
                     play_notification_sound()
-                else:
-                    window.update_status("转写未能得到结果")
             else:
                 # 实时模式已有结果
                 window.update_status("实时转写完成")
@@ -301,9 +454,18 @@ def run_recording_loop(window, engine, recorder):
         logger.exception(e)
         window.update_status(f"处理过程中出错: {str(e)}")
     finally:
+        if engine_queue is not None:
+            recorder.unsubscribe(engine_queue)
+        if is_realtime_mode:
+            # 释放实时预览使用的音频和编码器缓存
+            engine.clear_buffer()
         # 恢复UI状态
         window.update_recording_state(False)
         window.update_audio_level(0)
+        # 录音中发生的设备插拔还没有处理(常开输入流或提示音输出流仍然打开)
+        from core.audio_host import get_audio_host
+        if get_audio_host().refresh_pending:
+            window.devices_changed.emit()
         logger.debug("录音循环结束")
 
 def on_toggle_recording(window, engine, recorder):
@@ -398,26 +560,13 @@ def on_model_change(window, engine, model_name):
     logger.info(f"切换到模型: {model_name}")
     window.update_status(f"正在切换到模型: {model_name}...")
     
-    # 重置引擎状态
-    engine.model = None
-    engine.initialized = False
-    
-    # 强制设置模型名称
-    engine.settings = {
-        "model_name": model_name,
-        "device": "cpu",
-        "compute_type": "int8",
-        "beam_size": 5,
-        "threads": min(os.cpu_count(), 8)  # 使用多线程
-    }
-    
     try:
         # 显示正在加载的提示
         window.update_status(f"正在加载模型 {model_name}...")
         logger.info(f"开始加载模型: {model_name}")
         
-        # 重新加载模型
-        engine.ensure_model_loaded()
+        # 卸载当前模型(包括草稿-验证解码器)并加载新模型
+        engine.load_model(model_name)
         
         window.update_status(f"已切换到模型: {model_name}")
         logger.info(f"模型切换成功: {model_name}")
@@ -427,6 +576,15 @@ def on_model_change(window, engine, model_name):
 
 def main():
     """主函数"""
+    global config
+    
+    # 设置配置和日志
+    config = Config()
+    setup_logging(config)
+    
+    # 在导入numpy/faster_whisper之前划分线程预算(环境变量会被采集子进程继承)
+    configure_thread_env()
+    
     args = parse_args()
     
     # 如果是测试文本输入模式
@@ -434,6 +592,16 @@ def main():
         test_text_input()
         return
     
+    # 解码预设自动调优模式
+    if args.autotune or args.apply_preset:
+        run_autotune_command(args)
+        return
+    
+    # 命令行批量转写模式
+    if args.transcribe:
+        run_transcribe_command(args)
+        return
+    
     # 设置调试模式
     if args.debug:
         logger.setLevel(logging.DEBUG)
@@ -447,6 +615,10 @@ def main():
     logger.debug(f"配置目录: {config._get_config_dir()}")
     logger.debug(f"模型目录: {config.models_dir}")
     
+    # 恢复上次异常退出时没有写完的录音
+    from core.recording_writer import recover_partial_recordings
+    recovered_recordings = recover_partial_recordings(os.path.join(os.path.expanduser("~"), ".voice_typer", "temp"))
+    
     # 清理旧录音文件，仅保留最近3个
     cleanup_old_recordings(keep_recent=3)
     
@@ -454,12 +626,20 @@ def main():
     try:
         from core.engine import WhisperEngine
         from core.recorder import AudioRecorder
+        from core.dsp import DSPChain
+        from core.audio_host import get_audio_host
         
         # 初始化语音引擎
         engine = WhisperEngine(config)
         
         # 初始化录音器
         recorder = AudioRecorder()
+        recorder.warm_enabled = config.get("warm_input_stream", False)
+        recorder.preroll_ms = config.get("preroll_ms", 300)
+        recorder.file_format = config.get("recording_format", "wav")
+        recorder.native_capture = config.get("native_capture", True)
+        recorder.capture_process = config.get("capture_process", False)
+        recorder.dsp = DSPChain.from_config(config, sample_rate=AudioRecorder.RATE)
         
         # 设置回调
         def setup_callbacks(window):
@@ -468,6 +648,10 @@ def main():
             window.toggle_recording_signal.connect(lambda: on_toggle_recording(window, engine, recorder))
             # 连接设备变更信号
             window.device_changed.connect(recorder.set_device)
+            # 设备插拔时刷新设备表，刷新后(可能在录音线程中推迟执行)更新设备列表
+            window.devices_changed.connect(lambda: on_audio_devices_changed(window, recorder))
+            window.devices_refreshed.connect(lambda: on_audio_devices_refreshed(window, recorder))
+            get_audio_host().add_refresh_listener(window.devices_refreshed.emit)
             # 连接模式切换信号
             window.transcription_mode_changed.connect(lambda mode: logger.info(f"转写模式已切换为: {mode}"))
             # 连接模型变更信号
@@ -490,6 +674,12 @@ def main():
         window = FloatingWindow(config)
         setup_callbacks(window)
         window.show()
+        if recovered_recordings:
+            window.update_status(f"已恢复 {len(recovered_recordings)} 个中断的录音: {recovered_recordings[-1]}")
+        
+        # 常开输入流模式：启动时就打开输入流，开始录音时不再需要打开设备
+        if recorder.warm_enabled:
+            recorder.open_warm_stream(window.get_selected_device_id())
         
         sys.exit(app.exec())
     except ImportError as e:
@@ -503,4 +693,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包后的程序启动采集子进程时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
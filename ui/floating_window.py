@@ -9,10 +9,10 @@ import platform
 import subprocess
 from ui.logo import create_app_icon, create_logo_pixmap
 from version import get_version
+from utils.model_paths import MODEL_REPOS, find_model_cache_dir, get_repo_cache_dir, get_repo_id, get_hf_cache_dir, resolve_local_model
 import tempfile
 import json
 import datetime
-import pyaudio
 import re
 import threading
 from typing import List, Dict, Any
@@ -25,6 +25,7 @@ class AudioVisualizer(QWidget):
         self.audio_level = 0
         self.levels = []
         self.max_levels = 50
+        self.meter_levels = None  # 录音时由电平表提供的历史数组
         self.is_recording = False
         
         # 初始化波形
@@ -38,8 +39,15 @@ class AudioVisualizer(QWidget):
             self.levels.pop(0)
         self.update()
         
+    def set_levels(self, levels):
+        """直接显示电平表的历史数组(最旧的在前)"""
+        self.meter_levels = levels
+        self.update()
+        
     def set_recording(self, is_recording):
         self.is_recording = is_recording
+        if not is_recording:
+            self.meter_levels = None
         self.update()
         
     def paintEvent(self, event):
@@ -52,10 +60,11 @@ class AudioVisualizer(QWidget):
         # 绘制波形
         width = self.width()
         height = self.height()
-        bar_width = width / self.max_levels
+        levels = self.meter_levels if self.meter_levels is not None else self.levels
+        bar_width = width / max(1, len(levels))
         x = 0
         
-        for level in self.levels:
+        for level in levels:
             bar_height = (level / 100) * height
             y = (height - bar_height) / 2
             
@@ -110,6 +119,8 @@ class ToggleButton(QPushButton):
 # 创建一个信号类
 class DeviceSignals(QObject):
     device_changed = Signal(int)
+    devices_changed = Signal()  # 系统音频设备插拔
+    devices_refreshed = Signal()  # 共享的设备表已经刷新(可能在其他线程中发出)
 
 class AboutDialog(QMessageBox):
     """关于对话框"""
@@ -169,6 +180,8 @@ class FloatingWindow(QMainWindow):
         # 创建信号对象
         self.signals = DeviceSignals()
         self.device_changed = self.signals.device_changed
+        self.devices_changed = self.signals.devices_changed
+        self.devices_refreshed = self.signals.devices_refreshed
         
         # 设备初始化状态
         self.device_initialized = False
@@ -476,8 +489,9 @@ class FloatingWindow(QMainWindow):
         # 设置窗口大小
         self.setFixedSize(650, 650)
         
-        # 初始化设备列表
+        # 初始化设备列表，并监听设备插拔
         self.init_device_list()
+        self.watch_audio_devices()
         
         # 初始化模型列表
         self.init_model_list()
@@ -592,8 +606,6 @@ class FloatingWindow(QMainWindow):
             self.toggle_button.set_recording(True)
             self.status_label.setText("正在录音...")
             self.toggle_recording_signal.emit()
-            # 发出开始提示音
-            os.system('afplay /System/Library/Sounds/Ping.aiff')
         else:
             # 停止录音
             self.is_recording = False
@@ -602,37 +614,26 @@ class FloatingWindow(QMainWindow):
             self.toggle_recording_signal.emit()
         
     def init_device_list(self):
-        """初始化设备列表"""
-        import pyaudio
+        """初始化设备列表(从共享音频宿主缓存的设备表读取)"""
+        from core.audio_host import get_audio_host
         
         try:
             self.logger.debug("开始初始化设备列表...")
-            p = pyaudio.PyAudio()
-            info = p.get_host_api_info_by_index(0)
-            num_devices = info.get('deviceCount')
+            previous_name = self.device_combo.currentText() if self.device_combo.count() else None
+            input_devices = get_audio_host().input_devices()
             
-            # 清空下拉框
+            # 重新填充下拉框，期间不触发设备切换
+            self.device_combo.blockSignals(True)
             self.device_combo.clear()
+            for device_id, device_name in input_devices:
+                self.device_combo.addItem(device_name, device_id)
+                self.logger.debug(f"添加输入设备: {device_name} (ID: {device_id})")
+            self.device_combo.blockSignals(False)
             
-            # 记录输入设备
-            input_devices = []
-            
-            for i in range(num_devices):
-                try:
-                    device_info = p.get_device_info_by_index(i)
-                    if device_info and device_info.get('maxInputChannels') > 0:
-                        device_name = device_info.get('name')
-                        input_devices.append((i, device_name))
-                        self.device_combo.addItem(device_name, i)
-                        self.logger.debug(f"添加输入设备: {device_name} (ID: {i})")
-                except Exception as e:
-                    self.logger.error(f"获取设备信息失败: {e}")
-                    
-            p.terminate()
-            
-            # 如果有输入设备,默认选择第一个
+            # 如果有输入设备,优先保留之前选择的设备(刷新后设备ID可能变化),否则选择第一个
             if len(input_devices) > 0:
-                self.device_combo.setCurrentIndex(0)
+                selected = self.device_combo.findText(previous_name) if previous_name else -1
+                self.device_combo.setCurrentIndex(max(0, selected))
                 device_id = self.device_combo.currentData()
                 self.logger.info(f"默认选择输入设备: {self.device_combo.currentText()} (ID: {device_id})")
                 self.device_initialized = True  # 标记设备已初始化
@@ -651,6 +652,16 @@ class FloatingWindow(QMainWindow):
             self.status_label.setText(f"初始化设备失败: {str(e)}")
             self.device_initialized = False
             
+    def watch_audio_devices(self):
+        """用QtMultimedia监听系统音频输入设备变化，不可用时只能通过重启刷新设备列表"""
+        try:
+            from PySide6.QtMultimedia import QMediaDevices
+        except ImportError:
+            self.logger.debug("QtMultimedia不可用，不监听音频设备插拔")
+            return
+        self.media_devices = QMediaDevices(self)
+        self.media_devices.audioInputsChanged.connect(self.devices_changed.emit)
+            
     def on_device_changed(self, index):
         """设备切换事件"""
         if index >= 0:
@@ -659,20 +670,31 @@ class FloatingWindow(QMainWindow):
             # 发出设备改变信号
             self.device_changed.emit(device_id)
             
-    def update_result(self, text):
-        """更新转写结果"""
+    def append_partial_result(self, text):
+        """追加长录音模式中已完成的一段文本(不复制到剪贴板，不播放提示音)"""
         self.result_text.append(text)
+        scrollbar = self.result_text.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+        
+    def update_result(self, result, clipboard_text=None):
+        """更新转写结果
+        Args:
+            result: TranscriptionResult或纯文本
+            clipboard_text: 复制到剪贴板的文本，默认与显示的文本相同
+        """
+        text = result.text if hasattr(result, "text") else str(result)
+        if text:
+            self.result_text.append(text)
         self.status_label.setText("转写完成")
-        # 发出完成提示音（两声）
-        os.system('afplay /System/Library/Sounds/Ping.aiff')
-        time.sleep(0.2)
-        os.system('afplay /System/Library/Sounds/Ping.aiff')
+        # 完成提示音由调用方通过提示音播放器在后台播放，这里不阻塞界面线程
         
         # 确保文本区域滚动到最新内容
         scrollbar = self.result_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
         
         # 保存最新的转写结果到应用剪贴板
+        if clipboard_text is not None:
+            text = clipboard_text
         self.last_transcription = text
         
         # 自动将文本复制到系统剪贴板
@@ -713,6 +735,10 @@ class FloatingWindow(QMainWindow):
         """更新音频电平"""
         self.visualizer.update_level(level)
         
+    def update_audio_history(self, levels):
+        """更新录音时的电平历史(由电平表计算的数组)"""
+        self.visualizer.set_levels(levels)
+        
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.drag_position = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
@@ -806,16 +832,7 @@ class FloatingWindow(QMainWindow):
                 self.logger.error(f"读取上次模型设置失败: {e}")
             
             # 检查模型目录
-            model_paths = [
-                ("large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-large-v3")),
-                ("medium", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-medium")),
-                ("small", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-small")),
-                ("base", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-base")),
-                ("tiny", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-tiny")),
-                ("distil-large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-large-v3")),
-                ("distil-small.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-small.en")),
-                ("distil-medium.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-medium.en"))
-            ]
+            model_paths = self._get_model_paths()
             
             # 打印所有模型路径信息
             self.logger.info("----- 模型检测开始 -----")
@@ -880,6 +897,14 @@ class FloatingWindow(QMainWindow):
             self.logger.error(f"初始化模型列表失败: {e}")
             self.result_text.append(f"初始化模型列表失败: {str(e)}")
             
+    def _get_model_paths(self):
+        """返回所有模型及其本地缓存目录，未下载的模型返回预期的缓存目录"""
+        models_dir = getattr(self.config, "models_dir", None) if self.config else None
+        return [
+            (name, find_model_cache_dir(name, models_dir) or get_repo_cache_dir(name))
+            for name in MODEL_REPOS
+        ]
+            
     def _get_directory_size(self, path):
         """获取目录大小（字节）"""
         total_size = 0
@@ -923,16 +948,7 @@ class FloatingWindow(QMainWindow):
                     if reply == QMessageBox.Yes:
                         # 确认删除模型
                         model_path = ""
-                        for name, path in [
-                            ("large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-large-v3")),
-                            ("medium", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-medium")),
-                            ("small", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-small")),
-                            ("base", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-base")),
-                            ("tiny", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-tiny")),
-                            ("distil-large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-large-v3")),
-                            ("distil-small.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-small.en")),
-                            ("distil-medium.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-medium.en"))
-                        ]:
+                        for name, path in self._get_model_paths():
                             if name == real_model_name:
                                 model_path = path
                                 break
@@ -994,19 +1010,19 @@ class FloatingWindow(QMainWindow):
                 # 如果未选择或已下载，则显示选择对话框
                 models_to_download = []
                 models_info = [
-                    ("tiny", "39MB - 最小质量(英文)", "https://huggingface.co/Systran/faster-whisper-tiny"),
-                    ("base", "74MB - 较低质量", "https://huggingface.co/Systran/faster-whisper-base"),
-                    ("small", "244MB - 平衡质量", "https://huggingface.co/Systran/faster-whisper-small"),
-                    ("medium", "769MB - 高质量", "https://huggingface.co/Systran/faster-whisper-medium"),
-                    ("large-v3", "2.9GB - 最高质量", "https://huggingface.co/Systran/faster-whisper-large-v3"),
-                    ("distil-large-v3", "2.3GB - 较高质量", "https://huggingface.co/Systran/faster-distil-whisper-large-v3"),
-                    ("distil-small.en", "240MB - 仅英文优化", "https://huggingface.co/Systran/faster-distil-whisper-small.en"),
-                    ("distil-medium.en", "763MB - 仅英文高质量", "https://huggingface.co/Systran/faster-distil-whisper-medium.en")
+                    ("tiny", "39MB - 最小质量(英文)"),
+                    ("base", "74MB - 较低质量"),
+                    ("small", "244MB - 平衡质量"),
+                    ("medium", "769MB - 高质量"),
+                    ("large-v3", "2.9GB - 最高质量"),
+                    ("distil-large-v3", "2.3GB - 较高质量"),
+                    ("distil-small.en", "240MB - 仅英文优化"),
+                    ("distil-medium.en", "763MB - 仅英文高质量")
                 ]
                 
-                for name, info, url in models_info:
+                for name, info in models_info:
                     if name not in self.available_models:
-                        models_to_download.append((name, info, url))
+                        models_to_download.append((name, info, f"https://huggingface.co/{get_repo_id(name)}"))
                 
                 if not models_to_download:
                     QMessageBox.information(self, "已下载全部模型", "已下载所有可用模型！")
@@ -1077,25 +1093,16 @@ class FloatingWindow(QMainWindow):
             if not model_name:
                 raise ValueError("无效的模型名称")
             
-            # 构建下载命令
-            import subprocess
-            
-            # 根据模型名称选择正确的仓库
-            model_repo = f"Systran/faster-whisper-{model_name}"
-            if model_name == "distil-large-v3":
-                model_repo = "Systran/faster-distil-whisper-large-v3"
-            elif model_name == "distil-small.en":
-                model_repo = "Systran/faster-distil-whisper-small.en"
-            elif model_name == "distil-medium.en":
-                model_repo = "Systran/faster-distil-whisper-medium.en"
-                
+            # 构建下载命令：仓库ID与下载目录和引擎共用同一套规则，
+            # 下载后的快照才能被 resolve_local_model 找到
+            cache_dir = get_hf_cache_dir()
             cmd = [
                 "huggingface-cli",
                 "download",
                 "--resume-download",
-                model_repo,
-                "--local-dir-use-symlinks",
-                "False"
+                get_repo_id(model_name),
+                "--cache-dir",
+                cache_dir
             ]
             
             self.logger.debug(f"执行命令: {' '.join(cmd)}")
@@ -1106,7 +1113,12 @@ class FloatingWindow(QMainWindow):
             # 在主线程中更新UI
             from PySide6.QtCore import QMetaObject, Qt, Q_ARG
             
-            if result.returncode == 0:
+            models_dir = getattr(self.config, "models_dir", None) if self.config else None
+            if result.returncode == 0 and not resolve_local_model(model_name, models_dir):
+                self.logger.error(f"模型下载完成，但未在 {get_repo_cache_dir(model_name, cache_dir)} 找到完整快照")
+                message = f"未找到完整的模型文件: {get_repo_cache_dir(model_name, cache_dir)}"
+                QTimer.singleShot(0, lambda: self.download_completed(False, message))
+            elif result.returncode == 0:
                 self.logger.info(f"模型 {model_name} 下载成功")
                 # 使用主线程更新UI
                 QTimer.singleShot(0, lambda: self.download_completed(True, model_name))
@@ -1144,16 +1156,7 @@ class FloatingWindow(QMainWindow):
             
             # 获取所有模型和大小信息
             found_models = []
-            for name, path in [
-                ("large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-large-v3")),
-                ("medium", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-medium")),
-                ("small", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-small")),
-                ("base", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-base")),
-                ("tiny", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-whisper-tiny")),
-                ("distil-large-v3", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-large-v3")),
-                ("distil-small.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-small.en")),
-                ("distil-medium.en", os.path.expanduser("~/.cache/huggingface/hub/models--Systran--faster-distil-whisper-medium.en"))
-            ]:
+            for name, path in self._get_model_paths():
                 if os.path.exists(path):
                     model_size = self._get_directory_size(path)
                     found_models.append((name, path, model_size))
@@ -1199,15 +1202,8 @@ class FloatingWindow(QMainWindow):
     def update_idle_visualization(self):
         """在非录音状态下更新波形显示"""
         if not self.is_recording and hasattr(self, 'visualizer'):
-            # 使用AudioRecorder的get_audio_level方法获取随机值
-            from core.recorder import AudioRecorder
-            recorder = getattr(self, '_temp_recorder', None)
-            if recorder is None:
-                recorder = AudioRecorder()
-                self._temp_recorder = recorder
-            
-            level = recorder.get_audio_level()
-            self.update_audio_level(level)
+            # 未录音时显示随机的低电平，确保波形可见(不需要为此创建录音器)
+            self.update_audio_level(np.random.uniform(5, 15))
 
     def show_about_dialog(self):
         """显示关于对话框"""
@@ -13,7 +13,27 @@ class Config:
             "model_path": None,
             "language": "auto",
             "hotkey": "Cmd+Shift+Space",
-            "theme": "light"
+            "theme": "light",
+            "allow_model_download": False,
+            "preemptive_decode": True,
+            "preemptive_silence_ms": 700,
+            "long_form": False,
+            "long_form_min_chunk_s": 15,
+            "speculative_decode": False,
+            "speculative_draft_model": "distil-large-v3",
+            "encoder_cache_size": 12,
+            "tempo_speed": 1.0,
+            "tempo_min_duration_s": 60,
+            "warm_input_stream": False,
+            "preroll_ms": 300,
+            "recording_format": "wav",
+            "native_capture": True,
+            "dsp_bypass": True,
+            "dsp_filters": ["highpass", "gate", "agc"],
+            "dsp_budget_ms": 2.0,
+            "auto_stop": False,
+            "auto_stop_silence_ms": 1200,
+            "capture_process": False
         }
         self.config = self._load_config()
         
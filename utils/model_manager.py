@@ -3,6 +3,7 @@ import shutil
 from huggingface_hub import snapshot_download
 import logging
 import psutil
+from utils.system_resources import get_memory_gb
 
 class ModelManager:
     def __init__(self, config):
@@ -43,7 +44,7 @@ class ModelManager:
         
     def get_recommended_model(self):
         """根据系统配置推荐合适的模型"""
-        memory_gb = psutil.virtual_memory().total / (1024 * 1024 * 1024)
+        memory_gb = get_memory_gb()
         
         if memory_gb >= 16:
             return "large-v3"
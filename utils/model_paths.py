@@ -0,0 +1,128 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 模型名称到 Hugging Face 仓库的映射
+MODEL_REPOS = {
+    "large-v3": "Systran/faster-whisper-large-v3",
+    "medium": "Systran/faster-whisper-medium",
+    "small": "Systran/faster-whisper-small",
+    "base": "Systran/faster-whisper-base",
+    "tiny": "Systran/faster-whisper-tiny",
+    "distil-large-v3": "Systran/faster-distil-whisper-large-v3",
+    "distil-small.en": "Systran/faster-distil-whisper-small.en",
+    "distil-medium.en": "Systran/faster-distil-whisper-medium.en",
+}
+
+# 一个可加载的CTranslate2模型目录至少要包含这些文件
+REQUIRED_MODEL_FILES = ("model.bin", "config.json")
+
+
+def get_hf_cache_dir():
+    """获取Hugging Face缓存目录，遵循HF_HUB_CACHE/HF_HOME等环境变量"""
+    for env_name in ("HF_HUB_CACHE", "HUGGINGFACE_HUB_CACHE"):
+        value = os.environ.get(env_name)
+        if value:
+            return os.path.expanduser(value)
+    hf_home = os.environ.get("HF_HOME")
+    if hf_home:
+        return os.path.join(os.path.expanduser(hf_home), "hub")
+    xdg_cache = os.environ.get("XDG_CACHE_HOME")
+    if xdg_cache:
+        return os.path.join(os.path.expanduser(xdg_cache), "huggingface", "hub")
+    return os.path.expanduser("~/.cache/huggingface/hub")
+
+
+def get_repo_id(model_name):
+    """返回模型对应的仓库ID，未知模型按faster-whisper的命名规则推断"""
+    return MODEL_REPOS.get(model_name, f"Systran/faster-whisper-{model_name}")
+
+
+def get_repo_cache_dir(model_name, cache_dir=None):
+    """返回模型在HF缓存中的仓库目录(models--Org--name)"""
+    cache_dir = cache_dir or get_hf_cache_dir()
+    return os.path.join(cache_dir, "models--" + get_repo_id(model_name).replace("/", "--"))
+
+
+def is_model_dir(path):
+    """检查目录是否是完整的CTranslate2模型目录"""
+    return bool(path) and os.path.isdir(path) and all(
+        os.path.isfile(os.path.join(path, name)) for name in REQUIRED_MODEL_FILES
+    )
+
+
+def _newest_snapshot(repo_dir):
+    """在仓库缓存中找到最新的完整快照
+
+    优先使用refs/main指向的快照，否则按修改时间选择最新的完整快照。
+    """
+    snapshots_dir = os.path.join(repo_dir, "snapshots")
+    if not os.path.isdir(snapshots_dir):
+        return None
+
+    ref_file = os.path.join(repo_dir, "refs", "main")
+    if os.path.isfile(ref_file):
+        try:
+            with open(ref_file, "r") as f:
+                revision = f.read().strip()
+            snapshot = os.path.join(snapshots_dir, revision)
+            if is_model_dir(snapshot):
+                return snapshot
+        except OSError as e:
+            logger.debug(f"读取 {ref_file} 失败: {e}")
+
+    candidates = []
+    for name in os.listdir(snapshots_dir):
+        snapshot = os.path.join(snapshots_dir, name)
+        if is_model_dir(snapshot):
+            candidates.append((os.path.getmtime(snapshot), snapshot))
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def get_search_dirs(models_dir=None):
+    """返回查找模型时使用的缓存目录列表(按优先级)"""
+    dirs = []
+    if models_dir:
+        dirs.append(models_dir)
+    hf_cache = get_hf_cache_dir()
+    if hf_cache not in dirs:
+        dirs.append(hf_cache)
+    return dirs
+
+
+def resolve_local_model(model_name, models_dir=None):
+    """把模型名称解析为本地模型目录，不访问网络
+
+    依次检查：
+    1. 本身就是模型目录的路径
+    2. models_dir/<model_name> 形式的本地目录
+    3. models_dir 和 HF缓存中 models--Org--name/snapshots 下的最新快照
+
+    Returns:
+        本地模型目录，找不到返回None
+    """
+    if is_model_dir(model_name):
+        return model_name
+
+    if models_dir and is_model_dir(os.path.join(models_dir, model_name)):
+        return os.path.join(models_dir, model_name)
+
+    for cache_dir in get_search_dirs(models_dir):
+        snapshot = _newest_snapshot(get_repo_cache_dir(model_name, cache_dir))
+        if snapshot:
+            return snapshot
+    return None
+
+
+def find_model_cache_dir(model_name, models_dir=None):
+    """返回已下载模型所在的仓库缓存目录(用于显示大小或删除)，找不到返回None"""
+    if models_dir and is_model_dir(os.path.join(models_dir, model_name)):
+        return os.path.join(models_dir, model_name)
+    for cache_dir in get_search_dirs(models_dir):
+        repo_dir = get_repo_cache_dir(model_name, cache_dir)
+        if _newest_snapshot(repo_dir):
+            return repo_dir
+    return None
@@ -0,0 +1,189 @@
+import os
+import math
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# cgroup v1 用一个极大的值表示没有内存限制
+_CGROUP_V1_UNLIMITED = 1 << 60
+
+
+def _read_text(path):
+    """读取一个小文本文件，失败返回None"""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _cgroup_paths():
+    """解析/proc/self/cgroup，返回 {控制器: 相对路径}，v2的统一层级使用空字符串作为键"""
+    paths = {}
+    content = _read_text("/proc/self/cgroup")
+    if not content:
+        return paths
+    for line in content.splitlines():
+        parts = line.split(":", 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        if not controllers:
+            paths[""] = path
+        for controller in controllers.split(","):
+            if controller:
+                paths[controller] = path
+    return paths
+
+
+def _candidate_dirs(*subdirs, controller=None):
+    """返回可能包含cgroup控制文件的目录(进程所在层级优先，其次是挂载根目录)"""
+    rel = _cgroup_paths().get(controller if controller is not None else "")
+    dirs = []
+    for subdir in subdirs:
+        base = os.path.join(CGROUP_ROOT, subdir) if subdir else CGROUP_ROOT
+        if rel and rel != "/":
+            dirs.append(os.path.join(base, rel.lstrip("/")))
+        dirs.append(base)
+    return dirs
+
+
+def get_cgroup_cpu_limit():
+    """返回cgroup CPU配额对应的核心数(可以是小数)，没有限制返回None"""
+    # cgroup v2: cpu.max 内容为 "<quota> <period>" 或 "max <period>"
+    for directory in _candidate_dirs(""):
+        content = _read_text(os.path.join(directory, "cpu.max"))
+        if content:
+            parts = content.split()
+            if parts[0] == "max":
+                return None
+            try:
+                quota = int(parts[0])
+                period = int(parts[1]) if len(parts) > 1 else 100000
+                if quota > 0 and period > 0:
+                    return quota / period
+            except ValueError:
+                pass
+            return None
+
+    # cgroup v1: cpu.cfs_quota_us / cpu.cfs_period_us
+    for directory in _candidate_dirs("cpu", "cpu,cpuacct", controller="cpu"):
+        quota = _read_text(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = _read_text(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota is None or period is None:
+            continue
+        try:
+            quota, period = int(quota), int(period)
+        except ValueError:
+            continue
+        if quota > 0 and period > 0:
+            return quota / period
+        return None
+    return None
+
+
+def get_cgroup_memory_limit():
+    """返回cgroup内存限制(字节)，没有限制返回None"""
+    for directory in _candidate_dirs(""):
+        content = _read_text(os.path.join(directory, "memory.max"))
+        if content:
+            if content == "max":
+                return None
+            try:
+                return int(content)
+            except ValueError:
+                return None
+
+    for directory in _candidate_dirs("memory", controller="memory"):
+        content = _read_text(os.path.join(directory, "memory.limit_in_bytes"))
+        if content:
+            try:
+                limit = int(content)
+            except ValueError:
+                continue
+            return limit if limit < _CGROUP_V1_UNLIMITED else None
+    return None
+
+
+def get_affinity_cpu_count():
+    """返回进程CPU亲和性(taskset)允许使用的逻辑CPU数量，无法获取返回None"""
+    if hasattr(os, "sched_getaffinity"):
+        try:
+            return len(os.sched_getaffinity(0))
+        except OSError:
+            pass
+    try:
+        import psutil
+        affinity = psutil.Process().cpu_affinity()
+        return len(affinity) if affinity else None
+    except (ImportError, AttributeError, OSError):
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_cpu_resources():
+    """检测实际可用的CPU资源，考虑CPU亲和性和cgroup配额
+
+    Returns:
+        字典，包含物理核心数、逻辑核心数、亲和性核心数、cgroup配额和最终可用核心数
+    """
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False)
+        logical = psutil.cpu_count(logical=True)
+    except ImportError:
+        physical = None
+        logical = os.cpu_count()
+    logical = logical or physical or 2
+    physical = physical or logical
+
+    affinity = get_affinity_cpu_count()
+    quota = get_cgroup_cpu_limit()
+
+    available = physical
+    if affinity is not None and affinity < logical:
+        # 亲和性按逻辑CPU计数，按超线程比例折算为物理核心
+        ratio = physical / logical
+        available = min(available, max(1, int(round(affinity * ratio))))
+    if quota is not None:
+        available = min(available, max(1, math.floor(quota)))
+
+    resources = {
+        "physical": physical,
+        "logical": logical,
+        "affinity": affinity,
+        "cgroup_quota": quota,
+        "available": max(1, available),
+    }
+    logger.info(
+        f"CPU资源: 物理核心={physical}, 逻辑核心={logical}, 亲和性={affinity}, "
+        f"cgroup配额={quota}, 可用={resources['available']}"
+    )
+    return resources
+
+
+def get_available_cpus():
+    """返回进程实际可以使用的CPU核心数"""
+    return get_cpu_resources()["available"]
+
+
+@lru_cache(maxsize=1)
+def get_memory_limit_bytes():
+    """返回进程可用的内存总量(字节)，取物理内存和cgroup限制中较小的一个"""
+    try:
+        import psutil
+        total = psutil.virtual_memory().total
+    except ImportError:
+        total = None
+    limit = get_cgroup_memory_limit()
+    if limit is not None:
+        total = min(total, limit) if total else limit
+    return total
+
+
+def get_memory_gb():
+    """返回进程可用的内存总量(GB)"""
+    total = get_memory_limit_bytes()
+    return total / (1024 ** 3) if total else 0.0
@@ -0,0 +1,143 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 控制OpenMP/MKL/BLAS线程池大小的环境变量，必须在导入numpy/ctranslate2之前设置
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# 各模型推理线程的上限，超过后收益很小
+MODEL_THREAD_CAPS = {
+    "large-v3": 8,
+    "distil-large-v3": 8,
+    "medium": 6,
+    "distil-medium.en": 6,
+    "small": 4,
+    "distil-small.en": 4,
+}
+DEFAULT_MODEL_THREAD_CAP = 2
+
+
+def _detect_cpu_count():
+    """检测可用的CPU核心数(考虑CPU亲和性和cgroup配额)"""
+    from utils.system_resources import get_available_cpus
+    return get_available_cpus()
+
+
+class ThreadBudget:
+    """全局CPU线程预算
+
+    把可用核心分给录音采集/Qt界面、NumPy(BLAS)和模型推理，避免各个线程池
+    各自按全部核心数创建线程而导致过度订阅。
+
+    推理线程按同时运行的模型数量(set_active_models设置)平分。草稿-验证解码虽然加载了
+    草稿和目标两个模型，但两者在同一个线程中交替运行，任何时刻只有一个在计算，
+    所以不计为两个并发模型。
+    """
+
+    def __init__(self, total_cores=None):
+        self.total_cores = max(1, int(total_cores or _detect_cpu_count()))
+        self.active_models = 1
+
+    def allocate(self, active_models=None):
+        """计算线程分配方案
+
+        Args:
+            active_models: 同时运行的模型数量，默认使用set_active_models设置的数量
+        Returns:
+            包含各消费者线程数的字典
+        """
+        models = max(1, int(active_models or self.active_models))
+        total = self.total_cores
+
+        # 采集线程和Qt主线程合用一个线程，NumPy只做电平计算、重采样等轻量运算
+        capture = 1
+        ui = 1
+        numpy_threads = 1
+        # 核心充足时为它们预留核心，核心很少时与推理共用
+        reserved = 0
+        if total >= 4:
+            reserved += 1  # 采集 + 界面
+        if total >= 8:
+            reserved += 1  # NumPy
+
+        inference_total = max(1, total - reserved)
+        inference = max(1, inference_total // models)
+
+        return {
+            "total": total,
+            "capture": capture,
+            "ui": ui,
+            "numpy": numpy_threads,
+            "inference_total": inference_total,
+            "inference": inference,
+            "models": models,
+        }
+
+    def set_active_models(self, count):
+        """设置同时运行的模型数量，返回新的分配方案
+
+        CTranslate2在创建模型时固定推理线程数，已加载的模型不受影响，
+        需要在加载模型之前调用。
+        """
+        count = max(1, int(count))
+        if count != self.active_models:
+            self.active_models = count
+            self.log_allocation()
+        return self.allocate()
+
+    def inference_threads(self, model_name=None, active_models=None):
+        """返回单个模型可以使用的推理线程数"""
+        cap = MODEL_THREAD_CAPS.get(model_name, DEFAULT_MODEL_THREAD_CAP) if model_name else None
+        threads = self.allocate(active_models)["inference"]
+        return min(threads, cap) if cap else threads
+
+    def apply_env(self):
+        """在导入数值计算库之前设置线程相关环境变量(不覆盖用户已设置的值)"""
+        numpy_threads = str(self.allocate()["numpy"])
+        for name in THREAD_ENV_VARS:
+            os.environ.setdefault(name, numpy_threads)
+
+    def apply_library_limits(self):
+        """对已加载的BLAS/OpenMP库应用线程限制(需要threadpoolctl，可选)"""
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            logger.debug("未安装threadpoolctl，仅使用环境变量限制线程")
+            return None
+        return threadpool_limits(limits=self.allocate()["numpy"], user_api="blas")
+
+    def log_allocation(self, allocation=None):
+        """在调试日志中输出当前的线程分配"""
+        allocation = allocation or self.allocate()
+        logger.debug(
+            f"线程预算: 总核心={allocation['total']}, 采集={allocation['capture']}, "
+            f"界面={allocation['ui']}, NumPy={allocation['numpy']}, "
+            f"推理={allocation['inference']}x{allocation['models']}模型 "
+            f"(推理总计{allocation['inference_total']})"
+        )
+
+
+_budget = None
+
+
+def get_thread_budget():
+    """返回进程内共享的线程预算"""
+    global _budget
+    if _budget is None:
+        _budget = ThreadBudget()
+    return _budget
+
+
+def configure_thread_env():
+    """设置线程环境变量并记录分配，应在导入numpy/faster_whisper之前调用"""
+    budget = get_thread_budget()
+    budget.apply_env()
+    budget.log_allocation()
+    return budget